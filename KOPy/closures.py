@@ -22,116 +22,146 @@ import numpy as np
 import glob
 import os, os.path
 import datetime
-import weakref
 
 import astropy.units as u
 from astropy.time import Time
-from astropy.coordinates import FK5, AltAz, FK4
+from astropy.coordinates import SkyCoord, FK5, AltAz, FK4, search_around_sky
 from astropy.utils.console import human_time
 from astropy.utils.data import get_readable_fileobj
 
 from .targets import Target
 from .starlist import read_skip_comments
 
-__all__ = ['Region', 'Closure', 'Opening', 'Regions']
+__all__ = ['Region', 'Closure', 'Opening', 'Regions', 'Coverage']
 
 class Region(Target):
-    """Region for LCH Closures."""
+    """Region for LCH Closures.
+    
+    The openings of a region are stored as sorted arrays of start and end
+    times, in Unix seconds. :class:`Opening` and :class:`Closure` objects
+    are created from these arrays when they are requested.
+    """
     
     RADIUS = 2 * u.arcmin
     """Radius around this region covered by the closure."""
     
+    _starts = None
+    _ends = None
+    _intervals = None
+    
     def __init__(self, *args, **kwargs):
         super(Region, self).__init__(*args, **kwargs)
-        self._openings = list()
+        self._starts = np.zeros((0,), dtype=np.float64)
+        self._ends = np.zeros((0,), dtype=np.float64)
+        self._intervals = None
     
     def contains(self, position):
-        """Test whether a position is within this LCH region."""
+        """Test whether a position, or each of an array of positions, is within this LCH region.
+        
+        Regions whose positions can't be compared with ``position``, e.g.
+        regions fixed in altitude and azimuth, contain nothing.
+        """
         try:
-            contained = (self.position.separation(location) > self.RADIUS)
+            return self.position.separation(position) < self.RADIUS
         except (AttributeError, ValueError):
-            return False
-        return contained
+            return np.zeros(np.shape(position), dtype=bool) if np.shape(position) else False
     
     @property
     def openings(self):
         """A list of openings, in order."""
-        return self._openings
+        return [ Opening._view(self, start, end) for start, end in zip(self._starts, self._ends) ]
     
     def add(self, opening, _no_sort=False):
-        """Add an opening"""
-        if opening not in self._openings:
-            self._openings.append(opening)
-        if not _no_sort:
-            self._openings.sort(key=lambda o : o.start)
+        """Add an opening, unless the region already has an opening with the same start and end."""
+        start, end = opening._start, opening._end
+        first, last = np.searchsorted(self._starts, start, side='left'), np.searchsorted(self._starts, start, side='right')
+        if np.any(self._ends[first:last] == end):
+            return
+        self._starts = np.insert(self._starts, last, start)
+        self._ends = np.insert(self._ends, last, end)
+        self._intervals = None
     
+    @property
+    def intervals(self):
+        """The openings, as sorted arrays of start and end times in Unix seconds.
+        
+        Overlapping openings are merged, so the intervals don't overlap. The
+        arrays are cached until an opening is added.
+        """
+        if self._intervals is None:
+            starts, ends = self._starts, self._ends
+            if len(starts):
+                # Openings which only touch are not merged, since the region is closed at that instant.
+                first = np.r_[True, starts[1:] >= np.maximum.accumulate(ends)[:-1]]
+                groups = np.flatnonzero(first)
+                starts, ends = starts[groups], np.maximum.reduceat(ends, groups)
+            self._intervals = (starts, ends)
+        return self._intervals
+
     def open(self, time):
-        """Check if this window is open during a specific time."""
-        for opening in self._openings:
-            if (time > opening.start) and (time < opening.end):
-                return True
-        return False
+        """Check if this window is open during a specific time.
+        
+        Parameters
+        ----------
+        time : :class:`~astropy.time.Time`
+            A single time, or an array of times.
+        
+        Returns
+        -------
+        open : bool or array
+            Whether the region is open at each time. Each time is found in the
+            sorted openings by bisection.
+        
+        """
+        starts, ends = self.intervals
+        unix = Time(time).unix
+        index = np.searchsorted(starts, unix, side='left') - 1
+        result = (index >= 0) & (unix < ends[np.maximum(index, 0)] if len(ends) else False)
+        return bool(result) if np.ndim(result) == 0 else result
     
     def closed(self, time):
         """Check if this window is closed during a specific time."""
-        return (not self.open(time))
+        result = self.open(time)
+        return np.logical_not(result) if isinstance(result, np.ndarray) else (not result)
         
     @property
     def closures(self):
         """Get a closure list."""
-        for open_start, open_end in self._iter_start_end():
-            yield Closure(self, open_start.end, open_end.start)
-            
-    def _iter_start_end(self):
-        """Iterate over pairs of openings, useful for iterating through closures, or through closures and openings."""
-        if len(self.openings) == 0:
-            return iter([])
-        starts = itertools.islice(self.openings, len(self.openings)-1) # Take everything but the last element
-        ends = itertools.islice(self.openings, 1, None) # Take everything but the first element
-        return zip(starts, ends)
+        for end, start in zip(self._ends[:-1], self._starts[1:]):
+            yield Closure._view(self, end, start)
             
     @property
     def events(self):
         """Interleaved closures and openings."""
-        for open_start, open_end in self._iter_start_end():
-            yield open_start
-            yield Closure(self, open_start.end, open_end.start)
-        yield open_end
-
-class WindowTimeProperty(object):
-    """Descriptor for time properties."""
-    def __init__(self, name):
-        super(WindowTimeProperty, self).__init__()
-        self.name = name
-        
-    @property
-    def attr(self):
-        """Attribute name."""
-        return "_{}_{}".format(self.__class__.__name__, self.name)
-        
-    def __set__(self, obj, value):
-        """Set the property."""
-        setattr(obj, self.attr, Time(value))
-        
-    def __get__(self, obj, objtype=None):
-        """Get the property"""
-        if obj is None:
-            return self
-        if not hasattr(obj, self.attr):
-            raise AttributeError("{:s}.{:s} has not been initialized".format(obj.__class__.__name__, self.name))
-        return getattr(obj, self.attr)
-        
+        n = len(self._starts)
+        for i in range(n):
+            yield Opening._view(self, self._starts[i], self._ends[i])
+            if i + 1 < n:
+                yield Closure._view(self, self._ends[i], self._starts[i + 1])
 
 class Window(object):
-    """An LCH Window"""
+    """An LCH Window.
+    
+    Windows only hold their region and their start and end times as Unix
+    seconds. The :attr:`start` and :attr:`end` times are created when
+    they are used.
+    """
+    __slots__ = ('_region', '_start', '_end')
+    
     def __init__(self, region, start, end):
         super(Window, self).__init__()
-        self._region = weakref.ref(region)
-        self.start = start
-        self.end = end
+        self._region = region
+        self._start = Time(start).unix
+        self._end = Time(end).unix
     
-    start = WindowTimeProperty("start")
-    end = WindowTimeProperty("end")
+    @classmethod
+    def _view(cls, region, start, end):
+        """A window for start and end times which are already in Unix seconds."""
+        window = cls.__new__(cls)
+        window._region = region
+        window._start = float(start)
+        window._end = float(end)
+        return window
     
     def __repr__(self):
         """Representer for this LCH window object."""
@@ -140,15 +170,38 @@ class Window(object):
         except AttributeError:
             return super(Window, self).__repr__()
     
+    def __eq__(self, other):
+        """Windows are equal when they are for the same region and times."""
+        return (type(self) is type(other) and self._region is other._region
+            and self._start == other._start and self._end == other._end)
+        
+    def __ne__(self, other):
+        """Inequality."""
+        return not self.__eq__(other)
+    
+    def __hash__(self):
+        """Hash by region and times."""
+        return hash((type(self), id(self._region), self._start, self._end))
+    
+    @property
+    def start(self):
+        """The start of this window."""
+        return Time(self._start, format='unix')
+        
+    @property
+    def end(self):
+        """The end of this window."""
+        return Time(self._end, format='unix')
+    
     @property
     def region(self):
         """Region property"""
-        return self._region()
+        return self._region
     
     @property
     def duration(self):
         """The duration of this closure."""
-        return (self.end - self.start).to(u.s)
+        return (self._end - self._start) * u.s
         
     def time_to(self, time = None, string = False):
         """Compute the time until this closure starts, from a given time.
@@ -165,10 +218,12 @@ class Window(object):
         
 class Closure(Window):
     """An LCH closure window, when the laser cannot be propogated."""
+    __slots__ = ()
     propogate = False
     
 class Opening(Window):
     """An LCH Opening window, when the laser can be propogated."""
+    __slots__ = ()
     propogate = True
     
     def __init__(self, region, start, end):
@@ -463,6 +518,64 @@ def parse_closures_list(stream, name="<stream>", date=None, cls=_LCHParser):
     parser = cls(name, date)
     return parser(stream).values()
 
+class Coverage(collections.namedtuple('Coverage', ['index', 'region_index', 'names'])):
+    """The result of :meth:`Regions.covering`, one entry for each position and region which covers it.
+    
+    Attributes
+    ----------
+    index : array
+        Indices of the positions, in increasing order.
+    region_index : array
+        Indices of the covering regions, into ``names``.
+    names : list
+        The names of all of the regions, in order.
+    
+    """
+    __slots__ = ()
+    
+    def regions(self, n):
+        """The names of the regions covering each of ``n`` positions, as a list of lists."""
+        covering = [ [] for _ in range(n) ]
+        for i, j in zip(self.index, self.region_index):
+            covering[i].append(self.names[j])
+        return covering
+    
+
+class _RegionIndex(object):
+    """A spatial index of region centers, for finding the regions which contain many positions at once."""
+    def __init__(self, regions):
+        super(_RegionIndex, self).__init__()
+        self.regions = list(regions)
+        rows, coords = [], []
+        for i, region in enumerate(self.regions):
+            try:
+                coords.append(region.position.transform_to('icrs'))
+            except (AttributeError, ValueError):
+                # Regions fixed in altitude and azimuth can't be indexed on the sky.
+                continue
+            rows.append(i)
+        self.rows = np.array(rows, dtype=int)
+        self.radius = np.array([ self.regions[i].RADIUS.to(u.degree).value for i in rows ], dtype=np.float64) * u.degree
+        if coords:
+            self.catalog = SkyCoord([ c.ra.degree for c in coords ], [ c.dec.degree for c in coords ],
+                unit=u.degree, frame='icrs')
+        else:
+            self.catalog = None
+        
+    def query(self, positions):
+        """Find the pairs ``(i, j)`` where region ``j`` contains position ``i``, sorted by position."""
+        positions = SkyCoord(positions).transform_to('icrs')
+        if positions.isscalar:
+            positions = positions.reshape((1,))
+        if self.catalog is None or not len(positions):
+            return np.zeros((0,), dtype=int), np.zeros((0,), dtype=int)
+        i, j, separation, _ = search_around_sky(positions, self.catalog, self.radius.max())
+        inside = separation < self.radius[j]
+        i, j = i[inside], j[inside]
+        order = np.lexsort((j, i))
+        return i[order], self.rows[j[order]]
+        
+
 class Regions(collections.OrderedDict):
     """A dictionary interface for LCH regions.
     
@@ -481,9 +594,41 @@ class Regions(collections.OrderedDict):
         repr_str += ["({0:d} for {0:.0f})".format(self.n_closures, self.t_closures)]
         return " ".join(repr_str) + ">"
         
+    def _index(self):
+        """The spatial index of the regions, which is rebuilt when the regions change."""
+        key = tuple(id(region) for region in self.values())
+        index = getattr(self, '_region_index', None)
+        if index is None or index[0] != key:
+            index = self._region_index = (key, _RegionIndex(self.values()))
+        return index[1]
+        
+    def covering(self, location):
+        """Find the regions which cover each of many positions.
+        
+        Positions are matched to region centers with a spatial index, so this
+        is much faster than checking each region in turn. Regions fixed in
+        altitude and azimuth don't cover any position.
+        
+        Parameters
+        ----------
+        location : :class:`~astropy.coordinates.SkyCoord`
+            The positions.
+        
+        Returns
+        -------
+        coverage : :class:`Coverage`
+            The position and region index of each position inside a region.
+        
+        """
+        index, region_index = self._index().query(location)
+        return Coverage(index, region_index, list(self.keys()))
+        
     def contains(self, location):
-        """Check if this location is covered by any of the regions here."""
-        return any(region.contains(location) for region in self.values())
+        """Check if this location, or each of an array of locations, is covered by any of the regions here."""
+        location = SkyCoord(location)
+        contained = np.zeros((location.size,), dtype=bool)
+        contained[self.covering(location).index] = True
+        return bool(contained[0]) if location.isscalar else contained.reshape(location.shape)
         
     def open(self, location, time):
         """Check if this location and time is open for laser propagation.
@@ -497,32 +642,76 @@ class Regions(collections.OrderedDict):
         Parameters
         ----------
         location : :class:`~astropy.coordinates.SkyCoord`
-            The location to check against all of the contained regions.
+            The location, or an array of locations, to check against all of
+            the contained regions.
         time : :class:`~astropy.time.Time`
-            The time to check against all contained regions.
+            The time to check against all contained regions. This must be a
+            single time; use :meth:`open_matrix` for many times.
         
         Returns
         -------
-        open : bool
+        open : bool or array
             Whether this location, at the specified time, is open for laser
             propogation.
         
+        Raises
+        ------
+        TypeError
+            If ``time`` is an array of times.
+        
+        """
+        if not Time(time).isscalar:
+            raise TypeError("Regions.open takes a single time, use Regions.open_matrix for an array of times.")
+        location = SkyCoord(location)
+        coverage = self.covering(location)
+        regions = list(self.values())
+        used, slot = np.unique(coverage.region_index, return_inverse=True)
+        closed = np.array([ regions[j].closed(time) for j in used ], dtype=bool)[slot]
+        open = np.zeros((location.size,), dtype=bool)
+        open[coverage.index] = True
+        open[coverage.index[closed]] = False
+        return bool(open[0]) if location.isscalar else open.reshape(location.shape)
+        
+    def open_matrix(self, targets, times):
+        """Check many locations at many times for laser propagation, with the same rules as :meth:`open`.
+        
+        The regions covering each location are found once with a spatial
+        index, and each of those regions is checked at every time at once.
+        
+        Parameters
+        ----------
+        targets : :class:`~KOPy.targets.TargetList` or :class:`~astropy.coordinates.SkyCoord`
+            The targets, or their positions.
+        times : :class:`~astropy.time.Time`
+            The time grid.
+        
+        Returns
+        -------
+        open : array
+            A boolean array of shape ``(targets, times)``, true where the
+            laser can be propagated.
+        
         """
-        contained = False
-        open = True
-        for region in self.values():
-            this_contain = region.contains(location)
-            contained |= this_contain
-            if this_contain:
-                this_open = region.open(time)
-                if not this_open:
-                    return False
-                open &= this_open
-        return (contained and open)
+        location = targets.catalog() if hasattr(targets, 'catalog') else SkyCoord(targets)
+        location = location.reshape((location.size,))
+        times = Time(times)
+        times = times.reshape((times.size,))
+        coverage = self.covering(location)
+        result = np.zeros((location.size, times.size), dtype=bool)
+        if not len(coverage.index):
+            return result
+        regions = list(self.values())
+        used, slot = np.unique(coverage.region_index, return_inverse=True)
+        opened = np.array([ regions[j].open(times) for j in used ], dtype=bool).reshape((len(used), times.size))
+        # Pairs are sorted by position, so each location's regions are a contiguous run.
+        starts = np.flatnonzero(np.r_[True, coverage.index[1:] != coverage.index[:-1]])
+        result[coverage.index[starts]] = np.logical_and.reduceat(opened[slot], starts, axis=0)
+        return result
         
     def closed(self, location, time):
         """Check if this location and time is closed. Returns the opposite of :meth:`Regions.open`"""
-        return not self.open(location, time)
+        result = self.open(location, time)
+        return np.logical_not(result) if isinstance(result, np.ndarray) else (not result)
         
     def to_starlist(self, filename, **kwargs):
         """Write these regions to a starlist file.
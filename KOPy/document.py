@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+:mod:`document` edits starlists while keeping their comments and layout.
+
+A :class:`StarlistDocument` keeps every line of a starlist, including
+comments and blank lines, alongside a :class:`~KOPy.targets.TargetList` of
+its targets. It follows changes to the list through
+:meth:`~KOPy.targets.TargetList.subscribe`, so when the document is saved,
+only the targets which were changed or added are formatted again. Every
+other line is written back exactly as it was read, and the time to save
+doesn't depend on formatting the whole list.
+
+Comments and blank lines belong to the target which follows them, and move
+with it when the list is sorted. The comments of a deleted target are kept,
+before the next target.
+
+For example::
+
+    >>> document = StarlistDocument.read("starlist.txt") # doctest: +SKIP
+    >>> document.targets.set_keyword("SAO 102961", "vmag", 8.1) # doctest: +SKIP
+    >>> document.save() # doctest: +SKIP
+
+"""
+
+import io
+import six
+import numpy as np
+
+from .targets import Target, TargetList
+
+__all__ = ['StarlistDocument']
+
+class StarlistDocument(object):
+    """A starlist, with its comments, blank lines and the original text of each target.
+
+    Parameters
+    ----------
+    lines : iterable of string
+        The lines of the starlist.
+    filename : string, optional
+        The file the lines came from, where :meth:`save` writes by default.
+    comments : string
+        The string at the start of comment lines.
+
+    Attributes
+    ----------
+    targets : :class:`~KOPy.targets.TargetList`
+        The targets. Change targets through the list, e.g. with
+        :meth:`~KOPy.targets.TargetList.set_keyword`, or call :meth:`touch`
+        after changing a :class:`~KOPy.targets.Target` directly.
+
+    """
+    def __init__(self, lines=(), filename=None, comments="#"):
+        super(StarlistDocument, self).__init__()
+        self.filename = filename
+        self.comments = comments
+        self._load([ line.rstrip("\n\r") for line in lines ])
+
+    @classmethod
+    def read(cls, filename, comments="#"):
+        """Read a starlist file."""
+        with io.open(filename, 'r') as stream:
+            return cls(stream, filename=filename, comments=comments)
+
+    def _is_target(self, line):
+        """Whether a line holds a target."""
+        return bool(line.strip()) and not line.startswith(self.comments)
+
+    def _load(self, lines):
+        """Start from a new set of lines, none of which are modified."""
+        self._lines = lines
+        self._origin = [ i for i, line in enumerate(lines) if self._is_target(line) ]
+        self._modified = [False] * len(self._origin)
+        self.targets = TargetList(Target.from_starlist(lines[i].strip(), lazy=True) for i in self._origin)
+        self.targets.subscribe(self._update)
+
+    def _update(self, change):
+        """Follow a change to the target list."""
+        if change.kind == 'insert':
+            for i in change.index:
+                self._origin.insert(i, None)
+                self._modified.insert(i, True)
+        elif change.kind == 'delete':
+            for i in change.index[::-1]:
+                del self._origin[i]
+                del self._modified[i]
+        elif change.kind == 'reorder':
+            self._origin = [ self._origin[i] for i in change.index ]
+            self._modified = [ self._modified[i] for i in change.index ]
+        else:
+            for i in change.index:
+                self._modified[i] = True
+
+    def touch(self, index):
+        """Mark targets as modified, after changing them directly."""
+        for i in np.atleast_1d(index):
+            self._modified[i] = True
+
+    @property
+    def modified(self):
+        """The positions of targets which will be formatted again when the document is saved."""
+        return [ i for i, modified in enumerate(self._modified) if modified ]
+
+    def lines(self, **kwargs):
+        """Yield the lines of the document, formatting only modified and new targets.
+
+        Keyword arguments are passed to :meth:`~KOPy.targets.Target.to_starlist`.
+        """
+        # The comments and blank lines before each target line, and after the last one.
+        before, pending = {}, []
+        for i, line in enumerate(self._lines):
+            if self._is_target(line):
+                before[i], pending = pending, []
+            else:
+                pending.append(i)
+        kept = set(origin for origin in self._origin if origin is not None)
+        # Comments of deleted targets go with the next target which is kept.
+        carried = []
+        for i in sorted(before):
+            if i not in kept:
+                carried.extend(before.pop(i))
+            elif carried:
+                before[i], carried = carried + before[i], []
+        pending = carried + pending
+
+        for i, origin in enumerate(self._origin):
+            if origin is not None:
+                for j in before[origin]:
+                    yield self._lines[j]
+            if origin is None or self._modified[i]:
+                yield self.targets[i].to_starlist(**kwargs)
+            else:
+                yield self._lines[origin]
+        for j in pending:
+            yield self._lines[j]
+
+    def to_string(self, **kwargs):
+        """The document as a string."""
+        return "".join(line + "\n" for line in self.lines(**kwargs))
+
+    def save(self, filename=None, **kwargs):
+        """Write the document, and treat the written lines as the original text from now on.
+
+        Parameters
+        ----------
+        filename : string, optional
+            Where to write the document. By default, the file it was read from.
+
+        """
+        filename = self.filename if filename is None else filename
+        if filename is None:
+            raise ValueError("{0:s} has no filename to save to.".format(self.__class__.__name__))
+        lines = list(self.lines(**kwargs))
+        with io.open(filename, 'w') as stream:
+            for line in lines:
+                stream.write(six.text_type(line + "\n"))
+        self.filename = filename
+        # Keep the same target list, so that references to it stay valid.
+        self._lines = lines
+        self._origin = [ i for i, line in enumerate(lines) if self._is_target(line) ]
+        self._modified = [False] * len(self._origin)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+:mod:`guidestars` finds and ranks guide (tip-tilt) stars for science targets.
+
+Candidates within a search radius are ranked by a magnitude keyword (brightest
+first), and then by separation. The search uses the KD-tree from
+:meth:`~KOPy.targets.TargetList.crossmatch`, which is cached on the candidate
+catalog, so many searches against the same candidates are cheap.
+
+For example::
+
+    >>> from KOPy.targets import TargetList
+    >>> targets = TargetList.from_starlist("starlist.txt") # doctest: +SKIP
+    >>> finder = GuideStarFinder(targets, radius=80 * u.arcsec, magnitude='rmag') # doctest: +SKIP
+    >>> finder.best(targets['IRASF08572+3915']) # doctest: +SKIP
+    <Target 'tt020'@... rmag=13.66, ...>
+
+"""
+
+import numpy as np
+import astropy.units as u
+from astropy.coordinates import Angle
+
+from .targets import TargetList, CrossMatch
+
+__all__ = ['GuideStarFinder']
+
+def _keyword_as_float(value):
+    """Convert a keyword value to a float, or NaN when it can't be converted."""
+    try:
+        return float(getattr(value, 'value', value))
+    except (TypeError, ValueError):
+        return np.nan
+
+class GuideStarFinder(object):
+    """Find guide stars for targets from a list of candidates.
+
+    Parameters
+    ----------
+    candidates : :class:`~KOPy.targets.TargetList`
+        The candidate guide stars. This can be the same starlist as the
+        science targets, or a local catalog.
+    radius : :class:`~astropy.units.Quantity`
+        The maximum separation between a target and its guide star.
+    magnitude : string
+        The keyword used to rank candidates. Candidates without this keyword
+        are ranked after all candidates which have it.
+    limit : float, optional
+        The faintest acceptable magnitude. When set, candidates without the
+        magnitude keyword are rejected.
+    min_separation : :class:`~astropy.units.Quantity`
+        Candidates must be further than this from the target. The default
+        rejects a target as its own guide star.
+
+    Notes
+    -----
+    Candidate magnitudes are extracted once, on first use. Create a new finder
+    if the candidate list changes.
+
+    """
+    def __init__(self, candidates, radius=60 * u.arcsec, magnitude='rmag', limit=None, min_separation=0 * u.arcsec):
+        super(GuideStarFinder, self).__init__()
+        self.candidates = candidates if isinstance(candidates, TargetList) else TargetList(candidates)
+        self.radius = Angle(radius)
+        self.magnitude = magnitude
+        self.limit = limit
+        self.min_separation = Angle(min_separation)
+        self._magnitudes = None
+
+    @property
+    def magnitudes(self):
+        """The ranking magnitude for each candidate, NaN where it is missing."""
+        if self._magnitudes is None:
+            self._magnitudes = np.array([ _keyword_as_float(t.keywords.get(self.magnitude, np.nan))
+                for t in self.candidates ], dtype=np.float64)
+        return self._magnitudes
+
+    def _rank(self, match):
+        """Filter and sort the pairs in a match so that each target's best candidate comes first."""
+        magnitudes = self.magnitudes[match.other_index]
+        keep = match.separation > self.min_separation
+        if self.limit is not None:
+            with np.errstate(invalid='ignore'):
+                keep &= magnitudes <= self.limit
+        magnitudes = np.where(np.isnan(magnitudes), np.inf, magnitudes)[keep]
+        index, other_index, separation = match.index[keep], match.other_index[keep], match.separation[keep]
+        order = np.lexsort((separation.radian, magnitudes, index))
+        return index[order], other_index[order], separation[order]
+
+    def find(self, target):
+        """Find all acceptable guide stars for a single target.
+
+        Parameters
+        ----------
+        target : :class:`~KOPy.targets.Target`
+            The science target.
+
+        Returns
+        -------
+        guidestars : :class:`~KOPy.targets.TargetList`
+            Acceptable candidates, best first.
+
+        """
+        _, other_index, _ = self._rank(TargetList([target]).crossmatch(self.candidates, self.radius))
+        return TargetList(self.candidates[i] for i in other_index)
+
+    def best(self, target):
+        """Find the best guide star for a single target, or ``None`` if there are no acceptable candidates."""
+        guidestars = self.find(target)
+        if not len(guidestars):
+            return None
+        return guidestars[0]
+
+    def assign(self, targets):
+        """Assign the best guide star to every target in a list, in a single pass.
+
+        Parameters
+        ----------
+        targets : :class:`~KOPy.targets.TargetList`
+            The science targets.
+
+        Returns
+        -------
+        assignment : :class:`~KOPy.targets.CrossMatch`
+            ``index`` and ``other_index`` hold the target and guide star
+            indices for each target with a guide star, and ``unmatched`` holds
+            the indices of targets without an acceptable guide star.
+            ``other_unmatched`` holds candidates which were not assigned.
+
+        """
+        if not isinstance(targets, TargetList):
+            targets = TargetList(targets)
+        index, other_index, separation = self._rank(targets.crossmatch(self.candidates, self.radius))
+        _, first = np.unique(index, return_index=True)
+        index, other_index, separation = index[first], other_index[first], separation[first]
+
+        assigned = np.zeros((len(targets),), dtype=bool)
+        assigned[index] = True
+        used = np.zeros((len(self.candidates),), dtype=bool)
+        used[other_index] = True
+        return CrossMatch(index, other_index, separation, np.flatnonzero(~assigned), np.flatnonzero(~used))
+
@@ -121,11 +121,13 @@ def main(args=None):
     parser.add_argument('--output', help='Output region name', type=argparse.FileType('w'))
     parser.add_argument('--ds9', help='Open with DS9', action='store_true')
     parser.add_argument('--imdir', help='Image directory', type=six.text_type, default=os.path.relpath(os.getcwd()))
+    parser.add_argument('--magnitude', help='Starlist keyword used to rank guide stars', type=six.text_type, default='rmag')
     
     opt = parser.parse_args(args)
     
     from .ddf import DataDefinitionFile
     from ...targets import TargetList
+    from ...guidestars import GuideStarFinder
     
     print("Parsing DDF '{}'".format(opt.ddf))
     ddf = DataDefinitionFile.from_file(opt.ddf)
@@ -136,12 +138,14 @@ def main(args=None):
     targets = TargetList.from_starlist(opt.starlist)
     
     target = targets[opt.target]
-    guidestar = targets[targets.index(target) + 1]
-    if guidestar.position.separation(target.position) > 80 * u.arcsec:
-        guidestar = None
+    guidestar = GuideStarFinder(targets, radius=80 * u.arcsec, magnitude=opt.magnitude).best(target)
+    if guidestar is None:
+        print("No guide star found within 80 arcsec of '{}'".format(target.name))
+    else:
+        print("Using guide star '{}'".format(guidestar.name))
     
     print("Creating region file.")
-    regions = create_region_from_DDF(ddf, target.position, guidestar.position)
+    regions = create_region_from_DDF(ddf, target.position, guidestar.position if guidestar is not None else None)
     
     if opt.output is None: 
         opt.output = open("{}-auto.reg".format(target.name), 'w')
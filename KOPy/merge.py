@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+:mod:`merge` compares and merges starlists, line by line.
+
+Starlists are read one line at a time into compact :class:`StarlistEntry`
+records, which keep the line text, the name and the unparsed position
+tokens, so large files can be compared without creating
+:class:`~KOPy.targets.Target` or :class:`~astropy.coordinates.SkyCoord`
+objects. Entries are matched by name with a hash table. Entries which don't
+match by name, e.g. because they were renamed, are matched by position with a
+spatial hash. A name which appears several times is matched occurrence by
+occurrence. Lines which can't be parsed are kept as entries without a
+position, which only match an identical line.
+
+:func:`diff_starlists` returns the :class:`Edit` objects which turn one
+starlist into another. Lines which only differ in spacing are not changed.
+:func:`merge_starlists` combines the edits made to a shared starlist by two
+observers, and reports a :class:`Conflict` where they edited the same entry
+differently. :func:`apply_edits` writes the edited starlist, keeping the
+comments and layout of the unchanged lines.
+
+For example::
+
+    >>> result = merge_starlists("base.txt", "alice.txt", "bob.txt") # doctest: +SKIP
+    >>> for conflict in result.conflicts: # doctest: +SKIP
+    ...     print(conflict)
+    >>> apply_edits("base.txt", result.edits, "merged.txt") # doctest: +SKIP
+
+"""
+
+import io
+import collections
+import six
+import numpy as np
+import astropy.units as u
+from astropy.coordinates import Angle
+from astropy.utils.data import get_readable_fileobj
+
+from .starlist import _split_starlist_line, _sexagesimal_to_float
+from .targets import _coincident_pairs
+
+__all__ = ['StarlistEntry', 'read_entries', 'Edit', 'diff_starlists', 'apply_edits',
+    'Conflict', 'MergeResult', 'merge_starlists']
+
+class StarlistEntry(collections.namedtuple('StarlistEntry', ['key', 'line', 'text', 'position', 'keywords'])):
+    """A single line of a starlist.
+
+    Attributes
+    ----------
+    key : tuple
+        The target name, and how many times the name has already appeared in
+        the file, which identifies the entry. For a line which can't be
+        parsed, the whole line is used as the name.
+    line : int
+        The line number in the file, starting at 1.
+    text : string
+        The line, without the line ending.
+    position : :class:`~KOPy.starlist.StarlistPosition` or None
+        The unparsed position tokens, or None when the line can't be parsed.
+    keywords : tuple
+        The unparsed ``key=value`` tokens.
+
+    """
+    __slots__ = ()
+
+    @property
+    def name(self):
+        """The target name."""
+        return self.key[0]
+
+    @property
+    def content(self):
+        """The name, position and keywords in a standard form.
+
+        This is equal for two lines when they only differ in spacing or in
+        the precision of the position. The position is in milliarcseconds.
+        Lines which can't be parsed are compared verbatim.
+        """
+        if self.position is None:
+            return (self.name,)
+        scale = 1.0 if self.position.equinox == '' else 15.0
+        return (self.name, _milliarcseconds(self.position.ra, scale), _milliarcseconds(self.position.dec, 1.0),
+            self.position.equinox, self.keywords)
+
+
+class Edit(collections.namedtuple('Edit', ['operation', 'line', 'old', 'new'])):
+    """A change to one line of a starlist.
+
+    Attributes
+    ----------
+    operation : string
+        ``'replace'``, ``'delete'`` or ``'insert'``.
+    line : int
+        The line changed, or for ``'insert'``, the line the new entry is
+        inserted after, where 0 is the start of the file.
+    old : :class:`StarlistEntry` or None
+        The original entry, except for ``'insert'``.
+    new : :class:`StarlistEntry` or None
+        The new entry, except for ``'delete'``.
+
+    """
+    __slots__ = ()
+
+
+class Conflict(collections.namedtuple('Conflict', ['line', 'base', 'ours', 'theirs'])):
+    """Two different edits to the same entry of a starlist.
+
+    Attributes
+    ----------
+    line : int
+        The line in the original starlist.
+    base : :class:`StarlistEntry` or None
+        The original entry, or None when both sides inserted a new entry
+        with the same name.
+    ours : :class:`Edit`
+        Our edit.
+    theirs : :class:`Edit`
+        Their edit.
+
+    """
+    __slots__ = ()
+
+
+class MergeResult(collections.namedtuple('MergeResult', ['edits', 'conflicts'])):
+    """The result of :func:`merge_starlists`.
+
+    Attributes
+    ----------
+    edits : list of :class:`Edit`
+        The merged edits to the original starlist, for :func:`apply_edits`.
+    conflicts : list of :class:`Conflict`
+        The entries which were edited differently by both sides.
+
+    """
+    __slots__ = ()
+
+
+def _milliarcseconds(token, scale):
+    """A sexagesimal token as an integer number of milliarcseconds."""
+    return int(round(_sexagesimal_to_float(token) * scale * 3600000))
+
+def read_entries(filename, comments="#"):
+    """Read a starlist one line at a time, yielding a :class:`StarlistEntry` for each target.
+
+    Parameters
+    ----------
+    filename : string or file object
+        The starlist.
+    comments : string
+        The string at the start of comment lines, which are skipped.
+
+    """
+    occurrences = collections.defaultdict(int)
+    with get_readable_fileobj(filename) as stream:
+        for number, line in enumerate(stream, 1):
+            text = line.rstrip("\n\r")
+            if text.startswith(comments) or not text.strip():
+                continue
+            try:
+                # Keywords are kept as text, which avoids converting them to quantities.
+                name, position, keywords = _split_starlist_line(text.strip())
+            except ValueError:
+                name, position, keywords = text.strip(), None, ""
+            key = (name, occurrences[name])
+            occurrences[name] += 1
+            yield StarlistEntry(key, number, text, position, tuple(keywords.split()))
+
+def _unit_vectors(entries):
+    """Unit vectors for the positions of entries, with shape ``(n, 3)``."""
+    contents = [ entry.content for entry in entries ]
+    ra = np.radians([ content[1] / 3600000.0 for content in contents ])
+    dec = np.radians([ content[2] / 3600000.0 for content in contents ])
+    return np.stack([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)], axis=-1).reshape((-1, 3))
+
+def _match_positions(base, other, tolerance):
+    """Pair unmatched entries which are at the same position, closest pairs first."""
+    base = [ entry for entry in base if entry.position is not None ]
+    other = [ entry for entry in other if entry.position is not None ]
+    if not base or not other:
+        return []
+    vectors = np.concatenate([_unit_vectors(base), _unit_vectors(other)])
+    i, j = _coincident_pairs(vectors, tolerance)
+    n = len(base)
+    between = (i < n) & (j >= n)
+    i, j = i[between], j[between] - n
+    # Coordinates in different equinoxes can't be compared directly.
+    same = np.array([ base[a].position.equinox == other[b].position.equinox for a, b in zip(i, j) ], dtype=bool)
+    i, j = i[same], j[same]
+    order = np.argsort(-np.sum(vectors[i] * vectors[j + n], axis=1), kind='mergesort')
+    pairs, used, other_used = [], set(), set()
+    for a, b in zip(i[order], j[order]):
+        if a not in used and b not in other_used:
+            used.add(a)
+            other_used.add(b)
+            pairs.append((base[a], other[b]))
+    return pairs
+
+def _sort_edits(edits):
+    """Sort edits into the order they apply, with inserts after changes to the same line."""
+    return sorted(edits, key=lambda edit: (edit.line, edit.operation == 'insert'))
+
+def diff_starlists(base, other, tolerance=1 * u.arcsec, comments="#"):
+    """Find the edits which turn one starlist into another.
+
+    Only ``other`` is held in memory, as :class:`StarlistEntry` records;
+    ``base`` is read one line at a time.
+
+    Parameters
+    ----------
+    base : string or file object
+        The original starlist.
+    other : string or file object
+        The edited starlist.
+    tolerance : :class:`~astropy.units.Quantity`
+        Entries whose names don't match are matched when their positions are
+        closer than this.
+    comments : string
+        The string at the start of comment lines, which are skipped.
+
+    Returns
+    -------
+    edits : list of :class:`Edit`
+        The edits, in the order they apply to ``base``. Entries which only
+        moved within the file are not changed.
+
+    """
+    entries = list(read_entries(other, comments))
+    index = dict((entry.key, i) for i, entry in enumerate(entries))
+    matched = [None] * len(entries)
+    unmatched = []
+    edits = []
+    for entry in read_entries(base, comments):
+        i = index.pop(entry.key, None)
+        if i is None:
+            unmatched.append(entry)
+            continue
+        matched[i] = entry
+        # Only parse the positions when the lines aren't identical.
+        if entries[i].text != entry.text and entries[i].content != entry.content:
+            edits.append(Edit('replace', entry.line, entry, entries[i]))
+
+    for entry, new in _match_positions(unmatched, [ entries[i] for i in sorted(index.values()) ], Angle(tolerance)):
+        matched[index[new.key]] = entry
+        edits.append(Edit('replace', entry.line, entry, new))
+    paired = set(entry.line for entry in matched if entry is not None)
+    edits.extend(Edit('delete', entry.line, entry, None) for entry in unmatched if entry.line not in paired)
+
+    # New entries go after the nearest earlier entry which is also in the original.
+    anchor = 0
+    for entry, original in zip(entries, matched):
+        if original is None:
+            edits.append(Edit('insert', anchor, None, entry))
+        else:
+            anchor = original.line
+    return _sort_edits(edits)
+
+def apply_edits(base, edits, output=None):
+    """Apply edits to a starlist, keeping the comments and layout of unchanged lines.
+
+    Parameters
+    ----------
+    base : string or file object
+        The original starlist.
+    edits : list of :class:`Edit`
+        The edits, from :func:`diff_starlists` or :func:`merge_starlists`.
+    output : string or file object, optional
+        Where to write the new starlist. By default, the new starlist is
+        returned as a string.
+
+    """
+    changes = collections.defaultdict(list)
+    for edit in edits:
+        changes[edit.line].append(edit)
+
+    def _lines():
+        """Yield the lines of the new starlist."""
+        for edit in _sort_edits(changes.pop(0, [])):
+            yield edit.new.text
+        with get_readable_fileobj(base) as stream:
+            for number, line in enumerate(stream, 1):
+                text = line.rstrip("\n\r")
+                here = changes.pop(number, ())
+                for edit in here:
+                    if edit.operation == 'delete':
+                        text = None
+                    elif edit.operation == 'replace':
+                        text = edit.new.text
+                if text is not None:
+                    yield text
+                for edit in here:
+                    if edit.operation == 'insert':
+                        yield edit.new.text
+
+    if output is None:
+        return "".join(line + "\n" for line in _lines())
+    if isinstance(output, six.string_types):
+        with io.open(output, 'w') as stream:
+            for line in _lines():
+                stream.write(six.text_type(line + "\n"))
+    else:
+        for line in _lines():
+            output.write(line + "\n")
+
+def merge_starlists(base, ours, theirs, prefer='ours', tolerance=1 * u.arcsec, comments="#"):
+    """Merge the edits made to a starlist by two people.
+
+    Parameters
+    ----------
+    base : string or file object
+        The starlist both people started from.
+    ours : string or file object
+        Our edited starlist.
+    theirs : string or file object
+        Their edited starlist.
+    prefer : string or None
+        Which edit to keep when both sides edited the same entry differently:
+        ``'ours'``, ``'theirs'``, or None to keep the original entry.
+    tolerance : :class:`~astropy.units.Quantity`
+        Entries whose names don't match are matched when their positions are
+        closer than this.
+    comments : string
+        The string at the start of comment lines, which are skipped.
+
+    Returns
+    -------
+    result : :class:`MergeResult`
+        The merged edits to ``base``, and the conflicts.
+
+    """
+    if prefer not in ('ours', 'theirs', None):
+        raise ValueError("Can't prefer {0!r}, use 'ours', 'theirs' or None.".format(prefer))
+    sides = [ diff_starlists(base, other, tolerance, comments) for other in (ours, theirs) ]
+    changes = [ dict((edit.line, edit) for edit in edits if edit.operation != 'insert') for edits in sides ]
+    inserts = [ collections.OrderedDict((edit.new.key, edit) for edit in edits if edit.operation == 'insert')
+        for edits in sides ]
+
+    edits, conflicts = [], []
+    def _resolve(base_entry, line, mine, yours):
+        """Keep one of two edits to the same entry, and record a conflict if they differ."""
+        if mine is None or yours is None:
+            edits.append(mine or yours)
+        elif mine.operation == yours.operation and (mine.new is None or mine.new.text == yours.new.text
+            or mine.new.content == yours.new.content):
+            edits.append(mine)
+        else:
+            conflicts.append(Conflict(line, base_entry, mine, yours))
+            if prefer is not None:
+                edits.append(mine if prefer == 'ours' else yours)
+
+    for line in sorted(set(changes[0]) | set(changes[1])):
+        mine, yours = changes[0].get(line, None), changes[1].get(line, None)
+        _resolve((mine or yours).old, line, mine, yours)
+    for key in list(inserts[0]) + [ key for key in inserts[1] if key not in inserts[0] ]:
+        mine, yours = inserts[0].get(key, None), inserts[1].get(key, None)
+        _resolve(None, (mine or yours).line, mine, yours)
+    return MergeResult(_sort_edits(edits), conflicts)
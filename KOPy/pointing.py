@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+:mod:`pointing` checks targets against the Keck telescope pointing limits.
+
+Both Keck telescopes can point down to 18 degrees elevation, except where
+the Nasmyth deck blocks the view. For Keck I the deck is between azimuths
+5.3 and 146.2 degrees, where the limit is 33.3 degrees. For Keck II the deck
+is between azimuths 185.3 and 332.8 degrees, where the limit is 36.8 degrees.
+
+Limits are checked against a :class:`~KOPy.visibility.Visibility` grid, so
+checking a whole target list over a night is a few NumPy operations, and
+reuses the cached horizon transforms from :mod:`~KOPy.visibility`.
+
+For example::
+
+    >>> from KOPy.targets import TargetList
+    >>> targets = TargetList.from_starlist("starlist.txt") # doctest: +SKIP
+    >>> access = pointing_access(targets, times) # doctest: +SKIP
+    >>> access['Keck II'].mask.shape == (len(targets), len(times)) # doctest: +SKIP
+    True
+
+"""
+
+import collections
+import numpy as np
+import astropy.units as u
+from astropy.coordinates import Angle
+
+from .visibility import visibility_grid
+
+__all__ = ['PointingLimits', 'Access', 'KECK1', 'KECK2', 'TELESCOPES', 'pointing_access']
+
+class Access(collections.namedtuple('Access', ['telescope', 'mask', 'target', 'start', 'end'])):
+    """The result of :meth:`PointingLimits.access`.
+
+    Attributes
+    ----------
+    telescope : :class:`PointingLimits`
+        The telescope which was checked.
+    mask : array
+        A boolean array of shape ``(targets, times)``, true where the target
+        is within the pointing limits.
+    target : array
+        The target index for each accessible window.
+    start : :class:`~astropy.time.Time`
+        The first time in each accessible window.
+    end : :class:`~astropy.time.Time`
+        The last time in each accessible window.
+
+    """
+    __slots__ = ()
+
+    def windows(self, index):
+        """The start and end times of each accessible window for the target at ``index``."""
+        selected = self.target == index
+        return self.start[selected], self.end[selected]
+
+
+class PointingLimits(object):
+    """The elevation limits of a telescope, including a blocked range of azimuth.
+
+    Parameters
+    ----------
+    name : string
+        The name of the telescope.
+    minimum : :class:`~astropy.units.Quantity`
+        The lowest elevation the telescope can reach.
+    deck_azimuth : tuple of :class:`~astropy.units.Quantity`
+        The azimuth range (east of north) blocked by the Nasmyth deck. The
+        range may wrap through north.
+    deck_minimum : :class:`~astropy.units.Quantity`
+        The lowest elevation the telescope can reach in ``deck_azimuth``.
+    maximum : :class:`~astropy.units.Quantity`
+        The highest elevation the telescope can track.
+
+    """
+    def __init__(self, name, minimum, deck_azimuth, deck_minimum, maximum=90 * u.degree):
+        super(PointingLimits, self).__init__()
+        self.name = name
+        self.minimum = Angle(minimum)
+        self.deck_azimuth = tuple(Angle(azimuth) for azimuth in deck_azimuth)
+        self.deck_minimum = Angle(deck_minimum)
+        self.maximum = Angle(maximum)
+
+    def __repr__(self):
+        """Represent these limits."""
+        return "<{0:s} '{1:s}' el>{2:.1f} (el>{3:.1f} for {4:.1f}<az<{5:.1f})>".format(
+            self.__class__.__name__, self.name, self.minimum.degree, self.deck_minimum.degree,
+            self.deck_azimuth[0].degree, self.deck_azimuth[1].degree)
+
+    def minimum_altitude(self, azimuth):
+        """The lowest elevation the telescope can reach at each azimuth.
+
+        Parameters
+        ----------
+        azimuth : :class:`~astropy.units.Quantity`
+            An array of azimuths.
+
+        Returns
+        -------
+        altitude : :class:`~astropy.units.Quantity`
+            The limit, with the same shape as ``azimuth``.
+
+        """
+        azimuth = np.mod(u.Quantity(azimuth, u.degree).value, 360.0)
+        start, end = (np.mod(limit.degree, 360.0) for limit in self.deck_azimuth)
+        if start <= end:
+            deck = (azimuth >= start) & (azimuth <= end)
+        else:
+            deck = (azimuth >= start) | (azimuth <= end)
+        return np.where(deck, self.deck_minimum.degree, self.minimum.degree) * u.degree
+
+    def observable(self, altitude, azimuth):
+        """A boolean mask, true where positions are within the pointing limits."""
+        altitude = u.Quantity(altitude, u.degree)
+        return (altitude >= self.minimum_altitude(azimuth)) & (altitude <= self.maximum)
+
+    def access(self, visibility):
+        """Check a visibility grid against these limits.
+
+        Parameters
+        ----------
+        visibility : :class:`~KOPy.visibility.Visibility`
+            The positions of the targets over time.
+
+        Returns
+        -------
+        access : :class:`Access`
+            The mask, and the accessible windows.
+
+        """
+        mask = self.observable(visibility.altitude, visibility.azimuth)
+
+        # Find the edges of each run of accessible times, along the time axis.
+        padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+        padded[:,1:-1] = mask
+        edges = np.diff(padded, axis=1)
+        target, start = np.nonzero(edges == 1)
+        _, end = np.nonzero(edges == -1)
+        times = visibility.times
+        return Access(self, mask, target, times[start], times[end - 1])
+
+
+KECK1 = PointingLimits("Keck I", minimum=18 * u.degree,
+    deck_azimuth=(5.3 * u.degree, 146.2 * u.degree), deck_minimum=33.3 * u.degree)
+"""Pointing limits for Keck I."""
+
+KECK2 = PointingLimits("Keck II", minimum=18 * u.degree,
+    deck_azimuth=(185.3 * u.degree, 332.8 * u.degree), deck_minimum=36.8 * u.degree)
+"""Pointing limits for Keck II."""
+
+TELESCOPES = collections.OrderedDict((limits.name, limits) for limits in (KECK1, KECK2))
+"""Pointing limits for each Keck telescope, by name."""
+
+def pointing_access(targets, times, telescopes=None):
+    """Check which targets each telescope can point to, over a grid of times.
+
+    Parameters
+    ----------
+    targets : :class:`~KOPy.targets.TargetList` or :class:`~astropy.coordinates.SkyCoord`
+        The targets.
+    times : :class:`~astropy.time.Time`
+        The times.
+    telescopes : sequence of :class:`PointingLimits`, optional
+        The telescopes to check, which default to both Keck telescopes.
+
+    Returns
+    -------
+    access : OrderedDict
+        The :class:`Access` result for each telescope, by name.
+
+    """
+    telescopes = TELESCOPES.values() if telescopes is None else telescopes
+    coords = targets.catalog() if hasattr(targets, 'catalog') else targets
+    visibility = visibility_grid(coords, times)
+    return collections.OrderedDict((limits.name, limits.access(visibility)) for limits in telescopes)
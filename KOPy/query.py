@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+:mod:`query` selects targets by their keywords, using NumPy.
+
+Queries are built from :class:`Keyword` objects with comparison operators,
+and combined with ``&``, ``|`` and ``~``. Each keyword is extracted once into
+a :class:`KeywordColumn`, a typed array with a mask for targets which don't
+have the keyword, and the columns are cached by
+:meth:`~KOPy.targets.TargetList.column` until the list changes.
+
+For example::
+
+    >>> from KOPy.targets import TargetList
+    >>> targets = TargetList.from_starlist("starlist.txt") # doctest: +SKIP
+    >>> bright = (Keyword('vmag') < 10) & (Keyword('lgs') == 1) & Keyword('sptype').startswith('A') # doctest: +SKIP
+    >>> targets.where(bright) # doctest: +SKIP
+    array([ 3, 17, 42])
+    >>> targets.select(bright) # doctest: +SKIP
+    [<Target ...>, ...]
+
+Targets which don't have a keyword never match a comparison on it, so
+``~(Keyword('vmag') < 10)`` matches targets without a ``vmag``. Use
+:meth:`Keyword.exists` to require the keyword.
+
+"""
+
+import operator
+import collections
+import six
+import numpy as np
+import astropy.units as u
+
+__all__ = ['KeywordColumn', 'keyword_column', 'Keyword', 'Expression']
+
+class KeywordColumn(collections.namedtuple('KeywordColumn', ['name', 'data', 'mask', 'unit'])):
+    """The values of one keyword for every target in a list.
+
+    Attributes
+    ----------
+    name : string
+        The keyword.
+    data : array
+        The values, as floats when every value is a number (or a number as
+        text), and as text otherwise. Missing values are filled with 0 or
+        an empty string.
+    mask : array
+        True for targets without the keyword.
+    unit : :class:`~astropy.units.Unit` or None
+        The unit, when every value is a :class:`~astropy.units.Quantity`.
+
+    """
+    __slots__ = ()
+
+    @property
+    def numeric(self):
+        """Whether this column holds numbers."""
+        return self.data.dtype.kind in 'biuf'
+
+
+def _as_floats(values):
+    """Convert values to an array of floats, or return ``None`` if any can't be converted."""
+    try:
+        return np.array([ float(value) for value in values ], dtype=np.float64)
+    except (TypeError, ValueError):
+        return None
+
+def keyword_column(targets, name):
+    """Extract a keyword from every target into a :class:`KeywordColumn`.
+
+    Parameters
+    ----------
+    targets : iterable of :class:`~KOPy.targets.Target`
+        The targets.
+    name : string
+        The keyword.
+
+    """
+    rows, values = [], []
+    n = 0
+    for i, target in enumerate(targets):
+        n += 1
+        if name in target.keywords:
+            rows.append(i)
+            values.append(target.keywords[name])
+
+    unit = None
+    if values and all(isinstance(value, u.Quantity) for value in values):
+        unit = values[0].unit
+        data = np.array([ value.to(unit).value for value in values ], dtype=np.float64)
+    else:
+        data = _as_floats(values)
+        if data is None:
+            data = np.array([ six.text_type(value) for value in values ], dtype=six.text_type)
+
+    buffer = np.zeros((n,), dtype=data.dtype if len(values) else np.float64)
+    buffer[rows] = data
+    mask = np.ones((n,), dtype=bool)
+    mask[rows] = False
+    return KeywordColumn(name, buffer, mask, unit)
+
+class Expression(object):
+    """A condition on target keywords, which can be combined with ``&``, ``|`` and ``~``.
+
+    Parameters
+    ----------
+    function : callable
+        Takes a function which returns a :class:`KeywordColumn` by name, and
+        returns a boolean array.
+    description : string
+        A readable form of the expression.
+
+    """
+    def __init__(self, function, description):
+        super(Expression, self).__init__()
+        self.function = function
+        self.description = description
+
+    def __repr__(self):
+        """Represent this expression."""
+        return "<{0:s} {1:s}>".format(self.__class__.__name__, self.description)
+
+    def __call__(self, columns):
+        """Evaluate this expression, given a function which returns columns by name."""
+        return self.function(columns)
+
+    def __and__(self, other):
+        """Both expressions."""
+        return Expression(lambda columns: self(columns) & other(columns),
+            "({0:s} & {1:s})".format(self.description, other.description))
+
+    def __or__(self, other):
+        """Either expression."""
+        return Expression(lambda columns: self(columns) | other(columns),
+            "({0:s} | {1:s})".format(self.description, other.description))
+
+    def __invert__(self):
+        """Not this expression."""
+        return Expression(lambda columns: ~self(columns), "~{0:s}".format(self.description))
+
+
+class Keyword(object):
+    """A target keyword, for building :class:`Expression` objects.
+
+    Parameters
+    ----------
+    name : string
+        The keyword.
+
+    """
+    __hash__ = None
+
+    def __init__(self, name):
+        super(Keyword, self).__init__()
+        self.name = name
+
+    def __repr__(self):
+        """Represent this keyword."""
+        return "{0:s}({1!r})".format(self.__class__.__name__, self.name)
+
+    def _compare(self, op, symbol, value):
+        """Build an expression comparing this keyword with a value."""
+        name = self.name
+        def function(columns):
+            column = columns(name)
+            result = _compare(column, op, value)
+            return result & ~column.mask
+        return Expression(function, "{0:s} {1:s} {2!r}".format(name, symbol, value))
+
+    def __lt__(self, value):
+        """Match targets where this keyword is less than ``value``."""
+        return self._compare(operator.lt, "<", value)
+
+    def __le__(self, value):
+        """Match targets where this keyword is less than or equal to ``value``."""
+        return self._compare(operator.le, "<=", value)
+
+    def __gt__(self, value):
+        """Match targets where this keyword is greater than ``value``."""
+        return self._compare(operator.gt, ">", value)
+
+    def __ge__(self, value):
+        """Match targets where this keyword is greater than or equal to ``value``."""
+        return self._compare(operator.ge, ">=", value)
+
+    def __eq__(self, value):
+        """Match targets where this keyword is equal to ``value``."""
+        return self._compare(operator.eq, "==", value)
+
+    def __ne__(self, value):
+        """Match targets where this keyword is not equal to ``value``."""
+        return self._compare(operator.ne, "!=", value)
+
+    def isin(self, values):
+        """Match targets where this keyword is one of ``values``."""
+        values = list(values)
+        return self._compare(lambda data, converted: np.in1d(data, converted), "in", values)
+
+    def _text(self, method, value):
+        """Build an expression calling a string method on the keyword text."""
+        name = self.name
+        def function(columns):
+            column = columns(name)
+            data = column.data.astype(six.text_type) if column.numeric else column.data
+            return getattr(np.char, method)(data, value).astype(bool) & ~column.mask
+        return Expression(function, "{0:s}.{1:s}({2!r})".format(name, method, value))
+
+    def startswith(self, prefix):
+        """Match targets where this keyword's text starts with ``prefix``."""
+        return self._text('startswith', prefix)
+
+    def endswith(self, suffix):
+        """Match targets where this keyword's text ends with ``suffix``."""
+        return self._text('endswith', suffix)
+
+    def contains(self, text):
+        """Match targets where this keyword's text contains ``text``."""
+        name = self.name
+        def function(columns):
+            column = columns(name)
+            data = column.data.astype(six.text_type) if column.numeric else column.data
+            return (np.char.find(data, text) >= 0) & ~column.mask
+        return Expression(function, "{0:s}.contains({1!r})".format(name, text))
+
+    def exists(self):
+        """Match targets which have this keyword."""
+        name = self.name
+        return Expression(lambda columns: ~columns(name).mask, "{0:s}.exists()".format(name))
+
+
+def _compare(column, op, value):
+    """Compare a column with a value, converting the value to match the column.
+
+    Text which isn't a number is never equal to a number in a numeric
+    column, so only ``!=`` matches it.
+    """
+    if column.numeric:
+        if isinstance(value, six.string_types):
+            value = _as_floats([value])
+            if value is None:
+                return np.full(column.data.shape, op is operator.ne, dtype=bool)
+            value = value[0]
+        elif isinstance(value, (list, tuple)):
+            # Leave out text which isn't a number, since it can't match.
+            value = [ item for item in value if not isinstance(item, six.string_types) or _as_floats([item]) is not None ]
+            value = [ float(item) if isinstance(item, six.string_types) else item for item in value ]
+        if column.unit is not None:
+            value = u.Quantity(value, column.unit).value
+        elif isinstance(value, u.Quantity):
+            value = value.value
+        elif isinstance(value, list):
+            value = np.asarray(value, dtype=np.float64)
+    elif isinstance(value, (list, tuple)):
+        value = [ six.text_type(item) for item in value ]
+    else:
+        value = six.text_type(value)
+    return np.asarray(op(column.data, value), dtype=bool)
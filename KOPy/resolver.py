@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+:mod:`resolver` resolves object names to positions, with a persistent local cache.
+
+Names are looked up in a :class:`NameCache` first. Names which aren't in the
+cache are sent to a resolver, a callable which takes a name and returns a
+:class:`~astropy.coordinates.SkyCoord`, several at a time, and the results
+are saved to the cache. The default resolver is
+:meth:`~astropy.coordinates.SkyCoord.from_name`, which queries Sesame over the
+network. :class:`FileResolver` resolves names from a local starlist instead,
+for offline use.
+
+For example::
+
+    >>> from KOPy.targets import TargetList
+    >>> targets = TargetList.from_names(["M31", "M33"]) # doctest: +SKIP
+    >>> targets = TargetList.from_names(["M31"], resolver=FileResolver("local.txt")) # doctest: +SKIP
+
+"""
+
+import os
+import io
+import json
+import tempfile
+import warnings
+import numpy as np
+import astropy.units as u
+from multiprocessing.pool import ThreadPool
+from astropy.config.paths import get_cache_dir
+from astropy.coordinates import SkyCoord
+from astropy.coordinates.name_resolve import NameResolveError
+
+from .starlist import read_skip_comments, parse_starlist_line
+
+__all__ = ['NameCache', 'FileResolver', 'sesame_resolver', 'resolve_names']
+
+# os.rename can't replace an existing file on Windows, but os.replace is new in Python 3.3.
+_replace = getattr(os, 'replace', os.rename)
+
+def _normalize(name):
+    """The cache key for a name: case and runs of whitespace don't matter."""
+    return " ".join(name.split()).lower()
+
+def sesame_resolver(name):
+    """Resolve a name over the network with :meth:`~astropy.coordinates.SkyCoord.from_name`."""
+    return SkyCoord.from_name(name)
+
+class FileResolver(object):
+    """Resolve names from a local starlist, for use offline.
+
+    Parameters
+    ----------
+    filename : str
+        A starlist, whose target names are matched (ignoring case and
+        whitespace) against the requested names.
+
+    """
+    def __init__(self, filename):
+        super(FileResolver, self).__init__()
+        self.filename = filename
+        self._positions = None
+
+    @property
+    def positions(self):
+        """The ICRS positions in the file, by normalized name."""
+        if self._positions is None:
+            positions = {}
+            for line in read_skip_comments(self.filename):
+                name, position, _ = parse_starlist_line(line)
+                positions[_normalize(name)] = position.transform_to('icrs')
+            self._positions = positions
+        return self._positions
+
+    def __call__(self, name):
+        """Resolve a single name."""
+        try:
+            return self.positions[_normalize(name)]
+        except KeyError:
+            raise NameResolveError("Unable to find coordinates for name '{0:s}' in '{1:s}'".format(name, self.filename))
+
+
+class NameCache(object):
+    """A persistent cache of resolved names, stored as JSON.
+
+    Parameters
+    ----------
+    filename : str, optional
+        The cache file. By default, a file in the astropy cache directory is used.
+
+    """
+    def __init__(self, filename=None):
+        super(NameCache, self).__init__()
+        if filename is None:
+            filename = os.path.join(get_cache_dir(), 'KOPy', 'names.json')
+        self.filename = filename
+        self._entries = None
+
+    @property
+    def entries(self):
+        """Cached (RA, Dec) in ICRS degrees, by normalized name.
+
+        A cache file which can't be read is treated as empty, with a warning,
+        and is replaced the next time the cache is saved.
+        """
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.filename):
+                try:
+                    with io.open(self.filename, 'r') as stream:
+                        entries = json.load(stream)
+                    if not isinstance(entries, dict):
+                        raise ValueError("Expected a JSON object, found {0:s}.".format(type(entries).__name__))
+                except (IOError, OSError, ValueError) as e:
+                    warnings.warn("Ignoring the name cache '{0:s}', which can't be read: {1!s}".format(self.filename, e))
+                else:
+                    self._entries = entries
+        return self._entries
+
+    def __contains__(self, name):
+        """Whether a name is in the cache."""
+        return _normalize(name) in self.entries
+
+    def __len__(self):
+        """Number of cached names."""
+        return len(self.entries)
+
+    def get(self, names):
+        """Look up names, returning (RA, Dec) in ICRS degrees, or ``None`` for names which aren't cached."""
+        return [ self.entries.get(_normalize(name), None) for name in names ]
+
+    def update(self, names, coords):
+        """Add resolved positions to the cache, and save it.
+
+        If the cache can't be saved, a warning is given, and the positions
+        are only kept in memory.
+
+        Parameters
+        ----------
+        names : sequence of str
+            The names.
+        coords : :class:`~astropy.coordinates.SkyCoord`
+            The positions, one for each name.
+
+        """
+        icrs = coords.transform_to('icrs')
+        for name, ra, dec in zip(names, icrs.ra.degree, icrs.dec.degree):
+            self.entries[_normalize(name)] = [float(ra), float(dec)]
+        try:
+            self.save()
+        except (IOError, OSError) as e:
+            warnings.warn("Couldn't save the name cache '{0:s}': {1!s}".format(self.filename, e))
+
+    def save(self):
+        """Write the cache to disk, replacing the file in one step."""
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.json')
+        try:
+            with os.fdopen(descriptor, 'w') as stream:
+                stream.write(json.dumps(self.entries, sort_keys=True, indent=0))
+            _replace(temporary, self.filename)
+        except Exception:
+            os.remove(temporary)
+            raise
+
+
+def resolve_names(names, cache=None, resolver=sesame_resolver, concurrency=4):
+    """Resolve many names to positions, using the cache first.
+
+    Parameters
+    ----------
+    names : sequence of str
+        The names to resolve.
+    cache : :class:`NameCache` or str, optional
+        The cache, or a cache filename. By default, the shared cache in the
+        astropy cache directory is used. Pass ``False`` to skip the cache.
+    resolver : callable
+        Resolves a single name to a :class:`~astropy.coordinates.SkyCoord`,
+        raising :class:`~astropy.coordinates.name_resolve.NameResolveError`
+        when it can't.
+    concurrency : int
+        The maximum number of names sent to the resolver at once.
+
+    Returns
+    -------
+    catalog : :class:`~astropy.coordinates.SkyCoord`
+        The ICRS positions, in the same order as ``names``.
+
+    Raises
+    ------
+    NameResolveError
+        If any names can't be resolved. Names which were resolved are still cached.
+
+    """
+    names = list(names)
+    if cache is False:
+        cached = [None] * len(names)
+    else:
+        cache = cache if isinstance(cache, NameCache) else NameCache(cache)
+        cached = cache.get(names)
+
+    # Send each distinct missing name to the resolver only once.
+    missing = list(set(_normalize(name) for name, entry in zip(names, cached) if entry is None))
+    originals = dict((_normalize(name), name) for name in names)
+    if missing:
+        def _resolve(key):
+            try:
+                return resolver(originals[key])
+            except NameResolveError:
+                return None
+        pool = ThreadPool(max(1, min(concurrency, len(missing))))
+        try:
+            results = pool.map(_resolve, missing)
+        finally:
+            pool.close()
+        resolved = {}
+        for key, coord in zip(missing, results):
+            if coord is not None:
+                coord = coord.transform_to('icrs')
+                resolved[key] = [float(coord.ra.degree), float(coord.dec.degree)]
+        if resolved and cache is not False:
+            keys = list(resolved.keys())
+            values = np.array([ resolved[key] for key in keys ])
+            cache.update([ originals[key] for key in keys ],
+                SkyCoord(values[:,0] * u.degree, values[:,1] * u.degree, frame='icrs'))
+        failed = sorted(originals[key] for key in missing if key not in resolved)
+        if failed:
+            raise NameResolveError("Unable to resolve names: {0:s}".format(", ".join(failed)))
+        cached = [ resolved[_normalize(name)] if entry is None else entry for name, entry in zip(names, cached) ]
+
+    values = np.array(cached, dtype=np.float64).reshape((-1, 2))
+    return SkyCoord(values[:,0] * u.degree, values[:,1] * u.degree, frame='icrs')
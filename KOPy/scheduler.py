@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+:mod:`scheduler` plans a night of observations from a target list, the
+telescope pointing limits and LCH closures.
+
+A :class:`Scheduler` computes the visibility grid for the night once. Each
+call to :meth:`Scheduler.plan` then builds a sequence from the current
+conditions:
+
+1. A greedy pass picks the next target by priority per unit of time spent
+   (slewing, waiting and observing).
+2. Local search inserts skipped targets where they fit, and swaps skipped
+   targets in for lower priority targets.
+3. 2-opt moves reduce the total slew, without changing which targets are
+   observed.
+
+Every observation must fit within the pointing limits, and for laser targets,
+within an LCH opening, for its whole duration. Re-planning during the night
+only rebuilds the accessibility tables, so it takes a fraction of a second
+for a typical starlist.
+
+For example::
+
+    >>> from KOPy.targets import TargetList
+    >>> from KOPy.closures import Regions
+    >>> targets = TargetList.from_starlist("starlist.txt") # doctest: +SKIP
+    >>> regions = Regions.parse("opensUnix150807.txt", date="2015-08-07") # doctest: +SKIP
+    >>> scheduler = Scheduler(targets, start, end, duration=20 * u.minute, priority='priority',
+    ...     limits=KECK1, regions=regions) # doctest: +SKIP
+    >>> plan = scheduler.plan() # doctest: +SKIP
+    >>> plan = scheduler.plan(now=Time.now(), exclude=observed, origin=observed[-1]) # doctest: +SKIP
+
+"""
+
+import six
+import numpy as np
+import astropy.units as u
+from astropy.time import Time
+from astropy.coordinates import SkyCoord
+
+from .visibility import visibility_grid
+from .slew import KECK_SLEW, Sequence, _Schedule, _two_opt, _time_grid
+
+__all__ = ['Scheduler']
+
+def _keyword_value(value, unit=None):
+    """Convert a keyword value to a float in ``unit``, or NaN when it can't be converted."""
+    try:
+        if unit is not None and isinstance(value, u.Quantity):
+            return value.to(unit).value
+        return float(value)
+    except (TypeError, ValueError, u.UnitsError):
+        return np.nan
+
+def _per_target(targets, value, n, unit=None):
+    """Expand a scalar, an array or a keyword name into one value for each target."""
+    if isinstance(value, six.string_types):
+        return np.array([ _keyword_value(t.keywords.get(value, np.nan), unit) for t in targets ], dtype=np.float64)
+    if unit is not None:
+        value = u.Quantity(value, unit).value
+    return np.array(np.broadcast_to(value, (n,)), dtype=np.float64)
+
+def _laser_mask(targets, coords, regions, times, strict=False, match='position'):
+    """A mask of shape ``(targets, times)``, true where the laser can be propagated.
+
+    Targets are matched to the LCH regions which cover their position, with
+    the rules of :meth:`~KOPy.closures.Regions.open_matrix`, or with
+    ``match='name'``, to the region with the same name. Targets without a
+    region are unconstrained, unless ``strict`` is set, when they are always
+    closed.
+    """
+    if match == 'name':
+        mask = np.full((len(coords), len(times)), not strict, dtype=bool)
+        for i, name in enumerate(getattr(targets, 'names', [])):
+            region = regions.get(name, None)
+            if region is not None:
+                mask[i] = region.open(times)
+        return mask
+    mask = regions.open_matrix(coords, times)
+    if not strict:
+        mask[~regions.contains(coords)] = True
+    return mask
+
+class Scheduler(object):
+    """Plan a sequence of observations which maximizes the total priority.
+
+    Parameters
+    ----------
+    targets : :class:`~KOPy.targets.TargetList`
+        The targets.
+    start : :class:`~astropy.time.Time`
+        The start of the night.
+    end : :class:`~astropy.time.Time`
+        The end of the night.
+    duration : :class:`~astropy.units.Quantity` or string
+        The time spent on each target, as a scalar, one for each target, or
+        the name of a keyword holding the time in seconds.
+    priority : array or string, optional
+        The priority of each target, higher is more important, or the name of
+        a keyword holding it. By default, all targets have the same priority.
+    limits : :class:`~KOPy.pointing.PointingLimits`, optional
+        Pointing limits for the telescope. Without limits, targets only have
+        to be above the horizon.
+    regions : :class:`~KOPy.closures.Regions`, optional
+        LCH regions. Targets with a region can only be observed while it is
+        open.
+    strict : bool
+        If set, targets without an LCH region are never observed.
+    match : string
+        How targets are matched to LCH regions: ``'position'``, to every
+        region which covers the target, or ``'name'``, to the region with
+        the same name as the target.
+    model : :class:`~KOPy.slew.SlewModel`
+        The slew model, which defaults to Keck.
+    step : :class:`~astropy.units.Quantity`
+        The resolution of the time grid used to check accessibility.
+
+    Raises
+    ------
+    ValueError
+        If the night is shorter than ``step``.
+
+    """
+    def __init__(self, targets, start, end, duration, priority=None, limits=None, regions=None,
+        strict=False, match='position', model=KECK_SLEW, step=5 * u.minute):
+        super(Scheduler, self).__init__()
+        if match not in ('position', 'name'):
+            raise ValueError("Can't match regions by {0!r}, use 'position' or 'name'.".format(match))
+        self.targets = targets
+        self.start, self.end = Time(start), Time(end)
+        self.model = model
+        self.step = u.Quantity(step, u.s).value
+        self.times = _time_grid(self.start, self.end, self.step)
+
+        coords = targets.catalog() if hasattr(targets, 'catalog') else SkyCoord(targets)
+        self._coords = coords.reshape((coords.size,))
+        self.visibility = visibility_grid(coords, self.times, location=model.location)
+        n = self.visibility.altitude.shape[0]
+        self.duration = _per_target(targets, duration, n, unit=u.s)
+        self.priority = _per_target(targets, 1.0 if priority is None else priority, n)
+        self.priority = np.where(np.isnan(self.priority), 0.0, self.priority)
+
+        if limits is None:
+            self.accessible = self.visibility.altitude > 0 * u.degree
+        else:
+            self.accessible = limits.observable(self.visibility.altitude, self.visibility.azimuth)
+        self.available = np.ones_like(self.accessible)
+        self.strict = strict
+        self.match = match
+        self.regions = regions
+
+    @property
+    def regions(self):
+        """The LCH regions. Setting new regions updates the laser mask."""
+        return self._regions
+
+    @regions.setter
+    def regions(self, regions):
+        """Set the LCH regions."""
+        self._regions = regions
+        if regions is None:
+            self.laser = np.ones_like(self.accessible)
+        else:
+            self.laser = _laser_mask(self.targets, self._coords, regions, self.times,
+                strict=self.strict, match=self.match)
+
+    @property
+    def mask(self):
+        """A mask of shape ``(targets, times)``, true where each target can be observed."""
+        return self.accessible & self.laser & self.available
+
+    def block(self, start, end, index=None):
+        """Mark targets as unavailable between two times, e.g. for clouds.
+
+        Parameters
+        ----------
+        start : :class:`~astropy.time.Time`
+            The start of the blocked period.
+        end : :class:`~astropy.time.Time`
+            The end of the blocked period.
+        index : array, optional
+            The targets to block. By default, all targets are blocked.
+
+        """
+        blocked = np.flatnonzero((self.times.jd >= Time(start).jd) & (self.times.jd <= Time(end).jd))
+        rows = np.arange(self.available.shape[0]) if index is None else np.asarray(index, dtype=int)
+        self.available[np.ix_(rows, blocked)] = False
+
+    def _greedy(self, schedule, candidates, now, origin):
+        """Build a sequence by repeatedly choosing the most priority per second spent."""
+        remaining = np.zeros(self.priority.shape, dtype=bool)
+        remaining[candidates] = True
+        order = []
+        while remaining.any():
+            candidates = np.flatnonzero(remaining)
+            previous = order[-1] if order else origin
+            if previous is not None:
+                slews = schedule.slews(previous, candidates, now)
+            else:
+                slews = np.zeros(candidates.shape)
+            starts = schedule.earliest(candidates, now + slews)
+            possible = starts < schedule.length
+            if not possible.any():
+                break
+            candidates, slews, starts = candidates[possible], slews[possible], starts[possible]
+            finish = np.maximum(now + slews, starts * self.step) + self.duration[candidates]
+            choice = np.argmax(self.priority[candidates] / (finish - now))
+            order.append(candidates[choice])
+            remaining[candidates[choice]] = False
+            now = finish[choice]
+        return order
+
+    def _insert(self, schedule, order, skipped, now, origin):
+        """Insert skipped targets where they fit, highest priority first.
+
+        Returns the new order and skipped targets, and whether anything changed.
+        """
+        changed = False
+        for target in sorted(skipped, key=lambda i: -self.priority[i]):
+            if self.priority[target] <= 0:
+                continue
+            begin, _ = schedule.simulate(order, now, origin)
+            finish = begin + self.duration[np.asarray(order, dtype=int)]
+            for position in range(len(order) + 1):
+                clock = finish[position - 1] if position else now
+                previous = order[position - 1] if position else origin
+                slew = schedule.slews(previous, target, clock) if previous is not None else 0.0
+                earliest = schedule.earliest(target, clock + slew)
+                if earliest >= schedule.length:
+                    continue
+                # Slews depend on the time, so the targets after the new one can move even
+                # when it fits in a gap. The targets before it don't change, so simulating
+                # from here checks the whole new sequence.
+                candidate = order[:position] + [target] + order[position:]
+                if schedule.simulate(candidate[position:], clock, previous) is None:
+                    continue
+                order = candidate
+                skipped.remove(target)
+                changed = True
+                break
+        return order, skipped, changed
+
+    def _swap(self, schedule, order, skipped, now, origin):
+        """Swap skipped targets in for lower priority scheduled targets."""
+        changed = False
+        for target in sorted(skipped, key=lambda i: -self.priority[i]):
+            lower = sorted((p for p, scheduled in enumerate(order) if self.priority[scheduled] < self.priority[target]),
+                key=lambda p: self.priority[order[p]])
+            for position in lower:
+                candidate = order[:position] + [target] + order[position + 1:]
+                if schedule.simulate(candidate, now, origin) is not None:
+                    skipped.remove(target)
+                    skipped.append(order[position])
+                    order = candidate
+                    changed = True
+                    break
+        return order, skipped, changed
+
+    def plan(self, now=None, exclude=(), origin=None, iterations=10):
+        """Plan a sequence of observations.
+
+        Parameters
+        ----------
+        now : :class:`~astropy.time.Time`, optional
+            The time the sequence starts, which defaults to the start of the night.
+        exclude : sequence of int, optional
+            Targets which should not be scheduled, e.g. because they have been observed.
+        origin : int, optional
+            The target the telescope is pointing at now.
+        iterations : int
+            The maximum number of local search passes.
+
+        Returns
+        -------
+        sequence : :class:`~KOPy.slew.Sequence`
+            The order, start times and slews. Targets which don't fit are
+            returned in ``skipped``.
+
+        """
+        now = 0.0 if now is None else max((Time(now) - self.start).to(u.s).value, 0.0)
+        usable = np.isfinite(self.duration)
+        schedule = _Schedule(self.visibility, self.model, self.mask & usable[:,np.newaxis],
+            np.where(usable, self.duration, 0.0), self.step)
+        candidates = np.setdiff1d(np.flatnonzero(usable), np.asarray(exclude, dtype=int))
+
+        order = self._greedy(schedule, candidates, now, origin)
+        skipped = [ int(i) for i in np.setdiff1d(candidates, order) ]
+        order = [ int(i) for i in order ]
+        for _ in range(iterations):
+            order, skipped, inserted = self._insert(schedule, order, skipped, now, origin)
+            order, skipped, swapped = self._swap(schedule, order, skipped, now, origin)
+            if not (inserted or swapped):
+                break
+
+        matrix = self.model.matrix(self.visibility, time=len(self.times) // 2).value
+        order = _two_opt(schedule, matrix, order, iterations, now, origin)
+        begin, slews = schedule.simulate(order, now, origin)
+        return Sequence(np.asarray(order, dtype=int), self.start + begin * u.s, slews * u.s,
+            np.array(sorted(skipped), dtype=int))
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+:mod:`slew` estimates slew times between targets, and orders targets to
+reduce the total slew during a night.
+
+A :class:`SlewModel` gives the time to move between two horizon positions:
+the telescope axes, the dome and the instrument rotator all move at the same
+time, so the slowest of them sets the slew time. Slew times for every pair of
+targets are computed at once from a :class:`~KOPy.visibility.Visibility`
+grid.
+
+:func:`slew_order` sequences a target list with a nearest neighbour heuristic,
+improved by 2-opt moves, while keeping every target within the pointing
+limits for its whole observation.
+
+For example::
+
+    >>> from KOPy.targets import TargetList
+    >>> targets = TargetList.from_starlist("starlist.txt") # doctest: +SKIP
+    >>> sequence = slew_order(targets, start, end, 20 * u.minute, limits=KECK1) # doctest: +SKIP
+    >>> ordered = TargetList(targets[i] for i in sequence.order) # doctest: +SKIP
+
+"""
+
+import math
+import collections
+import numpy as np
+import astropy.units as u
+from astropy.time import Time
+
+from .visibility import KECK, visibility_grid
+
+__all__ = ['SlewModel', 'KECK_SLEW', 'slew_matrix', 'Sequence', 'slew_order']
+
+def _wrapped_difference(a, b):
+    """The absolute difference between two angles in degrees, wrapped to [0, 180]."""
+    return np.abs(np.mod(a - b + 180.0, 360.0) - 180.0)
+
+def _parallactic_angle(visibility, latitude):
+    """The parallactic angle, in degrees, for each position in a visibility grid."""
+    alt = visibility.altitude.to(u.radian).value
+    az = visibility.azimuth.to(u.radian).value
+    ha = visibility.hour_angle.to(u.radian).value
+    dec = np.arcsin(np.clip(np.sin(alt) * np.sin(latitude) + np.cos(alt) * np.cos(latitude) * np.cos(az), -1.0, 1.0))
+    return np.degrees(np.arctan2(np.sin(ha), np.tan(latitude) * np.cos(dec) - np.sin(dec) * np.cos(ha)))
+
+class SlewModel(object):
+    """A simple model of the time needed to move between two horizon positions.
+
+    Each axis moves at a constant rate, and all axes move at once, so the slew
+    time is set by the slowest axis, plus a settling time.
+
+    Parameters
+    ----------
+    azimuth_rate : :class:`~astropy.units.Quantity`
+        The telescope azimuth slew rate.
+    elevation_rate : :class:`~astropy.units.Quantity`
+        The telescope elevation slew rate.
+    dome_rate : :class:`~astropy.units.Quantity`, optional
+        The dome rotation rate. The dome follows the telescope in azimuth.
+    rotator_rate : :class:`~astropy.units.Quantity`, optional
+        The instrument rotator rate, which has to follow the change in
+        parallactic angle.
+    settle : :class:`~astropy.units.Quantity`
+        Time added to every slew for the telescope to settle.
+    location : :class:`~astropy.coordinates.EarthLocation`
+        The observatory, used for parallactic angles.
+
+    Notes
+    -----
+    Azimuth moves always take the short way around. Cable wrap limits are
+    not modeled.
+
+    """
+    def __init__(self, azimuth_rate, elevation_rate, dome_rate=None, rotator_rate=None,
+        settle=0 * u.s, location=KECK):
+        super(SlewModel, self).__init__()
+        self.azimuth_rate = u.Quantity(azimuth_rate, u.degree / u.s)
+        self.elevation_rate = u.Quantity(elevation_rate, u.degree / u.s)
+        self.dome_rate = None if dome_rate is None else u.Quantity(dome_rate, u.degree / u.s)
+        self.rotator_rate = None if rotator_rate is None else u.Quantity(rotator_rate, u.degree / u.s)
+        self.settle = u.Quantity(settle, u.s)
+        self.location = location
+
+    def _axes(self, visibility):
+        """Positions of each axis, in degrees, with the rate in degrees per second."""
+        axes = [(visibility.azimuth.to(u.degree).value, self.azimuth_rate.value),
+            (visibility.altitude.to(u.degree).value, self.elevation_rate.value)]
+        if self.dome_rate is not None:
+            axes.append((axes[0][0], self.dome_rate.value))
+        if self.rotator_rate is not None:
+            latitude = self.location.to_geodetic()[1].radian
+            axes.append((_parallactic_angle(visibility, latitude), self.rotator_rate.value))
+        return axes
+
+    def _seconds(self, axes, origin, destination, time):
+        """Slew times in seconds from ``origin`` to ``destination`` indices at time index ``time``.
+
+        ``origin`` and ``destination`` are broadcast against each other.
+        """
+        seconds = np.zeros(np.broadcast(origin, destination).shape)
+        for position, rate in axes:
+            change = _wrapped_difference(position[destination, time], position[origin, time])
+            seconds = np.maximum(seconds, change / rate)
+        return np.where(origin == destination, 0.0, seconds + self.settle.value)
+
+    def matrix(self, visibility, time=0):
+        """Slew times between every pair of positions in a visibility grid.
+
+        Parameters
+        ----------
+        visibility : :class:`~KOPy.visibility.Visibility`
+            The positions.
+        time : int
+            The index of the time to use from the grid.
+
+        Returns
+        -------
+        slews : :class:`~astropy.units.Quantity`
+            An array of shape ``(targets, targets)``, where ``slews[i,j]`` is
+            the time to slew from position ``i`` to position ``j``.
+
+        """
+        n = visibility.altitude.shape[0]
+        index = np.arange(n)
+        return self._seconds(self._axes(visibility), index[:,np.newaxis], index[np.newaxis,:], time) * u.s
+
+
+KECK_SLEW = SlewModel(azimuth_rate=1.0 * u.degree / u.s, elevation_rate=0.5 * u.degree / u.s,
+    dome_rate=0.67 * u.degree / u.s, rotator_rate=2.0 * u.degree / u.s, settle=10 * u.s)
+"""An approximate slew model for the Keck telescopes."""
+
+def slew_matrix(targets, time, model=KECK_SLEW):
+    """Slew times between every pair of targets at a single time.
+
+    Parameters
+    ----------
+    targets : :class:`~KOPy.targets.TargetList` or :class:`~astropy.coordinates.SkyCoord`
+        The targets.
+    time : :class:`~astropy.time.Time`
+        The time.
+    model : :class:`SlewModel`
+        The slew model, which defaults to Keck.
+
+    Returns
+    -------
+    slews : :class:`~astropy.units.Quantity`
+        An array of shape ``(targets, targets)``.
+
+    """
+    coords = targets.catalog() if hasattr(targets, 'catalog') else targets
+    return model.matrix(visibility_grid(coords, time, location=model.location))
+
+class Sequence(collections.namedtuple('Sequence', ['order', 'begin', 'slew', 'skipped'])):
+    """The result of :func:`slew_order`.
+
+    Attributes
+    ----------
+    order : array
+        Target indices, in the order they should be observed.
+    begin : :class:`~astropy.time.Time`
+        The time each observation starts, after slewing and any wait for the
+        target to become accessible.
+    slew : :class:`~astropy.units.Quantity`
+        The slew before each observation. The first target has no slew.
+    skipped : array
+        Indices of targets which could not be fit into the night.
+
+    """
+    __slots__ = ()
+
+    @property
+    def total_slew(self):
+        """The total slew time for the sequence."""
+        return np.sum(self.slew)
+
+
+def _time_grid(start, end, step):
+    """The times from ``start`` to ``end`` every ``step`` seconds, which must hold at least one step."""
+    length = (end - start).to(u.s).value
+    # Allow for rounding in the difference between the two times.
+    if not length > step - 1e-3:
+        raise ValueError("The night from {0} to {1} is shorter than the time step of {2:g} s.".format(
+            start.iso, end.iso, step))
+    return start + np.arange(0.0, length, step) * u.s
+
+class _Schedule(object):
+    """Checks that sequences of targets fit within their accessible windows, on a grid of times."""
+
+    def __init__(self, visibility, model, mask, duration, step):
+        super(_Schedule, self).__init__()
+        self.model = model
+        self.axes = model._axes(visibility)
+        self.step = step
+        self.duration = duration
+        n, m = mask.shape
+        self.bins = np.maximum(np.ceil(duration / step).astype(int), 1)
+
+        # feasible[i,k] is true when target i is accessible for its whole
+        # observation starting at time index k.
+        counts = np.zeros((n, m + 1), dtype=int)
+        counts[:,1:] = np.cumsum(mask, axis=1)
+        ends = np.arange(m)[np.newaxis,:] + self.bins[:,np.newaxis]
+        valid = ends <= m
+        covered = counts[np.arange(n)[:,np.newaxis], np.minimum(ends, m)] - counts[:,:m]
+        feasible = valid & (covered == self.bins[:,np.newaxis])
+
+        # first[i,k] is the first feasible start at or after time index k, or m if there is none.
+        first = np.where(feasible, np.arange(m)[np.newaxis,:], m)
+        self.first = np.concatenate([np.minimum.accumulate(first[:,::-1], axis=1)[:,::-1],
+            np.full((n, 1), m, dtype=int)], axis=1)
+        self.length = m
+
+    def earliest(self, targets, now):
+        """The earliest feasible start time index for each target at or after time ``now`` (in seconds)."""
+        if np.isscalar(now):
+            return self.first[targets, max(min(int(math.ceil(now / self.step - 1e-9)), self.length), 0)]
+        k = np.minimum(np.ceil(np.asarray(now) / self.step - 1e-9).astype(int), self.length)
+        return self.first[targets, np.maximum(k, 0)]
+
+    def slews(self, origin, destinations, now):
+        """Slew times in seconds from one target to many targets, starting at time ``now``.
+
+        Only the slews asked for are computed, since a matrix for every time
+        bin would grow as the square of the number of targets.
+        """
+        k = min(int(now / self.step), self.length - 1)
+        return self.model._seconds(self.axes, origin, np.asarray(destinations), k)[()]
+
+    def simulate(self, order, now=0.0, origin=None):
+        """Simulate observing targets in order, returning start times and slews, or ``None`` if the order is infeasible.
+
+        The sequence starts at ``now`` (in seconds), with the telescope at
+        target ``origin``, if one is given.
+        """
+        begin = np.zeros((len(order),))
+        slews = np.zeros((len(order),))
+        for i, target in enumerate(order):
+            previous = order[i-1] if i else origin
+            if previous is not None:
+                slews[i] = self.slews(previous, target, now)
+            k = self.earliest(target, now + slews[i])
+            if k >= self.length:
+                return None
+            begin[i] = max(now + slews[i], k * self.step)
+            now = begin[i] + self.duration[target]
+        return begin, slews
+
+
+def _nearest_neighbour(schedule, n):
+    """Build a sequence greedily, always moving to the closest target that can be observed next."""
+    remaining = np.ones((n,), dtype=bool)
+    order = []
+    now = 0.0
+    while remaining.any():
+        candidates = np.flatnonzero(remaining)
+        if order:
+            slews = schedule.slews(order[-1], candidates, now)
+        else:
+            slews = np.zeros(candidates.shape)
+        starts = schedule.earliest(candidates, now + slews)
+        possible = starts < schedule.length
+        if not possible.any():
+            break
+        begin = np.maximum(now + slews, starts * schedule.step)
+        if order:
+            # Prefer targets we can start soonest, and break ties by slew.
+            choice = np.lexsort((slews[possible], begin[possible]))[0]
+        else:
+            # Start with the target whose accessible window closes first.
+            closes = np.sum(schedule.first[candidates[possible]] < schedule.length, axis=1)
+            choice = np.lexsort((begin[possible], closes))[0]
+        target = candidates[possible][choice]
+        begin = schedule.earliest(target, now + slews[possible][choice])
+        now = max(now + slews[possible][choice], begin * schedule.step) + schedule.duration[target]
+        order.append(target)
+        remaining[target] = False
+    return np.array(order, dtype=int)
+
+def _two_opt(schedule, matrix, order, iterations, now=0.0, origin=None):
+    """Improve a sequence with 2-opt moves.
+
+    Candidate moves are ranked using a fixed slew matrix, but are only kept
+    if the sequence is still feasible, and the simulated total slew drops.
+    """
+    order = np.array(order)
+    n = len(order)
+    if n < 3:
+        return order
+    total = np.sum(schedule.simulate(order, now, origin)[1])
+    for _ in range(iterations):
+        improved = False
+        for i in range(n - 2):
+            j = np.arange(i + 2, n)
+            after = np.where(j + 1 < n, order[np.minimum(j + 1, n - 1)], -1)
+            # Reversing order[i+1:j+1] replaces edges (i, i+1) and (j, j+1) with (i, j) and (i+1, j+1).
+            delta = (matrix[order[i], order[j]] - matrix[order[i], order[i + 1]]
+                + np.where(after >= 0, matrix[order[i + 1], after] - matrix[order[j], after], 0.0))
+            for k in np.argsort(delta):
+                if delta[k] >= -1e-6:
+                    break
+                candidate = order.copy()
+                candidate[i + 1:j[k] + 1] = order[i + 1:j[k] + 1][::-1]
+                result = schedule.simulate(candidate, now, origin)
+                if result is not None and np.sum(result[1]) < total - 1e-6:
+                    order, total = candidate, np.sum(result[1])
+                    improved = True
+                    break
+        if not improved:
+            break
+    return order
+
+def slew_order(targets, start, end, duration, model=KECK_SLEW, limits=None, step=5 * u.minute, iterations=10):
+    """Order targets to reduce the total slew time, while observing each target when it is accessible.
+
+    A sequence is first built with a nearest neighbour heuristic, where the
+    next target is the one which can be started soonest after slewing. The
+    sequence is then improved with 2-opt moves, ranked using the slew times at
+    the middle of the night. Moves are only kept if every target is still
+    accessible for its whole observation, and the total slew is reduced.
+
+    Parameters
+    ----------
+    targets : :class:`~KOPy.targets.TargetList` or :class:`~astropy.coordinates.SkyCoord`
+        The targets.
+    start : :class:`~astropy.time.Time`
+        The start of the night.
+    end : :class:`~astropy.time.Time`
+        The end of the night.
+    duration : :class:`~astropy.units.Quantity`
+        The time spent on each target, either a scalar or one for each target.
+    model : :class:`SlewModel`
+        The slew model, which defaults to Keck.
+    limits : :class:`~KOPy.pointing.PointingLimits`, optional
+        Pointing limits for the telescope. Without limits, targets only have
+        to be above the horizon.
+    step : :class:`~astropy.units.Quantity`
+        The resolution of the time grid used to check accessibility.
+    iterations : int
+        The maximum number of 2-opt passes.
+
+    Returns
+    -------
+    sequence : :class:`Sequence`
+        The order, start times and slews. Targets which don't fit are
+        returned in ``skipped``.
+
+    Raises
+    ------
+    ValueError
+        If the night is shorter than ``step``.
+
+    """
+    coords = targets.catalog() if hasattr(targets, 'catalog') else targets
+    start, end = Time(start), Time(end)
+    step = u.Quantity(step, u.s).value
+    times = _time_grid(start, end, step)
+    grid = visibility_grid(coords, times, location=model.location)
+    if limits is None:
+        mask = grid.altitude > 0 * u.degree
+    else:
+        mask = limits.observable(grid.altitude, grid.azimuth)
+
+    n = mask.shape[0]
+    duration = np.broadcast_to(u.Quantity(duration, u.s).value, (n,))
+    schedule = _Schedule(grid, model, mask, duration, step)
+
+    order = _nearest_neighbour(schedule, n)
+    matrix = model.matrix(grid, time=len(times) // 2).value
+    order = _two_opt(schedule, matrix, order, iterations)
+
+    begin, slews = schedule.simulate(order)
+    skipped = np.setdiff1d(np.arange(n), order)
+    return Sequence(order, start + begin * u.s, slews * u.s, skipped)
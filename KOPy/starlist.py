@@ -17,13 +17,15 @@ import astropy.units as u
 import astropy.time
 from astropy.coordinates import SkyCoord, FK4, FK5, AltAz
 from astropy.utils.data import get_readable_fileobj
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
+import numpy as np
 
 from . import __version__
 import re
 import os
 
-__all__ = ['tokenize', 'verify_starlist_line', 'parse_starlist_line', 'read_skip_comments', 'stream_skip_comments', 'parse_starlist', 'format_starlist_line']
+__all__ = ['tokenize', 'verify_starlist_line', 'parse_starlist_line', 'parse_starlist_position', 'StarlistPosition',
+    'read_skip_comments', 'stream_skip_comments', 'parse_starlist', 'format_starlist_line']
 
 _starlist_re_raw = r"""
     ^(?P<Name>.{1,15})[\s]+ # Target name must be the first 15 characters.
@@ -135,7 +137,83 @@ def verify_starlist_line(text, identifier="<stream>", warning=False):
             composed_messages.append(composed_message)
     return composed_messages
 
-def parse_starlist_line(text):
+class StarlistPosition(namedtuple("StarlistPosition", ["ra", "dec", "equinox"])):
+    """The unparsed position tokens from a starlist line.
+    
+    Use :func:`parse_starlist_position` to turn these into a
+    :class:`~astropy.coordinates.SkyCoord`.
+    """
+    __slots__ = ()
+
+_sexagesimal_split_re = re.compile(r"[\s:hdms]+")
+
+def _sexagesimal_to_float(token):
+    """Convert a sexagesimal token, e.g. ``-12 34 56.7``, into a float in the unit of its first field."""
+    token = token.strip()
+    value = 0.0
+    for scale, part in zip((1.0, 60.0, 3600.0), _sexagesimal_split_re.split(token.lstrip("+-"))):
+        if part:
+            value += float(part) / scale
+    return -value if token.startswith("-") else value
+    
+def _format_sexagesimal(value, alwayssign=False):
+    """Format a float as ``DD MM SS.SSS``, rounding to the nearest millisecond of arc or time."""
+    sign = "-" if value < 0 else ("+" if alwayssign else "")
+    total = int(round(abs(value) * 3600000))
+    degrees, remainder = divmod(total, 3600000)
+    minutes, milliseconds = divmod(remainder, 60000)
+    return "{0:s}{1:02d} {2:02d} {3:06.3f}".format(sign, degrees, minutes, milliseconds / 1000.0)
+
+def _starlist_frame(equinox):
+    """The frame, equinox time and units for a starlist equinox token."""
+    if equinox == '':
+        return AltAz, astropy.time.Time.now(), (u.degree, u.degree)
+    elif equinox == "APP":
+        return 'fk5', astropy.time.Time.now(), (u.hourangle, u.degree)
+    elif float(equinox) <= 1950:
+        return 'fk4', astropy.time.Time(float(equinox), format='byear', scale='utc'), (u.hourangle, u.degree)
+    else:
+        return 'fk5', astropy.time.Time(float(equinox), format='jyear', scale='utc'), (u.hourangle, u.degree)
+
+def parse_starlist_position(ra, dec, equinox=''):
+    """Parse starlist position tokens into a coordinate object.
+    
+    Parameters
+    ----------
+    ra : string or sequence of strings
+        Right ascension token(s), in sexagesimal hours.
+    dec : string or sequence of strings
+        Declination token(s), in sexagesimal degrees.
+    equinox : string
+        The equinox token. All positions parsed together share an equinox.
+        
+    Returns
+    -------
+    position : :class:`~astropy.coordinates.SkyCoord`
+        The position. When sequences of tokens are passed, this is a single
+        array-valued coordinate, created with one call to 
+        :class:`~astropy.coordinates.SkyCoord`.
+    
+    """
+    frame, equinox, (ra_unit, dec_unit) = _starlist_frame(equinox)
+    if isinstance(ra, six.string_types):
+        ra, dec = _sexagesimal_to_float(ra), _sexagesimal_to_float(dec)
+    else:
+        ra = np.array([ _sexagesimal_to_float(token) for token in ra ], dtype=np.float64)
+        dec = np.array([ _sexagesimal_to_float(token) for token in dec ], dtype=np.float64)
+    return SkyCoord(ra * ra_unit, dec * dec_unit, equinox=equinox, frame=frame)
+
+def _split_starlist_line(text):
+    """Split a starlist line into the name, the unparsed position tokens and the keyword text."""
+    text = text.expandtabs()
+    match = _starlist_re.match(text)
+    if not match:
+        raise ValueError("Couldn't parse '{}', no regular expression match found.".format(text))
+    data = match.groupdict("")
+    position = StarlistPosition(data["RA"], data["Dec"], data.get("Equinox", ""))
+    return data['Name'].rstrip(), position, data.get("Keywords","")
+
+def parse_starlist_line(text, lazy=False):
     """Parse a single line from a Keck formatted starlist, returning a dictionary of parsed values.
     
     This uses the forgiving starlist parser, which should be robust to various errors in starlist file formats.
@@ -144,6 +222,9 @@ def parse_starlist_line(text):
     ----------
     text : string
         The starlist text line.
+    lazy : bool
+        If set, return the unparsed position tokens as a :class:`StarlistPosition`
+        instead of parsing them into a :class:`~astropy.coordinates.SkyCoord`.
         
     Raises
     ------
@@ -154,39 +235,18 @@ def parse_starlist_line(text):
     -------
     name : string
         The target name
-    position : :class:`~astropy.coordinates.SkyCoord`
+    position : :class:`~astropy.coordinates.SkyCoord` or :class:`StarlistPosition`
         The target position, as a :class:`~astropy.coordinates.SkyCoord` object.
     keywords : OrderedDict
         An ordered dictionary of keyword values applied to the starlist line.
     
     """
-    text = text.expandtabs()
-    match = _starlist_re.match(text)
-    if not match:
-        raise ValueError("Couldn't parse '{}', no regular expression match found.".format(text))
-    data = match.groupdict("")
-    if data.get('Equinox','') == '':
-        equinox = astropy.time.Time.now()
-        frame = AltAz
-        unit = (u.degree, u.degree)
-    elif data['Equinox'] == "APP":
-        equinox = astropy.time.Time.now()
-        frame = 'fk5'
-        unit = (u.hourangle, u.degree)
-    else:
-        if float(data['Equinox']) <= 1950:
-            equinox = astropy.time.Time(float(data['Equinox']), format='byear', scale='utc')
-            frame = 'fk4'
-            unit = (u.hourangle, u.degree)
-        else:
-            equinox = astropy.time.Time(float(data['Equinox']), format='jyear', scale='utc')
-            frame = 'fk5'
-            unit = (u.hourangle, u.degree)
-    
-    position = SkyCoord(data["RA"], data["Dec"], unit=(u.hourangle, u.degree), equinox=equinox, frame=frame)
+    name, position, keywords = _split_starlist_line(text)
+    if not lazy:
+        position = parse_starlist_position(*position)
     
     results = OrderedDict()
-    for keywordvalue in data.get("Keywords","").split():
+    for keywordvalue in keywords.split():
         if keywordvalue.count("=") < 1:
             warnings.warn("Illegal Keyword Argument: '{}'".format(keywordvalue))
             continue
@@ -201,7 +261,7 @@ def parse_starlist_line(text):
                     pass
         else:
             results[keyword] = value.strip().replace("=","")
-    return data['Name'].rstrip(), position, results
+    return name, position, results
     
 def read_skip_comments(filename, comments="#"):
     """Read a filename, yielding lines that don't start with comments.
@@ -243,13 +303,16 @@ def stream_skip_comments(stream, comments="#"):
         if not line.startswith(comments) and not re.match(r"^[\s]*$", line.strip("\n\r")):
             yield line.strip("\n\r").strip()
     
-def parse_starlist(starlist):
+def parse_starlist(starlist, lazy=False):
     """Parse a full starlist file into a generator of target objects.
     
     Parameters
     ----------
     starlist : string or filobj
         The file to be opened and read from.
+    lazy : bool
+        If set, yield unparsed :class:`StarlistPosition` tokens instead of
+        coordinates. See :func:`parse_starlist_line`.
     
     Yields
     ------
@@ -262,10 +325,24 @@ def parse_starlist(starlist):
     
     """
     for line in read_skip_comments(starlist):
-        yield parse_starlist_line(line)
+        yield parse_starlist_line(line, lazy=lazy)
     
 def format_starlist_position(position):
-    """Output a SkyCoord object in the starlist format."""
+    """Output a SkyCoord object in the starlist format.
+    
+    Unparsed :class:`StarlistPosition` tokens in the J2000 equinox are
+    reformatted directly, without creating a coordinate object.
+    """
+    if isinstance(position, StarlistPosition):
+        try:
+            j2000 = float(position.equinox) == 2000.0
+        except ValueError:
+            j2000 = False
+        if j2000:
+            return "{ra:s} {dec:s} 2000".format(
+                ra = _format_sexagesimal(_sexagesimal_to_float(position.ra)),
+                dec = _format_sexagesimal(_sexagesimal_to_float(position.dec), alwayssign=True))
+        position = parse_starlist_position(*position)
     try:
         position = position.transform_to('fk5')
         if position.frame.equinox.jyear <= 1950:
@@ -390,7 +467,7 @@ def main():
                 all_messages.append((n, line, messages))
             n_messages += len(messages)
             try:
-                formatted_line = format_starlist_line(*parse_starlist_line(line)) + "\n"
+                formatted_line = format_starlist_line(*parse_starlist_line(line, lazy=True)) + "\n"
             except ValueError:
                 formatted_line = line
                 opt.output.write("# WARNING {0:s} couldn't parse next line.\n".format(os.path.basename(sys.argv[0])))
@@ -28,13 +28,76 @@ import six
 import astropy.units as u
 import collections
 import io
+import copy
+import numbers
+import struct
+import threading
+import zipfile
+import itertools
 import numpy as np
-from astropy.coordinates import SkyCoord, Angle
+from astropy.coordinates import (SkyCoord, ICRS, Angle, UnitSphericalRepresentation, CartesianRepresentation,
+    search_around_sky)
 from astropy.table import Table, Column, MaskedColumn
-from .starlist import (parse_starlist, parse_starlist_line, 
+from .starlist import (parse_starlist, parse_starlist_line, parse_starlist_position, StarlistPosition,
     format_starlist_line, format_keywords, format_starlist_position)
+from .visibility import visibility_grid, rise_set_transit, KECK
+from .resolver import resolve_names, sesame_resolver
+from .query import keyword_column
 
-__all__ = ['Target', 'TargetList']
+__all__ = ['Target', 'TargetList', 'TargetListView', 'TargetListSnapshot', 'Change', 'CrossMatch', 'Deduplication']
+
+def _frame_key(position):
+    """A hashable key which is the same for positions in identical frames."""
+    frame = position.frame
+    return (frame.name,) + tuple(repr(getattr(frame, attr)) for attr in frame.get_frame_attr_names())
+
+def _values_in_unit(quantities):
+    """Convert a sequence of quantities to an array of values in the unit of the first quantity.
+    
+    Returns
+    -------
+    values : array
+        The values.
+    unit : :class:`~astropy.units.Unit`
+        The unit of the values.
+    """
+    unit = quantities[0].unit
+    if all(quantity.unit == unit for quantity in quantities):
+        return np.array([ quantity.value for quantity in quantities ]), unit
+    return np.array([ quantity.to(unit).value for quantity in quantities ]), unit
+
+def _icrs_catalog(targets):
+    """Transform the positions of a sequence of targets into a single ICRS :class:`~astropy.coordinates.SkyCoord`.
+    
+    Positions are grouped by frame, so that only one coordinate transformation
+    is done for each distinct frame, rather than one per position. Positions
+    which are still unparsed starlist tokens are parsed together for each equinox.
+    """
+    groups = collections.OrderedDict()
+    for i, target in enumerate(targets):
+        tokens = getattr(target, '_position_tokens', None)
+        if tokens is not None and target._position is None:
+            key = (StarlistPosition, tokens.equinox)
+        else:
+            key = _frame_key(target.position)
+        groups.setdefault(key, []).append(i)
+    
+    ra = np.empty((len(targets),), dtype=np.float64)
+    dec = np.empty((len(targets),), dtype=np.float64)
+    for key, indices in groups.items():
+        if key[0] is StarlistPosition:
+            coords = parse_starlist_position([ targets[i]._position_tokens.ra for i in indices ],
+                [ targets[i]._position_tokens.dec for i in indices ], key[1])
+        else:
+            spherical = [ targets[i].position.represent_as(UnitSphericalRepresentation) for i in indices ]
+            data = UnitSphericalRepresentation(
+                lon = u.Quantity(*_values_in_unit([ s.lon for s in spherical ])),
+                lat = u.Quantity(*_values_in_unit([ s.lat for s in spherical ])))
+            coords = SkyCoord(targets[indices[0]].position.frame.realize_frame(data))
+        icrs = coords.transform_to('icrs')
+        ra[indices] = icrs.ra.radian
+        dec[indices] = icrs.dec.radian
+    return SkyCoord(ra * u.radian, dec * u.radian, frame='icrs')
 
 class Target(object):
     """A single target object, with a position, name, and keyword arguments.
@@ -84,16 +147,16 @@ class Target(object):
     name = None
     """Name of the target"""
 
-    position = None
-    """Position of the target, an :class:`~astropy.coordinates.SkyCoord` object."""
-
     keywords = {}
     """Keyword-value pairs from the starlist, as a dictionary."""
     
+    _position = None
+    _position_tokens = None
+    
     def __init__(self, name, position, _keywords=dict(), **kwargs):
         super(Target, self).__init__()
         self.name = str(name)
-        self.position = position if isinstance(position, SkyCoord) else SkyCoord(position)
+        self.position = position
         self.keywords = collections.OrderedDict()
         self.keywords.update(_keywords)
         self.keywords.update(kwargs)
@@ -107,10 +170,32 @@ class Target(object):
         
     def __setattr__(self, key, value):
         """Set an attribute as a keyword."""
-        if not hasattr(self, key):
+        if not (key in self.__dict__ or hasattr(self.__class__, key)):
             self.keywords[key] = value
         else:
             super(Target, self).__setattr__(key, value)
+    
+    @property
+    def position(self):
+        """Position of the target, an :class:`~astropy.coordinates.SkyCoord` object.
+        
+        Targets can be created with the unparsed :class:`~KOPy.starlist.StarlistPosition`
+        tokens from a starlist line, in which case the coordinate object is created
+        the first time it is needed.
+        """
+        if self._position is None and self._position_tokens is not None:
+            self._position = parse_starlist_position(*self._position_tokens)
+        return self._position
+        
+    @position.setter
+    def position(self, value):
+        """Set the position, either from a coordinate or from starlist tokens."""
+        if isinstance(value, StarlistPosition):
+            self._position = None
+            self._position_tokens = value
+        else:
+            self._position = value if isinstance(value, SkyCoord) else SkyCoord(value)
+            self._position_tokens = None
         
     def __repr__(self):
         """Represent a target."""
@@ -131,21 +216,256 @@ class Target(object):
         
     def to_starlist(self, **kwargs):
         """Return a starlist line."""
-        return format_starlist_line(self.name, self.position, self.keywords, **kwargs)
+        position = self.position if self._position_tokens is None else self._position_tokens
+        return format_starlist_line(self.name, position, self.keywords, **kwargs)
         
     @classmethod
-    def from_starlist(cls, line):
-        """Parse a single line from a starlist into the Target data structure."""
-        name, position, kw = parse_starlist_line(line)
+    def from_starlist(cls, line, lazy=False):
+        """Parse a single line from a starlist into the Target data structure.
+        
+        When ``lazy`` is set, the position is parsed on first access to :attr:`position`.
+        """
+        name, position, kw = parse_starlist_line(line, lazy=lazy)
         return cls(name=name, position=position, _keywords=kw)
         
     @classmethod
-    def from_name(cls, name):
-        """Use the SkyCoord name resolution (which works via Simbad) to find the coordinates of a name."""
-        position = SkyCoord.from_name(name)
+    def from_name(cls, name, cache=None, resolver=sesame_resolver):
+        """Use the SkyCoord name resolution (which works via Simbad) to find the coordinates of a name.
+        
+        Resolved names are cached on disk. See :func:`~KOPy.resolver.resolve_names`
+        for the ``cache`` and ``resolver`` arguments.
+        """
+        position = resolve_names([name], cache=cache, resolver=resolver)[0]
         return cls(name=name, position=position)
     
 
+def _keyword_column(name, length, rows, values):
+    """Build a masked column for a keyword which has ``values`` in only some ``rows``.
+    
+    Plain numbers mixed with quantities are taken to be in the unit of the
+    first quantity, e.g. after ``set_keyword(index, 'vmag', 8.1)``.
+    """
+    unit = None
+    quantities = [ value for value in values if isinstance(value, u.Quantity) ]
+    if quantities and all(isinstance(value, (u.Quantity, numbers.Real)) for value in values):
+        unit = quantities[0].unit
+        data, unit = _values_in_unit([ u.Quantity(value, unit) for value in values ])
+    else:
+        data = np.array(values)
+        if data.dtype.kind == 'O':
+            data = np.array([ six.text_type(value) for value in values ])
+    
+    buffer = np.zeros((length,), dtype=data.dtype)
+    buffer[rows] = data
+    mask = np.ones((length,), dtype=bool)
+    mask[rows] = False
+    return MaskedColumn(buffer, name=name, mask=mask, unit=unit)
+
+_NPZ_FORMAT = 1
+"""Version of the layout written by :meth:`TargetList.save`."""
+
+def _load_npz(filename, mmap=True):
+    """Load the arrays in an ``.npz`` file, memory-mapping every array stored without compression.
+    
+    :func:`numpy.load` can't memory-map arrays in an ``.npz`` file, but
+    :func:`numpy.savez` stores each array uncompressed in the zip archive,
+    so each one can be mapped directly at its offset in the file.
+    """
+    arrays = {}
+    with zipfile.ZipFile(filename) as archive, open(filename, 'rb') as stream:
+        for info in archive.infolist():
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            if not mmap or info.compress_type != zipfile.ZIP_STORED:
+                arrays[name] = np.lib.format.read_array(archive.open(info))
+                continue
+            # Skip the local file header, whose extra field can differ from the central directory.
+            stream.seek(info.header_offset)
+            name_length, extra_length = struct.unpack('<HH', stream.read(30)[26:30])
+            stream.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(stream)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(stream)
+            elif version == (2, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(stream)
+            else:
+                arrays[name] = np.lib.format.read_array(archive.open(info))
+                continue
+            if dtype.hasobject or not len(shape) or not int(np.prod(shape)):
+                arrays[name] = np.lib.format.read_array(archive.open(info))
+            else:
+                arrays[name] = np.memmap(filename, dtype=dtype, mode='r', offset=stream.tell(),
+                    shape=shape, order='F' if fortran else 'C')
+    return arrays
+
+class _TableRows(object):
+    """Column storage shared by targets which are materialized lazily from a table."""
+    
+    def __init__(self, names, catalog, columns):
+        super(_TableRows, self).__init__()
+        self.names = names
+        self.catalog = catalog
+        self.columns = columns
+        
+    def keywords(self, index):
+        """Keyword-value pairs for a single row."""
+        keywords = []
+        for name, values, mask, unit in self.columns:
+            if mask is not None and mask[index]:
+                continue
+            value = values[index]
+            keywords.append((name, value if unit is None else value * unit))
+        return keywords
+    
+class _LazyTarget(object):
+    """A placeholder for a row in a :class:`_TableRows` which has not been made into a :class:`Target`.
+    
+    The name and position are available without creating the target.
+    """
+    
+    __slots__ = ('_rows', '_index', '_cls', '_target')
+    
+    def __init__(self, rows, index, cls):
+        # Millions of these can be made at once, so skip the call to object.__init__.
+        self._rows = rows
+        self._index = index
+        self._cls = cls
+        self._target = None
+        
+    @property
+    def name(self):
+        """Name of the target."""
+        return str(self._rows.names[self._index])
+        
+    @property
+    def position(self):
+        """Position of the target."""
+        return self._rows.catalog[self._index]
+        
+    def materialize(self):
+        """Create the :class:`Target`, only once."""
+        if self._target is None:
+            self._target = self._cls(self.name, self.position, _keywords=self._rows.keywords(self._index))
+        return self._target
+    
+class Change(collections.namedtuple('Change', ['kind', 'index', 'keyword'])):
+    """A change to a :class:`TargetList`, passed to its subscribers.
+    
+    Attributes
+    ----------
+    kind : string
+        One of ``'insert'``, ``'delete'``, ``'replace'``, ``'keyword'`` or ``'reorder'``.
+    index : array
+        The positions affected. For ``'insert'``, ``'replace'`` and ``'keyword'``
+        these are positions in the list after the change, and for ``'delete'``
+        they are positions before it. For ``'reorder'``, ``index[i]`` is the
+        old position of the target now at position ``i``.
+    keyword : string or None
+        The keyword which changed, for ``'keyword'`` changes.
+    
+    """
+    __slots__ = ()
+    
+
+class CrossMatch(collections.namedtuple('CrossMatch', ['index', 'other_index', 'separation', 'unmatched', 'other_unmatched'])):
+    """The result of :meth:`TargetList.crossmatch`.
+    
+    Attributes
+    ----------
+    index : array
+        Indices into the first list for each matched pair.
+    other_index : array
+        Indices into the second list for each matched pair.
+    separation : :class:`~astropy.coordinates.Angle`
+        On-sky separation of each matched pair.
+    unmatched : array
+        Indices into the first list which have no match.
+    other_unmatched : array
+        Indices into the second list which have no match.
+    
+    """
+    __slots__ = ()
+    
+
+class Deduplication(collections.namedtuple('Deduplication', ['targets', 'representative', 'mapping'])):
+    """The result of :meth:`TargetList.deduplicate`.
+    
+    Attributes
+    ----------
+    targets : :class:`TargetList`
+        The representative target from each group, in their original order.
+    representative : array
+        Indices into the original list of each representative target.
+    mapping : array
+        For each target in the original list, the index of its representative
+        in ``targets``.
+    
+    """
+    __slots__ = ()
+    
+    def groups(self):
+        """Indices into the original list of the targets in each group, one array per representative."""
+        order = np.argsort(self.mapping, kind='mergesort')
+        boundaries = np.flatnonzero(np.diff(self.mapping[order])) + 1
+        return np.split(order, boundaries)
+    
+
+_HASH_PRIMES = np.array([73856093, 19349663, 83492791], dtype=np.int64)
+
+def _spatial_hash(cells):
+    """Hash integer cell coordinates, with shape ``(n, 3)``, to a single integer."""
+    hashed = cells * _HASH_PRIMES
+    return hashed[:,0] ^ hashed[:,1] ^ hashed[:,2]
+
+def _coincident_pairs(vectors, tolerance):
+    """Find all pairs ``i < j`` of unit vectors, with shape ``(n, 3)``, closer than an angle.
+    
+    Vectors are binned into cubic cells the size of the chord for ``tolerance``,
+    so close pairs are always in the same or adjacent cells. Cells are found by
+    hashing, and hash collisions only add candidates which are then rejected.
+    """
+    chord = 2.0 * np.sin(tolerance.radian / 2.0)
+    cells = np.floor(vectors / chord).astype(np.int64)
+    keys = _spatial_hash(cells)
+    order = np.argsort(keys, kind='mergesort')
+    unique, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+    
+    first, second = [], []
+    for offset in itertools.product((-1, 0, 1), repeat=3):
+        neighbours = _spatial_hash(cells + np.array(offset, dtype=np.int64))
+        slot = np.minimum(np.searchsorted(unique, neighbours), len(unique) - 1)
+        found = np.flatnonzero(unique[slot] == neighbours)
+        slot = slot[found]
+        # Pair each vector with every member of its neighbouring cell.
+        repeats = counts[slot]
+        i = np.repeat(found, repeats)
+        within = np.arange(np.sum(repeats)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        j = order[np.repeat(starts[slot], repeats) + within]
+        keep = i < j
+        first.append(i[keep])
+        second.append(j[keep])
+    i, j = np.concatenate(first), np.concatenate(second)
+    
+    # Adjacent cells can have the same hash, so remove repeated pairs.
+    if len(i):
+        pairs = np.unique(i * len(vectors) + j)
+        i, j = pairs // len(vectors), pairs % len(vectors)
+    close = np.sum(vectors[i] * vectors[j], axis=1) >= np.cos(tolerance.radian)
+    return i[close], j[close]
+
+def _connected_labels(n, i, j):
+    """Label the connected components of a graph with ``n`` nodes and edges ``(i, j)``, by their smallest node."""
+    labels = np.arange(n)
+    while True:
+        smallest = np.minimum(labels[i], labels[j])
+        updated = labels.copy()
+        np.minimum.at(updated, i, smallest)
+        np.minimum.at(updated, j, smallest)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+    
+
 class TargetList(collections.MutableSequence):
     """A target list.
     
@@ -159,25 +479,134 @@ class TargetList(collections.MutableSequence):
     def __init__(self, iterable=None):
         super(TargetList, self).__init__()
         self.__data = []
+        self._catalog = None
+        self._columns = {}
+        self._groups = {}
+        self._version = 0
+        self._keyword_versions = {}
+        self._subscribers = []
+        self._lock = threading.RLock()
+        self._shared = False
+        self._private = None
         if iterable is not None:
             self.extend(iterable)
     
+    def __getstate__(self):
+        """Pickle and copy without the lock or subscribers."""
+        state = self.__dict__.copy()
+        state.update(_lock=None, _subscribers=[], _shared=False, _private=None)
+        return state
+    
+    def __setstate__(self, state):
+        """Restore the lock after unpickling or copying."""
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+    
     def __repr__(self):
         """Represent the target list."""
-        return repr(self.__data)
+        return repr(list(self))
     
     @classmethod
     def _type_check(cls, value):
         """Type check the value."""
-        if not isinstance(value, Target):
+        if not isinstance(value, (Target, _LazyTarget)):
             raise TypeError("{0:s} must contain only subclasses of {1:s}".format(
                 cls.__name__, Target.__name__
             ))
         return value
     
+    def subscribe(self, callback):
+        """Call ``callback`` with a :class:`Change` after each change to this list.
+        
+        Changes are reported after they are made, so the list is already up
+        to date when ``callback`` is called. This lets structures derived from
+        the list update only the affected targets. Changes made directly to a
+        :class:`Target` in the list are not reported; use :meth:`set_keyword`
+        to change keywords. Returns ``callback``.
+        """
+        self._subscribers.append(callback)
+        return callback
+        
+    def unsubscribe(self, callback):
+        """Stop calling ``callback`` when this list changes."""
+        self._subscribers.remove(callback)
+    
+    def _changed(self, kind, index, keyword=None):
+        """Discard cached values affected by a change, and notify subscribers.
+        
+        Changes to keywords only discard the cached values for that keyword,
+        and invalidate views grouped by it. Any other change invalidates
+        views of this list.
+        """
+        if kind == 'keyword':
+            self._columns.pop(keyword, None)
+            self._groups.pop(keyword, None)
+            self._keyword_versions[keyword] = self._keyword_versions.get(keyword, 0) + 1
+        else:
+            self._catalog = None
+            self._columns = {}
+            self._groups = {}
+            self._version += 1
+        if self._subscribers:
+            change = Change(kind, np.asarray(index, dtype=np.intp).reshape((-1,)), keyword)
+            for callback in list(self._subscribers):
+                callback(change)
+    
+    def snapshot(self):
+        """An immutable copy of this list, as a :class:`TargetListSnapshot`.
+        
+        Taking a snapshot doesn't copy anything. The snapshot shares the
+        underlying list and targets with this list, and this list copies them
+        only when it is next changed: the list of targets on the first
+        structural change, and a single target the first time
+        :meth:`set_keyword` or :meth:`delete_keyword` changes it. Snapshots
+        can be read from other threads without locks, while this list
+        continues to change.
+        
+        Changes made directly to a :class:`Target` in the list are not copied,
+        and are seen by snapshots too.
+        """
+        with self._lock:
+            self._shared = True
+            self._private = {}
+            snapshot = TargetListSnapshot()
+            snapshot.__data = self.__data
+            snapshot._catalog = self._catalog
+            snapshot._columns = dict(self._columns)
+            return snapshot
+    
+    def _writable(self):
+        """Copy the underlying list before changing it, if a snapshot shares it."""
+        if self._shared:
+            self.__data = list(self.__data)
+            self._shared = False
+    
+    def _writable_target(self, index):
+        """The target at ``index``, copied first if a snapshot might share it."""
+        self._writable()
+        target = self[index]
+        if self._private is not None and id(target) not in self._private:
+            target = copy.copy(target)
+            target.keywords = collections.OrderedDict(target.keywords)
+            self.__data[index] = self._private[id(target)] = target
+        return target
+    
+    def _position(self, key):
+        """The non-negative position for an integer index or a target name."""
+        if isinstance(key, six.string_types):
+            for i, t in enumerate(self.__data):
+                if t.name == key:
+                    return i
+            raise KeyError("No target with name '{0:s}' found".format(key))
+        return range(len(self.__data))[key]
+    
     def __setitem__(self, key, value):
         """Ensure type consistency!"""
-        return self.__data.__setitem__(key, self._type_check(value))
+        with self._lock:
+            key = self._position(key)
+            self._writable()
+            self.__data[key] = self._type_check(value)
+            self._changed('replace', key)
     
     if six.PY2:
         def __getslice__(self, start, end):
@@ -185,37 +614,79 @@ class TargetList(collections.MutableSequence):
             return self.__getitem__(slice(start, end))
     
     def __getitem__(self, key):
-        """Ensure that we always get back a TargetList"""
+        """Get a target by position or by name. Slices are :class:`TargetListView` objects."""
         
         # Support indexing by name.
         if isinstance(key, six.string_types):
-            for t in self:
+            for i, t in enumerate(self.__data):
                 if t.name == key:
-                    return t
+                    return self[i]
             else:
                 raise KeyError("No target with name '{0:s}' found".format(key))
         
-        # Support regular list indexing, but turn it into a TargetList
-        # if we would otherwise return a list.
+        # Slices share storage with this list, instead of copying it.
+        if isinstance(key, slice):
+            return TargetListView(self, np.arange(*key.indices(len(self.__data))))
         r = self.__data.__getitem__(key)
-        if isinstance(r, list):
-            return self.__class__(r)
+        if isinstance(r, _LazyTarget):
+            with self._lock:
+                r = self._keep(key, r.materialize())
         return r
         
+    def _entries(self):
+        """The underlying list, which may hold lazy placeholders."""
+        return self.__data
+        
+    def _keep(self, index, target):
+        """Replace a lazy placeholder with its target, unless a snapshot shares the underlying list.
+        
+        The placeholder keeps the target it made, so the same target is
+        returned either way. Call with the lock held.
+        """
+        if not self._shared:
+            self.__data[index] = target
+        return target
+    
+    def _materialize_rows(self):
+        """Create the targets for any lazy placeholders, keeping them where the list isn't shared."""
+        with self._lock:
+            return [ self._keep(i, t.materialize()) if isinstance(t, _LazyTarget) else t
+                for i, t in enumerate(self.__data) ]
+    
+    def materialize(self):
+        """Create every target and position in this list which was deferred.
+        
+        Targets read lazily from a table are created, and positions kept as
+        starlist tokens are parsed together, with a single coordinate object
+        created for each distinct equinox.
+        """
+        groups = collections.OrderedDict()
+        for t in self._materialize_rows():
+            if t._position is None and t._position_tokens is not None:
+                groups.setdefault(t._position_tokens.equinox, []).append(t)
+        for equinox, targets in groups.items():
+            positions = parse_starlist_position([ t._position_tokens.ra for t in targets ],
+                [ t._position_tokens.dec for t in targets ], equinox)
+            for i, t in enumerate(targets):
+                t._position = positions[i]
+        
     def __delitem__(self, key):
         """Delete an item by key."""
-        if isinstance(key, six.string_types):
-            for i, t in self:
-                if t.name == key:
-                    key = i
-                    break
+        with self._lock:
+            self._writable()
+            if isinstance(key, slice):
+                index = np.arange(*key.indices(len(self.__data)))
             else:
-                raise ValueError("No target with name '{0:s}' found".format(key))
-        return self.__data.__delitem__(key)
+                try:
+                    index = key = self._position(key)
+                except KeyError as e:
+                    raise ValueError(*e.args)
+            self.__data.__delitem__(key)
+            self._changed('delete', np.sort(np.atleast_1d(index)))
         
     def __add__(self, item):
         """Add two TargetList objects together."""
-        if isinstance(item, self.__class__):
+        if isinstance(item, (TargetList, TargetListView)):
             new = self.__class__(self.__data)
             new.extend(item)
             return new
@@ -233,73 +704,609 @@ class TargetList(collections.MutableSequence):
         """Length, from the underlying list."""
         return self.__data.__len__()
         
-    def sort(self, *args, **kwargs):
+    def sort(self, key=None, reverse=False):
         """Sort the list."""
-        return self.__data.sort(*args, **kwargs)
+        with self._lock:
+            self._writable()
+            self._materialize_rows()
+            data = self.__data
+            order = sorted(range(len(data)), key=lambda i: data[i] if key is None else key(data[i]), reverse=reverse)
+            self.__data = [ data[i] for i in order ]
+            self._changed('reorder', order)
+        
+    def reverse(self):
+        """Reverse the list in place, as a single reorder."""
+        with self._lock:
+            self._writable()
+            order = np.arange(len(self.__data))[::-1]
+            self.__data = self.__data[::-1]
+            self._changed('reorder', order)
         
     def insert(self, index, item):
         """Insert an item, and check type."""
-        return self.__data.insert(index, self._type_check(item))
+        item = self._type_check(item)
+        with self._lock:
+            self._writable()
+            index = max(0, min(len(self.__data), index + len(self.__data) if index < 0 else index))
+            self.__data.insert(index, item)
+            self._changed('insert', index)
+        
+    def extend(self, values):
+        """Append many targets at once.
+        
+        Targets from another :class:`TargetList` or a :class:`TargetListView`
+        are already known to be valid, so their types are not checked again.
+        """
+        if isinstance(values, TargetListView):
+            entries = values.parent._entries()
+            items = [ entries[i] for i in values.index ]
+        elif isinstance(values, TargetList):
+            items = list(values._entries())
+        else:
+            items = list(values)
+            if not all(isinstance(item, (Target, _LazyTarget)) for item in items):
+                for item in items:
+                    self._type_check(item)
+        with self._lock:
+            self._writable()
+            start = len(self.__data)
+            self.__data.extend(items)
+            self._changed('insert', np.arange(start, len(self.__data)))
     
     @classmethod
-    def from_starlist(cls, filename):
-        """From a starlist"""
-        return cls(Target(name, position, _keywords=kw) for name, position, kw in parse_starlist(filename))
+    def from_starlist(cls, filename, lazy=False):
+        """From a starlist.
+        
+        When ``lazy`` is set, target positions are kept as starlist tokens
+        until they are needed. Use :meth:`materialize` to parse all of them at once.
+        """
+        return cls(Target(name, position, _keywords=kw) for name, position, kw in parse_starlist(filename, lazy=lazy))
     
     @classmethod
-    def from_table(cls, table):
-        """Reconstruct the starlist from a table created by self.table()"""
-        if "Name" in table.colnames:
-            names = table['Name']
-            table.remove_column('Name')
-        else:
+    def from_table(cls, table, frame='icrs', copy=False):
+        """Make a target list from a table, such as one created by :meth:`table`.
+        
+        The table is not modified. Targets are created from table rows only
+        when they are accessed, and the positions of all targets are converted
+        to a single catalog up front.
+        
+        Parameters
+        ----------
+        table : :class:`~astropy.table.Table`
+            The table. It must have a ``Name`` column, and either a ``Position``
+            column or ``RA`` and ``Dec`` columns. Columns without units are
+            assumed to be in hourangle (``RA``) and degrees (``Dec``). All other
+            columns become keywords, skipping masked values.
+        frame : string
+            The frame for ``RA`` and ``Dec`` columns.
+        copy : bool
+            Copy the table columns. By default, targets share the column data
+            with the table, so the table should not be changed while the target
+            list is in use.
+        
+        """
+        if "Name" not in table.colnames:
             raise ValueError("Table must have a 'Name' column.")
         if "Position" in table.colnames:
             positions = SkyCoord(table['Position'])
-            table.remove_column('Position')
+            position_columns = ['Position']
         elif "RA" in table.colnames and "Dec" in table.colnames:
-            positions = SkyCoord(table['RA'], table['Dec'])
-            table.remove_columns(['RA', 'Dec'])
+            ra = u.Quantity(np.asarray(table['RA']), table['RA'].unit or u.hourangle, copy=False)
+            dec = u.Quantity(np.asarray(table['Dec']), table['Dec'].unit or u.degree, copy=False)
+            positions = SkyCoord(ra, dec, frame=frame)
+            position_columns = ['RA', 'Dec']
         else:
             raise ValueError("Table must have either 'Position' or 'RA' and 'Dec' columns.")
-        return cls(Target(name, position, _keywords=[(k,row[k]) for k in row.colnames if row[k] is not np.ma.masked ]) for name, position, row in zip(names, positions, table))
+        catalog = positions if positions.frame.name == 'icrs' else positions.transform_to('icrs')
+        
+        columns = []
+        for name in table.colnames:
+            if name == 'Name' or name in position_columns:
+                continue
+            column = table[name]
+            mask = getattr(column, 'mask', None)
+            if mask is not None and not np.any(mask):
+                mask = None
+            if mask is not None:
+                mask = np.array(mask) if copy else np.asarray(mask)
+            columns.append((name, np.array(column) if copy else np.asarray(column), mask, column.unit))
+        names = np.array(table['Name']) if copy else np.asarray(table['Name'])
+        rows = _TableRows(names, catalog, columns)
+        
+        new = cls(_LazyTarget(rows, i, Target) for i in range(len(table)))
+        new._catalog = catalog
+        return new
+    
+    @classmethod
+    def from_names(cls, names, cache=None, resolver=sesame_resolver, concurrency=4):
+        """Make a target list by resolving object names.
+        
+        Names are looked up in a local cache first, and only the misses are
+        sent to the resolver, several at a time.
+        
+        Parameters
+        ----------
+        names : sequence of str
+            The object names.
+        cache : :class:`~KOPy.resolver.NameCache` or str, optional
+            The cache, or a cache filename. By default, the shared cache in the
+            astropy cache directory is used. Pass ``False`` to skip the cache.
+        resolver : callable
+            Resolves a single name to a :class:`~astropy.coordinates.SkyCoord`.
+            Use :class:`~KOPy.resolver.FileResolver` to resolve names offline.
+        concurrency : int
+            The maximum number of names sent to the resolver at once.
+        
+        """
+        names = list(names)
+        catalog = resolve_names(names, cache=cache, resolver=resolver, concurrency=concurrency)
+        new = cls(Target(name, position) for name, position in zip(names, catalog))
+        new._catalog = catalog
+        return new
+        
+    def save(self, filename):
+        """Save this list in a binary ``.npz`` file, which can be loaded quickly with :meth:`load`.
+        
+        Positions are stored as ICRS unit vectors, so targets loaded from the
+        file have ICRS positions. Keywords are stored as typed columns, in the
+        same way as :meth:`table`, with units for
+        :class:`~astropy.units.Quantity` values. The file is written
+        uncompressed, so that it can be memory-mapped.
+        
+        Parameters
+        ----------
+        filename : str or fileobj
+            The file to write. ``.npz`` is added to filenames which don't end with it.
+        
+        """
+        source = self._lazy_source()
+        if source is not None:
+            # Every target is still a row of the same table, so use its columns directly.
+            rows, index = source
+            columns = []
+            for key, values, mask, unit in rows.columns:
+                mask = np.zeros((len(index),), dtype=bool) if mask is None else np.asarray(mask)[index]
+                if not np.all(mask):
+                    columns.append((key, np.asarray(values)[index], mask, unit))
+        else:
+            keywords = collections.OrderedDict()
+            for i, t in enumerate(self):
+                for key, value in t.keywords.items():
+                    rows, values = keywords.setdefault(key, ([], []))
+                    rows.append(i)
+                    values.append(value)
+            columns = []
+            for key, (rows, values) in keywords.items():
+                column = _keyword_column(key, len(self), rows, values)
+                columns.append((key, np.asarray(column), np.asarray(column.mask), column.unit))
+        
+        catalog = self.catalog()
+        xyz = catalog.represent_as(UnitSphericalRepresentation).to_cartesian().xyz.value.reshape((3, -1)).T
+        arrays = {
+            'format' : np.array(_NPZ_FORMAT),
+            'names' : np.array(self.names, dtype=six.text_type).reshape((-1,)),
+            'xyz' : np.ascontiguousarray(xyz),
+            'keywords' : np.array([ key for key, _, _, _ in columns ], dtype=six.text_type).reshape((-1,)),
+            'units' : np.array([ "" if unit is None else unit.to_string() for _, _, _, unit in columns ],
+                dtype=six.text_type).reshape((-1,)),
+        }
+        for j, (key, values, mask, unit) in enumerate(columns):
+            arrays['data{0:d}'.format(j)] = values
+            arrays['mask{0:d}'.format(j)] = mask
+        np.savez(filename, **arrays)
+        
+    def _lazy_source(self):
+        """If every entry is an unused placeholder for a row of the same table, return the rows and their indices."""
+        rows = getattr(self.__data[0], '_rows', None) if self.__data else None
+        if rows is None:
+            return None
+        for t in self.__data:
+            if not isinstance(t, _LazyTarget) or t._rows is not rows or t._target is not None:
+                return None
+        return rows, np.fromiter((t._index for t in self.__data), dtype=np.intp, count=len(self.__data))
+        
+    @classmethod
+    def load(cls, filename, mmap=True):
+        """Load a list written by :meth:`save`.
+        
+        The arrays in the file are memory-mapped, so only the parts which are
+        used are read from disk. Targets are created from the file only when
+        they are accessed, as in :meth:`from_table`, and the ICRS catalog is
+        built directly from the stored unit vectors.
+        
+        Parameters
+        ----------
+        filename : str
+            The file to read.
+        mmap : bool
+            Memory-map the arrays. Otherwise, they are read into memory.
+        
+        """
+        arrays = _load_npz(filename, mmap=mmap)
+        if int(arrays.get('format', -1)) != _NPZ_FORMAT:
+            raise ValueError("'{0:s}' is not a {1:s} file.".format(filename, cls.__name__))
+        
+        xyz = arrays['xyz']
+        representation = CartesianRepresentation(xyz[:,0], xyz[:,1], xyz[:,2]).represent_as(UnitSphericalRepresentation)
+        catalog = SkyCoord(ICRS(representation))
+        
+        columns = []
+        for j, (key, unit) in enumerate(zip(arrays['keywords'], arrays['units'])):
+            mask = arrays['mask{0:d}'.format(j)]
+            columns.append((str(key), arrays['data{0:d}'.format(j)], mask if np.any(mask) else None,
+                u.Unit(str(unit)) if len(unit) else None))
+        rows = _TableRows(arrays['names'], catalog, columns)
+        
+        new = cls()
+        new.__data = [ _LazyTarget(rows, i, Target) for i in range(len(catalog)) ]
+        new._catalog = catalog
+        return new
+    
+    def set_keyword(self, key, name, value):
+        """Set a keyword on one target, and notify subscribers.
+        
+        Parameters
+        ----------
+        key : int or string
+            The position or name of the target.
+        name : string
+            The keyword.
+        value :
+            The new value.
+        
+        """
+        with self._lock:
+            index = self._position(key)
+            self._writable_target(index).keywords[name] = value
+            self._changed('keyword', index, name)
+        
+    def delete_keyword(self, key, name):
+        """Remove a keyword from one target, and notify subscribers."""
+        with self._lock:
+            index = self._position(key)
+            del self._writable_target(index).keywords[name]
+            self._changed('keyword', index, name)
     
     @property
     def names(self):
         """Target names."""
-        return [ t.name for t in self ]
+        return [ t.name for t in self.__data ]
         
     def catalog(self):
-        """Make a single SkyCoord object for all targets."""
-        return SkyCoord([t.position.transform_to('icrs') for t in self])
+        """Make a single SkyCoord object for all targets, in the ICRS frame.
+        
+        The catalog is cached until this list is modified. Changes made
+        directly to the position of a :class:`Target` in the list are not
+        detected.
+        """
+        if self._catalog is None:
+            self._catalog = _icrs_catalog(self.__data)
+        return self._catalog
+        
+    def column(self, name):
+        """Extract a keyword from every target, as a :class:`~KOPy.query.KeywordColumn`.
+        
+        Columns are cached until this list is modified. Changes made directly
+        to the keywords of a :class:`Target` in the list are not detected.
+        """
+        if name not in self._columns:
+            self._columns[name] = keyword_column(self, name)
+        return self._columns[name]
+        
+    def where(self, expression):
+        """The indices of targets which match a keyword expression.
+        
+        Parameters
+        ----------
+        expression : :class:`~KOPy.query.Expression`
+            The condition, built from :class:`~KOPy.query.Keyword` objects.
+        
+        Returns
+        -------
+        index : array
+            Indices of the matching targets, in order.
+        
+        """
+        return np.flatnonzero(expression(self.column))
+        
+    def select(self, expression):
+        """A new list of the targets which match a keyword expression.
+        
+        The new list holds the same :class:`Target` objects, which are not
+        copied. See :meth:`where`.
+        """
+        return self.__class__(self.__data[i] for i in self.where(expression))
+        
+    def groupby(self, keyword):
+        """Group targets by the value of a keyword.
+        
+        The index from each value to the positions of its targets is built
+        in a single pass over the keyword column, and is cached until this
+        list is modified, so repeated groupings are cheap. Targets without
+        the keyword are not in any group.
+        
+        Parameters
+        ----------
+        keyword : string
+            The keyword, e.g. ``'target'`` to group calibrators by their
+            science target.
+        
+        Returns
+        -------
+        groups : OrderedDict
+            A :class:`TargetListView` for each keyword value, in the order
+            each value first appears. The views become invalid when the
+            keyword is changed on any target in this list.
+        
+        """
+        if keyword not in self._groups:
+            column = self.column(keyword)
+            present = np.flatnonzero(~column.mask)
+            values, first, inverse = np.unique(column.data[present], return_index=True, return_inverse=True)
+            order = np.argsort(inverse, kind='mergesort')
+            members = np.split(present[order], np.cumsum(np.bincount(inverse, minlength=len(values)))[:-1])
+            index = collections.OrderedDict()
+            for i in np.argsort(first, kind='mergesort'):
+                index[values[i].item()] = members[i]
+            self._groups[keyword] = index
+        return collections.OrderedDict((value, TargetListView(self, members, keyword))
+            for value, members in self._groups[keyword].items())
+        
+    def crossmatch(self, other, radius, nearest=False):
+        """Match the targets in this list against another list of targets.
+        
+        Matching is done with a KD-tree, via :func:`~astropy.coordinates.search_around_sky`.
+        The tree for ``other`` is cached on its catalog, so repeated matches
+        against the same (e.g. master) list don't rebuild it.
+        
+        Parameters
+        ----------
+        other : :class:`TargetList` or :class:`~astropy.coordinates.SkyCoord`
+            The targets to match against. Coordinates must be array-valued.
+        radius : :class:`~astropy.units.Quantity`
+            The maximum separation for a match, as an angle.
+        nearest : bool
+            If set, keep only the closest match in ``other`` for each target
+            in this list. Otherwise, all pairs within ``radius`` are returned.
+        
+        Returns
+        -------
+        match : :class:`CrossMatch`
+            The indices and separations of matched pairs, and the indices of
+            targets in each list without any match.
+        
+        """
+        radius = Angle(radius)
+        if isinstance(other, TargetList):
+            other_catalog = other.catalog()
+        else:
+            other_catalog = SkyCoord(other).transform_to('icrs')
+        
+        if len(self) and len(other_catalog):
+            index, other_index, separation, _ = search_around_sky(self.catalog(), other_catalog, radius)
+        else:
+            index = np.zeros((0,), dtype=np.intp)
+            other_index = np.zeros((0,), dtype=np.intp)
+            separation = Angle(np.zeros((0,)), u.degree)
+        
+        if nearest and len(index):
+            order = np.lexsort((separation.radian, index))
+            _, first = np.unique(index[order], return_index=True)
+            keep = order[first]
+            index, other_index, separation = index[keep], other_index[keep], separation[keep]
+        
+        matched = np.zeros((len(self),), dtype=bool)
+        matched[index] = True
+        other_matched = np.zeros((len(other_catalog),), dtype=bool)
+        other_matched[other_index] = True
+        return CrossMatch(index, other_index, separation, 
+            np.flatnonzero(~matched), np.flatnonzero(~other_matched))
+        
+    def deduplicate(self, tolerance=1 * u.arcsec, keep='first'):
+        """Merge targets which are at (nearly) the same position.
+        
+        Close pairs are found with a spatial hash, in time proportional to
+        the length of the list. Groups are linked transitively, so a chain
+        of targets each within ``tolerance`` of the next form one group.
+        
+        Parameters
+        ----------
+        tolerance : :class:`~astropy.units.Quantity`
+            The maximum separation between duplicate targets.
+        keep : string or callable
+            How to choose the representative of each group: ``'first'`` or
+            ``'last'`` in list order, ``'keywords'`` for the target with
+            the most keywords, or a function of a target, where the target
+            with the smallest value is kept.
+        
+        Returns
+        -------
+        result : :class:`Deduplication`
+            The representative targets, and the map from each target to its
+            representative.
+        
+        """
+        tolerance = Angle(tolerance)
+        n = len(self)
+        if not n:
+            return Deduplication(self.__class__(), np.zeros((0,), dtype=int), np.zeros((0,), dtype=int))
+        vectors = self.catalog().represent_as(UnitSphericalRepresentation).to_cartesian().xyz.value.reshape((3, -1)).T
+        labels = _connected_labels(n, *_coincident_pairs(vectors, tolerance))
+        
+        if keep == 'first':
+            rank = np.arange(n)
+        elif keep == 'last':
+            rank = -np.arange(n)
+        elif keep == 'keywords':
+            rank = np.array([ -len(t.keywords) for t in self ])
+        elif callable(keep):
+            rank = np.array([ keep(t) for t in self ])
+        else:
+            raise ValueError("Unknown rule for keeping targets: {0!r}".format(keep))
+        
+        # Sort by group, then by rank, so each group's representative comes first.
+        order = np.lexsort((np.arange(n), rank, labels))
+        leaders = order[np.r_[True, labels[order][1:] != labels[order][:-1]]]
+        representative = np.sort(leaders)
+        slot = np.zeros((n,), dtype=int)
+        slot[labels[representative]] = np.arange(len(representative))
+        targets = self.__class__(self.__data[i] for i in representative)
+        return Deduplication(targets, representative, slot[labels])
+        
+    def _matches(self, other, by, tolerance):
+        """Find which targets in this list and in ``other`` have a match in the other list.
+        
+        Returns the entries of ``other``, and boolean arrays marking the
+        matched targets in each list.
+        """
+        if isinstance(other, TargetListView):
+            entries = other.parent._entries()
+            entries = [ entries[i] for i in other.index ]
+        else:
+            if not isinstance(other, TargetList):
+                other = TargetList(other)
+            entries = other._entries()
+        n = len(self.__data)
+        mine = np.zeros((n,), dtype=bool)
+        theirs = np.zeros((len(entries),), dtype=bool)
+        if by == 'name':
+            names = set(t.name for t in entries)
+            mine[:] = [ t.name in names for t in self.__data ]
+            names = set(t.name for t in self.__data)
+            theirs[:] = [ t.name in names for t in entries ]
+        elif by == 'position':
+            if n and len(entries):
+                catalogs = [self.catalog(), other.catalog()]
+                vectors = np.concatenate([ catalog.represent_as(UnitSphericalRepresentation).to_cartesian().xyz.value.reshape((3, -1)).T
+                    for catalog in catalogs ])
+                i, j = _coincident_pairs(vectors, Angle(tolerance))
+                # Pairs are ordered, so only j can be in the other list.
+                between = (i < n) & (j >= n)
+                mine[i[between]] = True
+                theirs[j[between] - n] = True
+        else:
+            raise ValueError("Targets can be matched by 'name' or 'position', not {0!r}".format(by))
+        return entries, mine, theirs
+        
+    def union(self, other, by='name', tolerance=1 * u.arcsec):
+        """Targets in this list, followed by targets in ``other`` which don't match any of them.
+        
+        Parameters
+        ----------
+        other : :class:`TargetList`, :class:`TargetListView` or iterable of :class:`Target`
+            The other targets.
+        by : string
+            Match targets by ``'name'``, or by ``'position'`` within ``tolerance``.
+        tolerance : :class:`~astropy.units.Quantity`
+            The maximum separation of targets matched by position.
+        
+        Returns
+        -------
+        targets : :class:`TargetList`
+            A new list, with targets in the order they appear in this list
+            and then ``other``. The targets themselves are not copied.
+        
+        Notes
+        -----
+        Names are matched with a hash table, and positions with a spatial
+        hash, so the set operations take time proportional to the lengths of
+        the lists. Duplicates within a single list are kept.
+        
+        """
+        entries, mine, theirs = self._matches(other, by, tolerance)
+        return self.__class__(itertools.chain(self.__data, (t for t, matched in zip(entries, theirs) if not matched)))
+        
+    def intersection(self, other, by='name', tolerance=1 * u.arcsec):
+        """Targets in this list which match a target in ``other``. See :meth:`union`."""
+        entries, mine, theirs = self._matches(other, by, tolerance)
+        return self.__class__(self.__data[i] for i in np.flatnonzero(mine))
+        
+    def difference(self, other, by='name', tolerance=1 * u.arcsec):
+        """Targets in this list which don't match any target in ``other``. See :meth:`union`."""
+        entries, mine, theirs = self._matches(other, by, tolerance)
+        return self.__class__(self.__data[i] for i in np.flatnonzero(~mine))
+        
+    def symmetric_difference(self, other, by='name', tolerance=1 * u.arcsec):
+        """Targets in either list which don't match any target in the other. See :meth:`union`."""
+        entries, mine, theirs = self._matches(other, by, tolerance)
+        return self.__class__(itertools.chain((self.__data[i] for i in np.flatnonzero(~mine)),
+            (entries[i] for i in np.flatnonzero(~theirs))))
         
     def table(self, coord_mixin=False):
-        """Create a table object which represents this target list."""
+        """Create a table object which represents this target list.
         
-        cols = collections.OrderedDict()
-        def _make_row(t):
-            d = collections.OrderedDict(Name=t.name)
-            d.update(t.keywords)
-            cols.update((k, None) for k in d.keys())
-            return d
+        The table has a ``Name`` column, the position (either as ``RA`` and
+        ``Dec`` columns, or as a single ``Position`` column when ``coord_mixin``
+        is set), and one masked column for each keyword. Keywords with
+        :class:`~astropy.units.Quantity` values become columns with units.
+        """
+        keywords = collections.OrderedDict()
+        names = []
+        for i, t in enumerate(self):
+            names.append(t.name)
+            for key, value in t.keywords.items():
+                try:
+                    rows, values = keywords[key]
+                except KeyError:
+                    rows, values = keywords[key] = ([], [])
+                rows.append(i)
+                values.append(value)
         
+        reserved = set(['Name', 'Position'] if coord_mixin else ['Name', 'RA', 'Dec'])
+        conflicts = reserved.intersection(keywords)
+        if conflicts:
+            raise ValueError("Keywords {0!r} conflict with table columns.".format(sorted(conflicts)))
         
-        data = [ _make_row(t) for t in self ]
-        columns = []
-        for c in cols:
-            ma = np.ma.MaskedArray([d.get(c, np.ma.masked) for d in data])
-            columns.append(MaskedColumn(ma, name=c, mask=ma.mask))
+        catalog = self.catalog()
+        no_mask = np.zeros((len(names),), dtype=bool)
+        columns = [MaskedColumn(np.array(names, dtype=six.text_type), name='Name', mask=no_mask)]
+        if not coord_mixin:
+            columns.append(MaskedColumn(catalog.ra.hourangle, name='RA', unit=u.hourangle, 
+                format=lambda c : Angle(c, u.hourangle).to_string(), mask=no_mask))
+            columns.append(MaskedColumn(catalog.dec.degree, name='Dec', unit=u.degree, 
+                format=lambda c : Angle(c, u.degree).to_string(), mask=no_mask))
+        columns.extend(_keyword_column(key, len(names), rows, values) for key, (rows, values) in keywords.items())
         
         t = Table(columns, masked=True)
         if coord_mixin:
-            t['Position'] = self.catalog()
+            t['Position'] = catalog
             t['Position'].format = lambda c : c.to_string('hmsdms')
-        else:
-            catalog = self.catalog()
-            t.add_column(MaskedColumn(catalog.ra.to(u.hourangle), name='RA', format=lambda c : Angle(c).to_string(), mask=np.zeros(catalog.shape, dtype=np.bool)), index=1)
-            t.add_column(MaskedColumn(catalog.dec, name="Dec", format=lambda c : Angle(c).to_string(), mask=np.zeros(catalog.shape, dtype=np.bool)), index=2)
         return t
         
+    def visibility(self, times, location=KECK):
+        """Compute the altitude, azimuth, airmass and hour angle of every target at every time.
+        
+        See :func:`~KOPy.visibility.visibility_grid`. Transformations for each
+        time are cached, so repeated queries for the same night are fast.
+        
+        Parameters
+        ----------
+        times : :class:`~astropy.time.Time`
+            An array of times.
+        location : :class:`~astropy.coordinates.EarthLocation`
+            The observatory, which defaults to Keck.
+        
+        Returns
+        -------
+        visibility : :class:`~KOPy.visibility.Visibility`
+            Arrays with shape ``(len(self), len(times))``.
+        
+        """
+        return visibility_grid(self.catalog(), times, location=location)
+        
+    def rise_set_transit(self, start, end, location=KECK, horizon=0 * u.degree, airmass=2.0):
+        """Find rise, set and transit times, and the time with airmass below a limit, for every target.
+        
+        See :func:`~KOPy.visibility.rise_set_transit` for details.
+        
+        Returns
+        -------
+        events : :class:`~KOPy.visibility.Events`
+            Event times as arrays, with one entry for each target.
+        
+        """
+        return rise_set_transit(self.catalog(), start, end, location=location, horizon=horizon, airmass=airmass)
+        
     def _to_starlist_stream(self, file, **kwargs):
         """Write to a stream"""
         for t in self:
@@ -316,4 +1323,152 @@ class TargetList(collections.MutableSequence):
         else:
             with open(filename, mode) as stream:
                 self._to_starlist_stream(stream, **kwargs)
-        
\ No newline at end of file
+
+
+class TargetListView(collections.Sequence):
+    """A read-only view of some of the targets in a :class:`TargetList`.
+    
+    Views hold the parent list and an array of indices, so creating one
+    doesn't copy any targets. A view becomes invalid when its parent list is
+    modified, and using it then raises :exc:`RuntimeError`. Use :meth:`copy`
+    to get an independent :class:`TargetList`.
+    
+    Parameters
+    ----------
+    parent : :class:`TargetList`
+        The list being viewed.
+    index : array
+        Indices into ``parent``.
+    keyword : string, optional
+        The keyword the view was grouped by. Changing this keyword in the
+        parent list also invalidates the view.
+    
+    """
+    def __init__(self, parent, index, keyword=None):
+        super(TargetListView, self).__init__()
+        self._parent = parent
+        self._index = np.asarray(index, dtype=np.intp)
+        self._keyword = keyword
+        self._version = (parent._version, parent._keyword_versions.get(keyword, 0))
+        
+    def __repr__(self):
+        """Represent the view."""
+        return repr(list(self))
+        
+    def _check(self):
+        """Make sure the parent list hasn't changed."""
+        if (self._parent._version, self._parent._keyword_versions.get(self._keyword, 0)) != self._version:
+            raise RuntimeError("The {0:s} was modified after this view was created.".format(
+                self._parent.__class__.__name__))
+        
+    @property
+    def parent(self):
+        """The list being viewed."""
+        return self._parent
+        
+    @property
+    def index(self):
+        """Indices of the viewed targets in the parent list."""
+        self._check()
+        return self._index
+        
+    def __len__(self):
+        """Number of targets in the view."""
+        self._check()
+        return len(self._index)
+        
+    def __iter__(self):
+        """Iterate over the viewed targets, checking the parent list before each one."""
+        for i in self._index:
+            self._check()
+            yield self._parent[int(i)]
+        
+    def __getitem__(self, key):
+        """Get a target by position or name, or a narrower view for a slice or index array."""
+        self._check()
+        if isinstance(key, six.string_types):
+            for i in self._index:
+                if self._parent._entries()[i].name == key:
+                    return self._parent[int(i)]
+            raise KeyError("No target with name '{0:s}' found".format(key))
+        if isinstance(key, slice) or not np.isscalar(key):
+            return self.__class__(self._parent, self._index[key], self._keyword)
+        return self._parent[int(self._index[key])]
+        
+    @property
+    def names(self):
+        """Target names."""
+        self._check()
+        data = self._parent._entries()
+        return [ data[i].name for i in self._index ]
+        
+    def catalog(self):
+        """The positions of the viewed targets, from the parent's cached catalog."""
+        self._check()
+        return self._parent.catalog()[self._index]
+        
+    def column(self, name):
+        """The values of a keyword for the viewed targets, from the parent's cached column."""
+        self._check()
+        column = self._parent.column(name)
+        return column._replace(data=column.data[self._index], mask=column.mask[self._index])
+        
+    def where(self, expression):
+        """Indices into this view of targets which match a keyword expression."""
+        return np.flatnonzero(expression(self.column))
+        
+    def select(self, expression):
+        """A narrower view of the targets which match a keyword expression."""
+        return self[self.where(expression)]
+        
+    def copy(self):
+        """Copy the viewed targets into a new :class:`TargetList`. The targets themselves are not copied."""
+        self._check()
+        data = self._parent._entries()
+        return self._parent.__class__(data[i] for i in self._index)
+        
+    def to_starlist(self, filename, mode='w', **kwargs):
+        """Write the viewed targets to a starlist file. See :meth:`TargetList.to_starlist`."""
+        return self.copy().to_starlist(filename, mode=mode, **kwargs)
+        
+    def table(self, coord_mixin=False):
+        """Create a table of the viewed targets. See :meth:`TargetList.table`."""
+        return self.copy().table(coord_mixin=coord_mixin)
+        
+
+class TargetListSnapshot(TargetList):
+    """An immutable :class:`TargetList`, from :meth:`TargetList.snapshot`.
+    
+    Snapshots support everything a :class:`TargetList` does except changes,
+    which raise :exc:`TypeError`. Use :meth:`copy` for a list which can be
+    changed.
+    """
+    _frozen = False
+    
+    def __init__(self, iterable=None):
+        super(TargetListSnapshot, self).__init__(iterable)
+        self._frozen = True
+    
+    def __setstate__(self, state):
+        """Restore the lock after unpickling or copying."""
+        super(TargetListSnapshot, self).__setstate__(state)
+        self._frozen = True
+    
+    def _writable(self):
+        """Snapshots can't be changed."""
+        if self._frozen:
+            raise TypeError("{0:s} can't be changed, use copy() to make a list which can.".format(
+                self.__class__.__name__))
+        super(TargetListSnapshot, self)._writable()
+    
+    def _keep(self, index, target):
+        """Snapshots share the underlying list, so never replace placeholders in it."""
+        return target
+    
+    def snapshot(self):
+        """Snapshots are already immutable, so return this snapshot."""
+        return self
+    
+    def copy(self):
+        """A new :class:`TargetList` of the targets in this snapshot. The targets themselves are not copied."""
+        return TargetList(self)
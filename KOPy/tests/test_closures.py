@@ -4,8 +4,12 @@ Tests for the LGS closure parser.
 """
 
 import pytest
-from KOPy.closures import Regions
+import numpy as np
+from KOPy.closures import Regions, Opening, Closure
+from KOPy.targets import TargetList, Target
 from astropy.time import Time
+from astropy.coordinates import SkyCoord
+import astropy.units as u
 
 @pytest.fixture
 def closures_filename():
@@ -27,5 +31,84 @@ def test_parse_closures(closures_filename):
     assert lazer_zenith.open(Time('2015-08-07 11:50:29'))
     assert not lazer_zenith.open(Time('2015-08-07 11:50:32'))
     assert not lazer_zenith.open(Time('2015-08-07 11:50:30'))
-    
-    
\ No newline at end of file
+
+def test_region_open_vectorized(closures_filename):
+    """Open accepts an array of times, and agrees with the scalar form."""
+    regions = Regions.parse(closures_filename, date='2015-08-07')
+    region = regions["lazer_zenith"]
+    starts, ends = region.intervals
+    assert np.all(starts[1:] > ends[:-1])
+    times = Time('2015-08-07 05:00:00') + np.linspace(0, 12, 500) * u.hour
+    mask = region.open(times)
+    assert mask.shape == times.shape
+    assert mask.any() and not mask.all()
+    assert list(mask[::50]) == [ region.open(time) for time in times[::50] ]
+    assert np.array_equal(region.closed(times), ~mask)
+    expected = [ any(opening.start < time < opening.end for opening in region.openings) for time in times[::25] ]
+    assert list(mask[::25]) == expected
+
+def test_region_window_views(closures_filename):
+    """Windows are created from the region's arrays, and compare by value."""
+    regions = Regions.parse(closures_filename, date='2015-08-07')
+    region = regions["lazer_zenith"]
+    assert region.keywords == {}
+    openings = region.openings
+    assert openings == region.openings
+    assert all(a.start < b.start for a, b in zip(openings[:-1], openings[1:]))
+
+    closures = list(region.closures)
+    assert len(closures) == len(openings) - 1
+    assert all(isinstance(closure, Closure) for closure in closures)
+    assert closures[0].start == openings[0].end
+    assert list(region.events)[1] == closures[0]
+
+    Opening(region, openings[0].start, openings[0].end)
+    assert len(region.openings) == len(openings)
+    opening = Opening(region, openings[-1].end, openings[-1].end + 600 * u.s)
+    assert region.openings[-1] == opening
+    assert abs(opening.duration - 600 * u.s) < 1 * u.ms
+
+def test_regions_contains(closures_filename):
+    """Regions contain positions within their radius, and are queried in batches."""
+    regions = Regions.parse(closures_filename, date='2015-08-07')
+    region = regions["eng341"]
+    center = region.position.transform_to('icrs')
+    near = SkyCoord(center.ra, center.dec + 1 * u.arcmin)
+    far = SkyCoord(center.ra, center.dec + 10 * u.arcmin)
+    assert region.contains(near)
+    assert not region.contains(far)
+    assert not regions["lazer_zenith"].contains(near)
+
+    positions = SkyCoord([near, far, near])
+    assert list(regions.contains(positions)) == [True, False, True]
+    assert regions.contains(near) is True
+    coverage = regions.covering(positions)
+    assert list(coverage.index) == [0, 2]
+    assert coverage.regions(3) == [["eng341"], [], ["eng341"]]
+
+    start, end = region.intervals
+    during = Time((start[0] + end[0]) / 2.0, format='unix')
+    assert regions.open(near, during) == region.open(during)
+    assert not regions.open(far, during)
+    assert list(regions.open(positions, during)) == [region.open(during), False, region.open(during)]
+    assert list(regions.closed(positions, during)) == [region.closed(during), True, region.closed(during)]
+    assert regions.closed(far, during) is True
+    with pytest.raises(TypeError):
+        regions.open(positions, during + np.arange(3) * u.minute)
+
+def test_regions_open_matrix(closures_filename):
+    """The batch laser-open matrix agrees with Regions.open for each pair."""
+    regions = Regions.parse(closures_filename, date='2015-08-07')
+    names = ["eng341", "eng343", "eng017"]
+    centers = [ regions[name].position.transform_to('icrs') for name in names ]
+    targets = TargetList(Target("T{0:d}".format(i), SkyCoord(c.ra, c.dec + 30 * u.arcsec)) for i, c in enumerate(centers))
+    targets.append(Target("Far", SkyCoord(0 * u.deg, -60 * u.deg)))
+    times = Time('2015-08-07 05:00:00') + np.linspace(0, 8, 40) * u.hour
+
+    matrix = regions.open_matrix(targets, times)
+    assert matrix.shape == (len(targets), len(times))
+    assert not matrix[-1].any()
+    assert matrix.any() and not matrix[:3].all()
+    for i in range(len(targets)):
+        for j in range(0, len(times), 7):
+            assert matrix[i, j] == regions.open(targets[i].position, times[j])
@@ -0,0 +1,65 @@
+import pytest
+
+from ..document import StarlistDocument
+from ..targets import Target
+
+STARLIST = """# Calibrators
+Alpha           01 00 00.0 +10 00 00.0 2000 vmag=10.0
+
+# Science
+Beta            02 00 00.000 +20 00 00.000 2000 vmag=11.00
+Gamma           03 00 00.000 +30 00 00.000 2000 vmag=12.00
+# End
+"""
+
+def test_document_roundtrip(tmpdir):
+    """An unchanged document is written back exactly."""
+    path = tmpdir.join("starlist.txt")
+    path.write(STARLIST)
+    document = StarlistDocument.read(str(path))
+    assert document.targets.names == ["Alpha", "Beta", "Gamma"]
+    assert document.to_string() == STARLIST
+    assert document.modified == []
+    
+def test_document_reverse():
+    """Reversing the list moves the original lines, without formatting them again."""
+    document = StarlistDocument(STARLIST.splitlines())
+    document.targets.reverse()
+    assert document.targets.names == ["Gamma", "Beta", "Alpha"]
+    assert document.modified == []
+    lines = STARLIST.splitlines()
+    assert document.to_string().splitlines() == lines[5:6] + lines[2:5] + lines[:2] + lines[6:]
+    
+def test_document_edits(tmpdir):
+    """Only changed targets are formatted again, and comments move with their targets."""
+    document = StarlistDocument(STARLIST.splitlines())
+    lines = STARLIST.splitlines()
+    
+    document.targets.set_keyword("Gamma", "vmag", 9)
+    assert document.modified == [2]
+    text = document.to_string().splitlines()
+    assert text[:5] == lines[:5]
+    assert text[5] == document.targets["Gamma"].to_starlist()
+    
+    document.targets.append(Target("Delta", "4h0m0s +40d0m0s"))
+    del document.targets["Beta"]
+    text = document.to_string().splitlines()
+    assert text[:4] == lines[:4]
+    assert text[4].startswith("Gamma")
+    assert text[5].startswith("Delta")
+    assert text[6] == "# End"
+    
+    document.targets.sort(key=lambda t : t.name, reverse=True)
+    text = document.to_string().splitlines()
+    assert [ line[:5] for line in text ] == ["", "# Sci", "Gamma", "Delta", "# Cal", "Alpha", "# End"]
+    
+    with pytest.raises(ValueError):
+        document.save()
+    document.save(str(tmpdir.join("saved.txt")))
+    assert document.modified == []
+    assert tmpdir.join("saved.txt").read() == "\n".join(text) + "\n"
+    assert document.to_string() == "\n".join(text) + "\n"
+    
+    document.targets[0].keywords['vmag'] = 1
+    document.touch(0)
+    assert document.modified == [0]
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the guide star finder.
+"""
+
+import pytest
+import astropy.units as u
+from astropy.coordinates import SkyCoord
+
+from ..targets import Target, TargetList
+from ..guidestars import GuideStarFinder
+
+@pytest.fixture
+def targetlist():
+    """An example target list, with science targets and guide stars."""
+    import pkg_resources
+    return TargetList.from_starlist(pkg_resources.resource_filename(__name__, 'data/small_starlist.txt'))
+
+@pytest.fixture
+def science():
+    """A science target, with candidate guide stars around it."""
+    position = SkyCoord("09 00 25.3950", "39 03 54.190", unit=(u.hourangle, u.degree), frame='fk5')
+    return Target("IRASF08572+3915", position, lgs=1)
+
+@pytest.fixture
+def candidates(science):
+    """Candidate guide stars around the science target."""
+    def offset(name, dra, ddec, **kwargs):
+        position = SkyCoord(science.position.ra + dra * u.arcsec, science.position.dec + ddec * u.arcsec, frame='fk5')
+        return Target(name, position, **kwargs)
+    return TargetList([science, offset("faint", 10, 0, rmag=16.5), offset("bright", 50, 0, rmag=13.66),
+        offset("unknown", 5, 5), offset("far", 0, 120, rmag=10.0)])
+
+def test_find_guide_star(science, candidates):
+    """Find a guide star with a magnitude."""
+    finder = GuideStarFinder(candidates, radius=80 * u.arcsec)
+    guidestars = finder.find(science)
+    assert guidestars.names == ["bright", "faint", "unknown"]
+    assert finder.best(science).name == "bright"
+    
+    finder = GuideStarFinder(candidates, radius=80 * u.arcsec, limit=15)
+    assert finder.find(science).names == ["bright"]
+    
+def test_find_guide_star_ranking(targetlist):
+    """Candidates without magnitudes are ranked by separation."""
+    finder = GuideStarFinder(targetlist, radius=3 * u.arcmin)
+    assert finder.find(targetlist['198xq']).names == ['198xq_S1', '198xq_S2', '198xq_S3']
+    
+    finder = GuideStarFinder(targetlist, radius=3 * u.arcmin, limit=15)
+    assert finder.best(targetlist['198xq']) is None
+    
+def test_assign_guide_stars(targetlist):
+    """Assign guide stars in batch."""
+    finder = GuideStarFinder(targetlist, radius=80 * u.arcsec)
+    assignment = finder.assign(targetlist)
+    assigned = dict((targetlist[i].name, targetlist[j].name) for i, j in zip(assignment.index, assignment.other_index))
+    assert assigned['198xq'] == '198xq_S1'
+    assert 'ring neb' not in assigned
+    assert len(assignment.index) + len(assignment.unmatched) == len(targetlist)
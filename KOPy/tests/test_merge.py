@@ -0,0 +1,82 @@
+import pytest
+
+from ..merge import read_entries, diff_starlists, apply_edits, merge_starlists
+
+BASE = """# Shared starlist
+Alpha           01 00 00.000 +10 00 00.000 2000 vmag=10.00
+Beta            02 00 00.000 +20 00 00.000 2000 vmag=11.00
+Gamma           03 00 00.000 +30 00 00.000 2000 vmag=12.00
+Delta           04 00 00.000 +40 00 00.000 2000 vmag=13.00
+"""
+
+@pytest.fixture
+def write(tmpdir):
+    """Write a starlist, returning its filename."""
+    def _write(name, text):
+        path = tmpdir.join(name)
+        path.write(text)
+        return str(path)
+    return _write
+
+def test_read_entries(write):
+    """Entries keep their line numbers, and repeated names are numbered."""
+    entries = list(read_entries(write("base.txt", BASE + BASE.splitlines()[1] + "\n")))
+    assert [ entry.line for entry in entries ] == [2, 3, 4, 5, 6]
+    assert entries[-1].key == ("Alpha", 1)
+    assert entries[-1].content == entries[0].content
+    assert entries[0].keywords == ("vmag=10.00",)
+
+def test_read_entries_malformed(write):
+    """Lines which can't be parsed are kept, and only match identical lines."""
+    lines = BASE.splitlines()
+    base = write("base.txt", "\n".join(lines[:3] + ["not a target"] + lines[3:]) + "\n")
+    entries = list(read_entries(base))
+    assert entries[2].position is None
+    assert entries[2].name == "not a target"
+    assert entries[2].content == ("not a target",)
+    assert entries[3].name == "Gamma"
+    assert diff_starlists(base, base) == []
+
+    other = write("other.txt", "\n".join(lines[:3] + ["still not a target"] + lines[3:]) + "\n")
+    edits = diff_starlists(base, other)
+    assert [ (edit.operation, edit.line) for edit in edits ] == [('insert', 3), ('delete', 4)]
+    assert apply_edits(base, edits).splitlines()[3] == "still not a target"
+    
+def test_diff_starlists(write):
+    """Edits are found by name, and by position for renamed entries."""
+    base = write("base.txt", BASE)
+    other = write("other.txt", """
+Alpha           01 00 00.0 +10 00 00.0 2000  vmag=10.00
+Beta            02 00 00.000 +20 00 00.000 2000 vmag=9.00
+Gamma-renamed   03 00 00.000 +30 00 00.000 2000 vmag=12.00
+Epsilon         05 00 00.000 +50 00 00.000 2000 vmag=14.00
+""")
+    edits = diff_starlists(base, other)
+    assert [ (edit.operation, edit.line) for edit in edits ] == [('replace', 3), ('replace', 4),
+        ('insert', 4), ('delete', 5)]
+    assert edits[1].new.name == "Gamma-renamed"
+    merged = apply_edits(base, edits)
+    assert merged.splitlines()[0] == "# Shared starlist"
+    assert [ line.split()[0] for line in merged.splitlines()[1:] ] == ["Alpha", "Beta", "Gamma-renamed", "Epsilon"]
+    assert diff_starlists(base, base) == []
+    
+def test_merge_starlists(write, tmpdir):
+    """Independent edits are merged, and conflicting edits are reported."""
+    base = write("base.txt", BASE)
+    lines = BASE.splitlines()
+    ours = write("ours.txt", "\n".join(lines[:2] + [lines[2].replace("11.00", "9.00")] + lines[3:]
+        + ["Zeta            06 00 00.000 +60 00 00.000 2000"]))
+    theirs = write("theirs.txt", "\n".join(lines[:2] + [lines[2].replace("11.00", "8.00")] + lines[3:4]))
+    
+    result = merge_starlists(base, ours, theirs)
+    assert len(result.conflicts) == 1
+    assert result.conflicts[0].line == 3
+    apply_edits(base, result.edits, str(tmpdir.join("merged.txt")))
+    merged = [ line.split()[0] for line in tmpdir.join("merged.txt").read().splitlines()[1:] ]
+    assert merged == ["Alpha", "Beta", "Gamma", "Zeta"]
+    assert "vmag=9.00" in tmpdir.join("merged.txt").read()
+    
+    result = merge_starlists(base, ours, theirs, prefer=None)
+    assert "vmag=11.00" in apply_edits(base, result.edits)
+    with pytest.raises(ValueError):
+        merge_starlists(base, ours, theirs, prefer='mine')
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the Keck pointing limits.
+"""
+
+import pytest
+import numpy as np
+
+import astropy.units as u
+from astropy.time import Time
+from astropy.coordinates import SkyCoord
+
+from ..targets import Target, TargetList
+from ..visibility import Visibility, visibility_grid
+from ..pointing import PointingLimits, KECK1, KECK2, pointing_access
+
+@pytest.fixture
+def times():
+    """Times through a night at Keck."""
+    return Time("2015-08-07 05:30:00", scale='utc') + np.linspace(0, 10, 41) * u.hour
+
+def test_minimum_altitude():
+    """The Nasmyth deck raises the limit on opposite sides for each telescope."""
+    azimuth = [3.0, 10.0, 90.0, 180.0, 270.0] * u.degree
+    assert np.all(KECK1.minimum_altitude(azimuth).value == [18.0, 33.3, 33.3, 18.0, 18.0])
+    assert np.all(KECK2.minimum_altitude(azimuth).value == [18.0, 18.0, 18.0, 18.0, 36.8])
+
+def test_minimum_altitude_wrap():
+    """A deck range can wrap through north."""
+    limits = PointingLimits("Test", 20 * u.degree, (350 * u.degree, 10 * u.degree), 40 * u.degree)
+    azimuth = [355.0, 5.0, -5.0, 20.0] * u.degree
+    assert np.all(limits.minimum_altitude(azimuth).value == [40.0, 40.0, 40.0, 20.0])
+
+def test_access_windows():
+    """Windows are found from the edges of runs in the mask."""
+    times = Time("2015-08-07 05:30:00", scale='utc') + np.arange(6) * u.hour
+    altitude = [[10, 30, 30, 10, 30, 30], [30, 30, 30, 30, 30, 30], [10, 10, 10, 10, 10, 10]] * u.degree
+    azimuth = np.full((3, 6), 180.0) * u.degree
+    grid = Visibility(times, altitude, azimuth, None, None)
+    access = KECK1.access(grid)
+    assert access.mask.shape == (3, 6)
+    assert list(access.target) == [0, 0, 1]
+    starts, ends = access.windows(0)
+    assert list(starts.isot) == [times[1].isot, times[4].isot]
+    assert list(ends.isot) == [times[2].isot, times[5].isot]
+    starts, ends = access.windows(1)
+    assert starts[0] == times[0] and ends[0] == times[-1]
+    assert len(access.windows(2)[0]) == 0
+
+def test_pointing_access(times):
+    """Both telescopes agree with the visibility grid."""
+    coords = SkyCoord(np.linspace(0, 350, 12) * u.degree, np.linspace(-40, 80, 12) * u.degree, frame='icrs')
+    targets = TargetList(Target("T{0:d}".format(i), coord) for i, coord in enumerate(coords))
+    access = pointing_access(targets, times)
+    assert list(access.keys()) == ["Keck I", "Keck II"]
+    grid = visibility_grid(coords, times)
+    for limits in (KECK1, KECK2):
+        mask = access[limits.name].mask
+        assert mask.shape == (len(targets), len(times))
+        assert np.all(mask == limits.observable(grid.altitude, grid.azimuth))
+        assert not mask[grid.altitude < 18 * u.degree].any()
+        assert mask[grid.altitude > 37 * u.degree].all()
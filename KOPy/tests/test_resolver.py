@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for cached name resolution.
+"""
+
+import pytest
+import numpy as np
+
+import astropy.units as u
+from astropy.coordinates.name_resolve import NameResolveError
+
+from ..targets import Target, TargetList
+from ..resolver import NameCache, FileResolver, resolve_names
+
+STARLIST = """# Local positions for offline name resolution.
+ring neb        18 53 36.00 +33 02 00.00 2000.0
+M31             00 42 44.33 +41 16 07.50 2000.0
+M33             01 33 50.02 +30 39 36.70 2000.0
+"""
+
+class CountingResolver(FileResolver):
+    """A file resolver which counts lookups."""
+    def __init__(self, filename):
+        super(CountingResolver, self).__init__(filename)
+        self.calls = []
+
+    def __call__(self, name):
+        self.calls.append(name)
+        return super(CountingResolver, self).__call__(name)
+
+@pytest.fixture
+def resolver(tmpdir):
+    """A resolver backed by a local starlist."""
+    filename = tmpdir.join("local.txt")
+    filename.write(STARLIST)
+    return CountingResolver(str(filename))
+
+@pytest.fixture
+def cache(tmpdir):
+    """The filename for an empty name cache."""
+    return str(tmpdir.join("cache", "names.json"))
+
+def test_from_names(resolver, cache):
+    """Names are resolved once, and then come from the cache."""
+    targets = TargetList.from_names(["M31", "m33", "Ring Neb", "M31"], cache=cache, resolver=resolver)
+    assert targets.names == ["M31", "m33", "Ring Neb", "M31"]
+    assert sorted(resolver.calls) == ["M31", "Ring Neb", "m33"]
+    assert np.abs(targets[0].position.ra.degree - 10.68471) < 1e-4
+
+    # A new cache object re-reads the file from disk.
+    resolver.calls = []
+    again = TargetList.from_names(["M31", "M33", "ring neb"], cache=NameCache(cache), resolver=resolver)
+    assert resolver.calls == []
+    assert (again.catalog().separation(targets.catalog()[[0, 1, 2]]) < 1 * u.mas).all()
+    assert len(NameCache(cache)) == 3
+
+def test_resolve_names_failure(resolver, cache):
+    """Unknown names raise an error, but the names that were found are still cached."""
+    with pytest.raises(NameResolveError) as excinfo:
+        resolve_names(["M31", "NotAnObject"], cache=cache, resolver=resolver)
+    assert "NotAnObject" in str(excinfo.value)
+    assert "M31" in NameCache(cache)
+    assert "NotAnObject" not in NameCache(cache)
+
+def test_from_name(resolver):
+    """Single names use the same resolver, and the cache can be skipped."""
+    target = Target.from_name("M33", cache=False, resolver=resolver)
+    assert target.name == "M33"
+    assert np.abs(target.position.dec.degree - 30.66019) < 1e-4
+
+def test_cache_errors(resolver, cache, tmpdir):
+    """A corrupt cache is ignored, and a cache which can't be saved only warns."""
+    tmpdir.join("cache").mkdir()
+    tmpdir.join("cache", "names.json").write('{"m31": [10.6')
+    with pytest.warns(UserWarning):
+        target = Target.from_name("M31", cache=cache, resolver=resolver)
+    assert np.abs(target.position.ra.degree - 10.68471) < 1e-4
+    assert "M31" in NameCache(cache)
+
+    tmpdir.join("blocked").write("")
+    with pytest.warns(UserWarning):
+        target = Target.from_name("M33", cache=str(tmpdir.join("blocked", "names.json")), resolver=resolver)
+    assert target.name == "M33"
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the night scheduler.
+"""
+
+import pytest
+import numpy as np
+
+import astropy.units as u
+from astropy.time import Time
+from astropy.coordinates import SkyCoord
+
+from ..targets import Target, TargetList
+from ..closures import Region, Opening, Regions
+from ..pointing import KECK2
+from ..scheduler import Scheduler
+
+@pytest.fixture
+def start():
+    """The start of a night at Keck."""
+    return Time("2015-08-07 05:30:00", scale='utc')
+
+@pytest.fixture
+def targets():
+    """Targets spread through the night, with priorities."""
+    coords = SkyCoord(np.linspace(200, 340, 16) * u.degree, np.tile([0.0, 20.0, 40.0, 60.0], 4) * u.degree, frame='icrs')
+    return TargetList(Target("T{0:d}".format(i), coord, priority=(i % 3) + 1) for i, coord in enumerate(coords))
+
+def assert_feasible(scheduler, plan):
+    """Check that every observation in a plan is accessible, and that they don't overlap."""
+    finish = plan.begin + scheduler.duration[plan.order] * u.s
+    assert np.all(plan.begin[1:].jd >= finish[:-1].jd - 1e-9)
+    mask = scheduler.mask
+    for index, begin, end in zip(plan.order, plan.begin, finish):
+        covered = (scheduler.times.jd >= begin.jd - 1e-9) & (scheduler.times.jd < end.jd)
+        assert mask[index, covered].all()
+
+def test_scheduler_plan(targets, start):
+    """A plan is feasible and schedules every target when there is time."""
+    scheduler = Scheduler(targets, start, start + 10 * u.hour, duration=20 * u.minute, priority='priority', limits=KECK2)
+    plan = scheduler.plan()
+    assert_feasible(scheduler, plan)
+    assert sorted(list(plan.order) + list(plan.skipped)) == list(range(len(targets)))
+    assert len(plan.order) >= 14
+
+def test_scheduler_priority(targets, start):
+    """When the night is too short, high priority targets are scheduled first."""
+    scheduler = Scheduler(targets, start, start + 3 * u.hour, duration=40 * u.minute, priority='priority', limits=KECK2)
+    plan = scheduler.plan()
+    assert_feasible(scheduler, plan)
+    assert len(plan.skipped)
+    assert np.mean(scheduler.priority[plan.order]) > np.mean(scheduler.priority)
+
+def test_scheduler_closures(targets, start):
+    """Targets with an LCH region are only scheduled while it is open."""
+    regions = Regions()
+    for name in ("T0", "T1"):
+        regions[name] = Region(name, targets[name].position)
+    Opening(regions["T0"], start + 2 * u.hour, start + 3 * u.hour)
+    scheduler = Scheduler(targets, start, start + 10 * u.hour, duration=20 * u.minute, regions=regions)
+    assert not scheduler.laser[1].any()
+    plan = scheduler.plan()
+    assert_feasible(scheduler, plan)
+    assert 1 in plan.skipped
+    begin = plan.begin[list(plan.order).index(0)]
+    assert begin >= start + 2 * u.hour
+    assert begin + 20 * u.minute <= start + 3 * u.hour
+
+def test_scheduler_closures_match(targets, start):
+    """LCH regions apply to the targets they cover, or by name when asked."""
+    regions = Regions()
+    regions["Other"] = Region("Other", targets["T2"].position)
+    Opening(regions["Other"], start + 2 * u.hour, start + 3 * u.hour)
+    scheduler = Scheduler(targets, start, start + 10 * u.hour, duration=20 * u.minute, regions=regions)
+    assert np.array_equal(scheduler.laser[2], regions.open_matrix(targets[2:3], scheduler.times)[0])
+    assert not scheduler.laser[2].all()
+    assert np.delete(scheduler.laser, 2, axis=0).all()
+    strict = Scheduler(targets, start, start + 10 * u.hour, duration=20 * u.minute, regions=regions, strict=True)
+    assert not np.delete(strict.laser, 2, axis=0).any()
+    by_name = Scheduler(targets, start, start + 10 * u.hour, duration=20 * u.minute, regions=regions, match='name')
+    assert by_name.laser.all()
+    with pytest.raises(ValueError):
+        Scheduler(targets, start, start + 10 * u.hour, duration=20 * u.minute, regions=regions, match='nearest')
+
+def test_scheduler_short_night(targets, start):
+    """A night shorter than one time step is an error, not a crash."""
+    with pytest.raises(ValueError):
+        Scheduler(targets, start, start + 1 * u.minute, duration=20 * u.minute)
+
+def test_scheduler_replan(targets, start):
+    """Re-planning mid-night skips observed targets and blocked periods."""
+    scheduler = Scheduler(targets, start, start + 10 * u.hour, duration=20 * u.minute, priority='priority')
+    first = scheduler.plan()
+    observed = list(first.order[:3])
+    now = first.begin[3]
+    scheduler.block(now, now + 1 * u.hour)
+    plan = scheduler.plan(now=now, exclude=observed, origin=observed[-1])
+    assert_feasible(scheduler, plan)
+    assert not set(observed) & set(plan.order)
+    assert np.all(plan.begin.jd >= (now + 1 * u.hour).jd - 1e-9)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for slew times and slew ordering.
+"""
+
+import pytest
+import numpy as np
+
+import astropy.units as u
+from astropy.time import Time
+from astropy.coordinates import SkyCoord
+
+from ..targets import Target, TargetList
+from ..visibility import visibility_grid
+from ..pointing import KECK1
+from ..slew import SlewModel, slew_matrix, slew_order
+
+@pytest.fixture
+def start():
+    """The start of a night at Keck."""
+    return Time("2015-08-07 05:30:00", scale='utc')
+
+@pytest.fixture
+def targets():
+    """A cluster of targets spread across the sky."""
+    coords = SkyCoord(np.linspace(200, 340, 12) * u.degree, np.tile([0.0, 30.0, 50.0], 4) * u.degree, frame='icrs')
+    return TargetList(Target("T{0:d}".format(i), coord) for i, coord in enumerate(coords))
+
+def test_slew_matrix(targets, start):
+    """Slew times are symmetric, and set by the slowest axis."""
+    model = SlewModel(azimuth_rate=1.0 * u.degree / u.s, elevation_rate=0.5 * u.degree / u.s, settle=5 * u.s)
+    matrix = slew_matrix(targets, start, model=model)
+    assert matrix.shape == (len(targets), len(targets))
+    assert np.all(np.diag(matrix) == 0 * u.s)
+    np.testing.assert_allclose(matrix.value, matrix.value.T)
+
+    grid = visibility_grid(targets.catalog(), start)
+    daz = np.abs(np.mod(grid.azimuth[0,0] - grid.azimuth[1,0] + 180 * u.degree, 360 * u.degree) - 180 * u.degree)
+    dalt = np.abs(grid.altitude[0,0] - grid.altitude[1,0])
+    expected = max(daz.to(u.degree).value / 1.0, dalt.to(u.degree).value / 0.5) + 5.0
+    np.testing.assert_allclose(matrix[0,1].to(u.s).value, expected)
+
+def test_slew_matrix_rotator(targets, start):
+    """Adding a slow rotator only makes slews longer."""
+    fast = SlewModel(azimuth_rate=1.0 * u.degree / u.s, elevation_rate=0.5 * u.degree / u.s)
+    slow = SlewModel(azimuth_rate=1.0 * u.degree / u.s, elevation_rate=0.5 * u.degree / u.s,
+        rotator_rate=0.1 * u.degree / u.s)
+    assert np.all(slew_matrix(targets, start, model=slow) >= slew_matrix(targets, start, model=fast))
+
+def test_slew_order(targets, start):
+    """Ordering gives a feasible sequence with less slew than the input order."""
+    end = start + 10 * u.hour
+    sequence = slew_order(targets, start, end, 20 * u.minute, limits=KECK1)
+    assert sorted(list(sequence.order) + list(sequence.skipped)) == list(range(len(targets)))
+    assert sequence.slew[0] == 0 * u.s
+    assert np.all(np.diff(sequence.begin.jd) > 0)
+
+    grid = visibility_grid(targets.catalog(), sequence.begin)
+    for column, index in enumerate(sequence.order):
+        assert KECK1.observable(grid.altitude[index, column], grid.azimuth[index, column])
+
+    matrix = slew_matrix(targets, start + 5 * u.hour)
+    ordered = np.sum(matrix[sequence.order[:-1], sequence.order[1:]])
+    listed = np.sum(matrix[np.arange(len(targets) - 1), np.arange(1, len(targets))])
+    assert ordered < listed
+
+def test_slew_order_skipped(start):
+    """Targets which never rise are skipped."""
+    coords = SkyCoord([10.0, 20.0] * u.degree, [-85.0, 20.0] * u.degree, frame='icrs')
+    sequence = slew_order(coords, start, start + 10 * u.hour, 30 * u.minute)
+    assert list(sequence.skipped) == [0]
+    assert list(sequence.order) == [1]
+
+def test_slew_order_short_night(start):
+    """A night shorter than one time step is an error, not a crash."""
+    coords = SkyCoord([10.0, 20.0] * u.degree, [-85.0, 20.0] * u.degree, frame='icrs')
+    with pytest.raises(ValueError):
+        slew_order(coords, start, start + 1 * u.minute, 30 * u.minute)
+    with pytest.raises(ValueError):
+        slew_order(coords, start, start - 1 * u.hour, 30 * u.minute)
+    sequence = slew_order(coords, start, start + 1 * u.minute, 30 * u.minute, step=1 * u.minute)
+    assert len(sequence.order) + len(sequence.skipped) == 2
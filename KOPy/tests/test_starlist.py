@@ -53,4 +53,26 @@ def test_starlist_parse_keywords(keyword, value, units, starlist_line):
     name, position, keywords = starlist.parse_starlist_line(starlist_line)
     assert kwname in keywords
     assert keywords[kwname].unit.is_equivalent(units)
-    assert_quantity_allclose(keywords[kwname], value)
\ No newline at end of file
+    assert_quantity_allclose(keywords[kwname], value)
+
+def test_starlist_parse_line_lazy(starlist_line):
+    """Lazy parsing keeps the position tokens."""
+    name, pos, kw = starlist.parse_starlist_line(starlist_line, lazy=True)
+    assert isinstance(pos, starlist.StarlistPosition)
+    name, expected, kw = starlist.parse_starlist_line(starlist_line)
+    position = starlist.parse_starlist_position(*pos)
+    assert_quantity_allclose(position.ra, expected.ra)
+    assert_quantity_allclose(position.dec, expected.dec)
+    
+def test_starlist_format_lazy(starlist_filename):
+    """Formatting position tokens matches formatting parsed coordinates."""
+    for line in starlist.read_skip_comments(starlist_filename):
+        expected = starlist.format_starlist_line(*starlist.parse_starlist_line(line))
+        assert starlist.format_starlist_line(*starlist.parse_starlist_line(line, lazy=True)) == expected
+        
+def test_starlist_parse_positions():
+    """Parse many position tokens at once."""
+    positions = starlist.parse_starlist_position(["09 00 20.4470", "0 2 1"], ["39 04 03.660", "-0 30 00"], "2000")
+    assert positions.shape == (2,)
+    np.testing.assert_allclose(positions.ra.radian, Angle(["09 00 20.4470", "0 2 1"], unit=u.hourangle).radian)
+    np.testing.assert_allclose(positions.dec.degree, [Angle("39 04 03.660", unit=u.degree).degree, -0.5])
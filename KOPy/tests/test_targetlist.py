@@ -2,8 +2,9 @@ import pytest
 
 import os
 import pickle
+import numpy as np
 
-from ..targets import Target, TargetList
+from ..targets import Target, TargetList, TargetListView, TargetListSnapshot
 from astropy.tests.helper import assert_quantity_allclose
 from astropy.tests.helper import pickle_protocol
 import astropy.units as u
@@ -54,11 +55,13 @@ def test_index_starlist(targetlist):
     
     s = targetlist[1:3]
     assert len(s) == 2
-    assert isinstance(s, TargetList)
+    assert isinstance(s, TargetListView)
+    assert s[0] is targetlist[1]
     
     s = targetlist[3:1:-1]
     assert len(s) == 2
-    assert isinstance(s, TargetList)
+    assert isinstance(s, TargetListView)
+    assert s.names == [targetlist[3].name, targetlist[2].name]
     
     t = targetlist[1]
     assert isinstance(t, Target)
@@ -128,11 +131,28 @@ def test_starlist_leading_whitespace(tricky_tt):
     assert_coord_allclose(t.position, pos)
     assert t.to_starlist().startswith("        tt020")
     
-@pytest.mark.xfail
 def test_targetlist_table_roundtrip(targetlist):
     """Round trip via table."""
+    table = targetlist.table()
+    colnames = table.colnames
+    tl = TargetList.from_table(table)
+    assert table.colnames == colnames
+    assert tl.names == targetlist.names
+    assert_coord_allclose(tl.catalog(), targetlist.catalog())
+    for actual, desired in zip(tl, targetlist):
+        assert list(actual.keywords.keys()) == list(desired.keywords.keys())
+        assert_quantity_allclose(actual.position.ra, desired.position.transform_to('icrs').ra)
+    assert_quantity_allclose(tl['SAO 102961'].vmag, targetlist['SAO 102961'].vmag)
+    
+def test_targetlist_from_table_lazy(targetlist):
+    """Targets are only created from table rows when needed."""
     tl = TargetList.from_table(targetlist.table())
     assert tl.names == targetlist.names
+    assert tl[1] is tl[1]
+    assert isinstance(tl[2], Target)
+    assert isinstance(tl[3:5][0], Target)
+    tl.sort(key=lambda t : t.name)
+    assert tl.names == sorted(targetlist.names)
     
 def test_targetlist_starlist_roundtrip(targetlist, tmpdir):
     """Target list round trip via starlist."""
@@ -143,4 +163,330 @@ def test_targetlist_starlist_roundtrip(targetlist, tmpdir):
 def test_targetlist_pickle_roundtrip(target, pickle_protocol):
     """Test for pickleing round-trip."""
     unpickled = pickle_roundtrip(target, pickle_protocol)
-    assert_target_allclose(unpickled, target)
\ No newline at end of file
+    assert_target_allclose(unpickled, target)
+
+def test_targetlist_catalog_cache(targetlist, target):
+    """The catalog is cached, and reset when the list changes."""
+    tl = TargetList(targetlist)
+    catalog = tl.catalog()
+    assert tl.catalog() is catalog
+    assert len(catalog) == len(tl)
+    tl.append(target)
+    assert len(tl.catalog()) == len(tl)
+    assert_coord_allclose(tl.catalog()[-1], target.position.transform_to('icrs'))
+    
+def test_targetlist_crossmatch(targetlist):
+    """Cross match two target lists."""
+    tl = TargetList(t for t in targetlist if t.name.startswith("198xq"))
+    match = targetlist.crossmatch(tl, 1 * u.arcsec)
+    assert [ targetlist[i].name for i in match.index ] == [ tl[i].name for i in match.other_index ]
+    assert len(match.index) == len(tl)
+    assert len(match.unmatched) == len(targetlist) - len(tl)
+    assert not len(match.other_unmatched)
+    assert (match.separation < 1 * u.arcsec).all()
+    
+    match = tl.crossmatch(tl, 3 * u.arcmin)
+    assert len(match.index) > len(tl)
+    
+    match = tl.crossmatch(tl, 3 * u.arcmin, nearest=True)
+    assert list(match.index) == list(match.other_index)
+    assert list(match.index) == list(range(len(tl)))
+    
+    match = tl.crossmatch(TargetList(), 1 * u.arcsec)
+    assert not len(match.index)
+    assert list(match.unmatched) == list(range(len(tl)))
+    
+def test_targetlist_table(targetlist):
+    """Make a table from a target list."""
+    t = targetlist.table()
+    assert t.colnames[:3] == ['Name', 'RA', 'Dec']
+    assert list(t['Name']) == targetlist.names
+    assert t['vmag'].unit == u.mag
+    assert t['vmag'].dtype.kind == 'f'
+    assert t['vmag'].mask.sum() == len(targetlist) - 1
+    assert t['rotmode'].dtype.kind in 'SU'
+    assert_quantity_allclose(t['RA'].quantity, targetlist.catalog().ra)
+    
+    t = targetlist.table(coord_mixin=True)
+    assert 'Position' in t.colnames
+    assert 'RA' not in t.colnames
+    
+def test_targetlist_table_conflict(target):
+    """Keywords which would overwrite table columns aren't allowed."""
+    target.keywords['Name'] = 'Other'
+    with pytest.raises(ValueError):
+        TargetList([target]).table()
+    
+def test_targetlist_lazy_positions():
+    """Positions can be parsed lazily, one at a time or all at once."""
+    import pkg_resources
+    filename = pkg_resources.resource_filename(__name__, 'data/small_starlist.txt')
+    expected = TargetList.from_starlist(filename)
+    tl = TargetList.from_starlist(filename, lazy=True)
+    assert all(t._position is None for t in tl)
+    assert tl.to_starlist(None) == expected.to_starlist(None)
+    assert all(t._position is None for t in tl)
+    assert_coord_allclose(tl.catalog(), expected.catalog())
+    
+    assert_coord_allclose(tl[0].position, expected[0].position)
+    assert tl[0]._position is not None
+    tl.materialize()
+    for actual, desired in zip(tl, expected):
+        assert_target_allclose(actual, desired)
+
+def test_targetlist_deduplicate():
+    """Near-coincident targets are merged, keeping a representative by rule."""
+    base = SkyCoord([10.0, 10.0, 10.0001, 200.0, 10.0] * u.degree, [20.0, 20.0, 20.0, -30.0, 20.01] * u.degree)
+    tl = TargetList([Target("A", base[0]), Target("A-dup", base[1], vmag=9.0),
+        Target("A-near", base[2]), Target("B", base[3]), Target("C", base[4])])
+    
+    result = tl.deduplicate(1 * u.arcsec)
+    assert result.targets.names == ["A", "B", "C"]
+    assert list(result.representative) == [0, 3, 4]
+    assert list(result.mapping) == [0, 0, 0, 1, 2]
+    assert [list(group) for group in result.groups()] == [[0, 1, 2], [3], [4]]
+    
+    assert tl.deduplicate(1 * u.arcsec, keep='last').targets.names == ["A-near", "B", "C"]
+    assert tl.deduplicate(1 * u.arcsec, keep='keywords').targets.names == ["A-dup", "B", "C"]
+    assert tl.deduplicate(1 * u.arcsec, keep=lambda t: -len(t.name)).targets.names == ["A-near", "B", "C"]
+    assert len(tl.deduplicate(0.1 * u.arcsec).targets) == 4
+    with pytest.raises(ValueError):
+        tl.deduplicate(keep='brightest')
+    
+def test_targetlist_deduplicate_large():
+    """Each target in a large random list is merged with its slightly offset copy."""
+    random = np.random.RandomState(42)
+    n = 2000
+    ra, dec = random.uniform(0, 360, n), np.degrees(np.arcsin(random.uniform(-1, 1, n)))
+    offsets = random.normal(0, 0.2, (2, n)) / 3600.0
+    coords = SkyCoord(np.r_[ra, ra + offsets[0] / np.cos(np.radians(dec))] * u.degree,
+        np.r_[dec, np.clip(dec + offsets[1], -90, 90)] * u.degree)
+    tl = TargetList(Target("T{0:d}".format(i), c) for i, c in enumerate(coords))
+    result = tl.deduplicate(2 * u.arcsec)
+    assert len(result.targets) == n
+    assert np.all(result.mapping[:n] == result.mapping[n:])
+
+def test_targetlist_query():
+    """Keyword expressions select targets, and columns are cached."""
+    from ..query import Keyword
+    tl = TargetList([
+        Target.from_starlist("T1              05 04 37.23 -19 37 04.58 2000 vmag=9.5 lgs=1 sptype=A0V"),
+        Target.from_starlist("T2              05 04 37.23 -19 37 04.58 2000 vmag=11.0 lgs=1 sptype=A2"),
+        Target.from_starlist("T3              05 04 37.23 -19 37 04.58 2000 vmag=8.0 lgs=0 sptype=G2V"),
+        Target.from_starlist("T4              05 04 37.23 -19 37 04.58 2000 lgs=1 sptype=A5"),
+    ])
+    query = (Keyword('vmag') < 10) & (Keyword('lgs') == 1) & Keyword('sptype').startswith('A')
+    assert list(tl.where(query)) == [0]
+    assert list(tl.where(Keyword('vmag') < 10)) == [0, 2]
+    assert list(tl.where(Keyword('vmag') < 10 * u.mag)) == [0, 2]
+    assert list(tl.where(~(Keyword('vmag') < 10))) == [1, 3]
+    assert list(tl.where(Keyword('vmag').exists())) == [0, 1, 2]
+    assert list(tl.where(Keyword('sptype').isin(['A2', 'A5']) | Keyword('sptype').contains('G'))) == [1, 2, 3]
+    assert list(tl.where(Keyword('missing') == 1)) == []
+    assert list(tl.where(Keyword('vmag') < 'bright')) == []
+    assert list(tl.where(Keyword('lgs') == 'yes')) == []
+    assert list(tl.where(Keyword('lgs') != 'yes')) == [0, 1, 2, 3]
+    assert list(tl.where(Keyword('vmag') != 'bright')) == [0, 1, 2]
+    assert list(tl.where(Keyword('lgs') == '1')) == [0, 1, 3]
+    assert list(tl.where(Keyword('lgs').isin(['yes', '0']))) == [2]
+    
+    selected = tl.select(Keyword('lgs') == 1)
+    assert selected.names == ["T1", "T2", "T4"]
+    assert selected[0] is tl[0]
+    
+    column = tl.column('vmag')
+    assert column.unit == u.mag
+    assert list(column.mask) == [False, False, False, True]
+    assert tl.column('vmag') is column
+    tl.append(Target.from_starlist("T5              05 04 37.23 -19 37 04.58 2000 vmag=5.0"))
+    assert tl.column('vmag') is not column
+    assert list(tl.where(Keyword('vmag') < 10)) == [0, 2, 4]
+
+def test_targetlist_groupby():
+    """Calibrators are grouped by their science target, as views."""
+    import pkg_resources
+    from ..query import Keyword
+    tl = TargetList.from_starlist(pkg_resources.resource_filename(__name__, 'data/big_starlist.txt'))
+    groups = tl.groupby('target')
+    assert list(groups.keys())[0] == 'F00188-0856'
+    assert sum(len(view) for view in groups.values()) == len(tl.where(Keyword('target').exists()))
+    
+    view = groups['F00188-0856']
+    assert isinstance(view, TargetListView)
+    assert view[0] is tl[int(view.index[0])]
+    assert view.names[0] == "HD224909"
+    assert view["HD822"] is tl["HD822"]
+    assert all(t.keywords['target'] == 'F00188-0856' for t in view)
+    assert len(view[1:3]) == 2
+    assert (view.catalog().separation(tl.catalog()[view.index]) == 0).all()
+    assert list(view.where(Keyword('SpType').startswith('A1'))) == [1, 3]
+    assert view.select(Keyword('Vmag') < 9).names == [t.name for t in view if t.keywords['Vmag'].value < 9]
+    assert tl.groupby('target')['F00188-0856'].index is view.index
+    
+    copied = view.copy()
+    assert isinstance(copied, TargetList)
+    sliced = tl[0:2]
+    tl.set_keyword(int(view.index[0]), 'target', 'F00188-0857')
+    assert len(list(sliced)) == 2
+    with pytest.raises(RuntimeError):
+        view[0]
+    assert len(tl.groupby('target')['F00188-0856']) == len(copied) - 1
+    view = tl.groupby('target')['F00188-0856']
+    tl.delete_keyword(int(view.index[0]), 'Vmag')
+    assert len(view) == len(copied) - 1
+    assert view[0] is tl[int(view.index[0])]
+    del tl[0]
+    with pytest.raises(RuntimeError):
+        view[0]
+    with pytest.raises(RuntimeError):
+        len(view)
+    
+    view = tl[0:3]
+    targets = iter(view)
+    next(targets)
+    tl.append(copied[0])
+    with pytest.raises(RuntimeError):
+        next(targets)
+
+def test_targetlist_extend(targetlist):
+    """Extending from lists and views shares targets, and bad types are rejected."""
+    tl = TargetList(targetlist)
+    assert tl.names == targetlist.names
+    tl.extend(targetlist[2:4])
+    assert tl[-1] is targetlist[3]
+    assert len(tl + targetlist[:2]) == len(tl) + 2
+    with pytest.raises(TypeError):
+        tl.extend([targetlist[0], "not a target"])
+    assert len(tl) == len(targetlist) + 2
+
+def test_targetlist_save_load(targetlist, tmpdir):
+    """Lists round-trip through the binary format, loaded lazily from memory-mapped arrays."""
+    import pkg_resources
+    filename = str(tmpdir.join("targets.npz"))
+    targetlist.save(filename)
+    
+    tl = TargetList.load(filename)
+    assert tl.names == targetlist.names
+    assert not any(isinstance(t, Target) for t in tl._entries())
+    assert (tl.catalog().separation(targetlist.catalog()) < 1 * u.mas).all()
+    for actual, desired in zip(tl, targetlist):
+        assert list(actual.keywords.keys()) == list(desired.keywords.keys())
+    assert_quantity_allclose(tl['SAO 102961'].vmag, targetlist['SAO 102961'].vmag)
+    assert str(tl['SAO 102961'].pmra) == str(targetlist['SAO 102961'].pmra)
+    
+    with np.load(filename) as arrays:
+        assert list(arrays['names']) == targetlist.names
+    assert TargetList.load(filename, mmap=False).names == targetlist.names
+    
+    mixed = TargetList.from_starlist(pkg_resources.resource_filename(__name__, 'data/big_starlist.txt'))
+    mixed.set_keyword(0, 'Vmag', 8.1)
+    assert mixed.table()['Vmag'].unit == mixed[1].keywords['Vmag'].unit
+    mixed.save(filename)
+    tl = TargetList.load(filename)
+    assert_quantity_allclose(tl[0].keywords['Vmag'], 8.1 * mixed[1].keywords['Vmag'].unit)
+    assert_quantity_allclose(tl[1].keywords['Vmag'], mixed[1].keywords['Vmag'])
+    
+    np.savez(str(tmpdir.join("other.npz")), names=np.array(["a"]))
+    with pytest.raises(ValueError):
+        TargetList.load(str(tmpdir.join("other.npz")))
+    
+def test_targetlist_changes(targetlist, target):
+    """Changes are reported to subscribers with the affected positions."""
+    tl = TargetList(targetlist)
+    changes = []
+    tl.subscribe(changes.append)
+    n = len(tl)
+    
+    tl.append(target)
+    tl[0] = target
+    del tl[-1]
+    del tl[1:3]
+    tl.extend([target, target])
+    assert [ (c.kind, list(c.index)) for c in changes ] == [('insert', [n]), ('replace', [0]),
+        ('delete', [n]), ('delete', [1, 2]), ('insert', [n - 2, n - 1])]
+    
+    catalog = tl.catalog()
+    view = tl[0:2]
+    tl.set_keyword(target.name, 'vmag', 3)
+    assert changes[-1].kind == 'keyword' and changes[-1].keyword == 'vmag'
+    assert tl.catalog() is catalog
+    assert len(list(view)) == 2
+    tl.delete_keyword(0, 'vmag')
+    assert 'vmag' not in tl[0].keywords
+    
+    del changes[:]
+    names = tl.names
+    tl.sort(key=lambda t : t.name)
+    assert changes[0].kind == 'reorder'
+    assert tl.names == [ names[i] for i in changes[0].index ]
+    with pytest.raises(RuntimeError):
+        list(view)
+    
+    tl.unsubscribe(changes.append)
+    tl.append(target)
+    assert len(changes) == 1
+    
+def test_targetlist_snapshot(targetlist, target):
+    """Snapshots are unaffected by later changes to the list."""
+    tl = TargetList(targetlist)
+    names = tl.names
+    vmag = tl[0].keywords.get('vmag', None)
+    snapshot = tl.snapshot()
+    assert isinstance(snapshot, TargetListSnapshot)
+    assert snapshot._entries() is tl._entries()
+    
+    tl.append(target)
+    del tl[1]
+    tl.set_keyword(0, 'vmag', 1.0)
+    assert snapshot.names == names
+    assert snapshot[0].keywords.get('vmag', None) == vmag
+    assert tl[0].keywords['vmag'] == 1.0
+    assert len(snapshot.catalog()) == len(names)
+    
+    with pytest.raises(TypeError):
+        snapshot.append(target)
+    with pytest.raises(TypeError):
+        snapshot.set_keyword(0, 'vmag', 2.0)
+    copied = snapshot.copy()
+    copied.append(target)
+    assert len(copied) == len(snapshot) + 1
+    
+    unpickled = pickle_roundtrip(snapshot, 2)
+    assert isinstance(unpickled, TargetListSnapshot)
+    assert unpickled.names == names
+    
+def test_targetlist_snapshot_lazy(targetlist):
+    """Reading lazy targets never changes the list a snapshot shares."""
+    tl = TargetList.from_table(targetlist.table())
+    snapshot = tl.snapshot()
+    entries = list(snapshot._entries())
+    assert snapshot[0] is tl[0]
+    tl.materialize()
+    snapshot.materialize()
+    assert all(a is b for a, b in zip(snapshot._entries(), entries))
+    del tl[0]
+    assert isinstance(tl[0], Target)
+    assert isinstance(tl._entries()[0], Target)
+    assert len(snapshot) == len(targetlist)
+    
+def test_targetlist_set_operations(target):
+    """Set operations by name and by position keep list order."""
+    targets = TargetList(Target("T{0:d}".format(i), SkyCoord(10.0 * i, 5.0, unit=u.degree)) for i in range(6))
+    tonight = TargetList(targets[:4])
+    tonight.append(target)
+    last = TargetList(targets[2:])
+    names = targets.names
+    
+    assert tonight.intersection(last).names == names[2:4]
+    assert tonight.difference(last).names == names[:2] + [target.name]
+    assert tonight.union(last).names == names[:4] + [target.name] + names[4:]
+    assert tonight.symmetric_difference(last).names == names[:2] + [target.name] + names[4:]
+    assert tonight.intersection(last[0:2]).names == names[2:4]
+    
+    # Renamed targets still match by position.
+    moved = TargetList(Target("Other {0:d}".format(i), t.position) for i, t in enumerate(last))
+    assert tonight.intersection(moved, by='position').names == names[2:4]
+    assert tonight.difference(moved, by='position', tolerance=0.1 * u.arcsec).names == names[:2] + [target.name]
+    assert len(tonight.union(moved, by='position')) == len(targets) + 1
+    with pytest.raises(ValueError):
+        tonight.union(last, by='vmag')
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the visibility grid.
+"""
+
+import pytest
+import numpy as np
+
+import astropy.units as u
+from astropy.time import Time
+from astropy.coordinates import SkyCoord, AltAz
+from astropy.tests.helper import assert_quantity_allclose
+
+from ..targets import Target, TargetList
+from ..visibility import KECK, HorizonTransforms, visibility_grid, rise_set_transit
+
+@pytest.fixture
+def times():
+    """Times through a night at Keck."""
+    return Time("2015-08-07 05:30:00", scale='utc') + np.linspace(0, 10, 11) * u.hour
+
+@pytest.fixture
+def coords():
+    """Positions all over the sky."""
+    return SkyCoord(np.linspace(0, 350, 8) * u.degree, np.linspace(-60, 80, 8) * u.degree, frame='icrs')
+
+def test_visibility_grid(coords, times):
+    """The grid agrees with astropy."""
+    grid = visibility_grid(coords, times, transforms=HorizonTransforms())
+    assert grid.altitude.shape == (len(coords), len(times))
+    for j, time in enumerate(times):
+        altaz = coords.transform_to(AltAz(obstime=time, location=KECK))
+        assert_quantity_allclose(grid.altitude[:,j], altaz.alt, atol=1 * u.arcsec)
+        separation = SkyCoord(grid.azimuth[:,j], grid.altitude[:,j], frame=altaz.frame).separation(altaz)
+        assert (separation < 1 * u.arcsec).all()
+    above = grid.altitude > 0 * u.degree
+    np.testing.assert_allclose(grid.airmass[above], 1.0 / np.sin(grid.altitude[above]))
+    assert np.isinf(grid.airmass[~above]).all()
+    
+def test_visibility_hour_angle(times):
+    """Hour angle is zero at transit."""
+    grid = visibility_grid(SkyCoord([0] * u.degree, [10] * u.degree, frame='icrs'), times)
+    transit = np.argmax(grid.altitude[0])
+    assert abs(grid.hour_angle[0, transit]) < 1 * u.hourangle
+    assert (np.abs(grid.hour_angle) <= 12 * u.hourangle).all()
+    
+def test_horizon_transforms_cache(times):
+    """Transforms are cached per time."""
+    transforms = HorizonTransforms()
+    transforms(times[:4])
+    assert len(transforms) == 4
+    matrices = transforms(times)
+    assert len(transforms) == len(times)
+    np.testing.assert_allclose(matrices[:4], transforms(times[:4]))
+    
+def test_targetlist_visibility(times):
+    """Target lists can compute visibility."""
+    tl = TargetList([Target("A", SkyCoord(10 * u.degree, 20 * u.degree, frame='icrs')),
+        Target("B", SkyCoord(200 * u.degree, -20 * u.degree, frame='icrs'))])
+    grid = tl.visibility(times)
+    assert grid.airmass.shape == (2, len(times))
+    
+def test_rise_set_transit(coords, times):
+    """Rise, set and transit times agree with a fine grid."""
+    start, end = times[0], times[-1]
+    events = rise_set_transit(coords, start, end, airmass=1.5)
+    assert events.transit.shape == (len(coords),)
+    
+    fine = start + np.linspace(0, 10, 601) * u.hour
+    grid = visibility_grid(coords, fine)
+    step = (fine[1] - fine[0]).to(u.hour)
+    
+    crosses = np.isfinite(events.rise)
+    for offset in (events.rise[crosses], events.set[crosses]):
+        altaz = coords[crosses].transform_to(AltAz(obstime=start + offset, location=KECK))
+        assert_quantity_allclose(altaz.alt, 0 * u.degree, atol=0.1 * u.degree)
+    
+    above = np.sum(grid.airmass < 1.5, axis=1) * step
+    assert_quantity_allclose(events.time_above, above, atol=2 * step)
+    
+    visible = (events.transit > 0 * u.hour) & (events.transit < 10 * u.hour)
+    transit = np.argmax(grid.altitude[visible], axis=1) * step
+    assert_quantity_allclose(events.transit[visible], transit, atol=2 * step)
+    
+def test_rise_set_transit_circumpolar(times):
+    """Circumpolar and never-rising targets have no rise or set."""
+    coords = SkyCoord([0, 0] * u.degree, [89, -89] * u.degree, frame='icrs')
+    events = rise_set_transit(coords, times[0], times[-1], airmass=5.0)
+    assert np.isnan(events.rise).all()
+    assert np.isnan(events.set).all()
+    assert_quantity_allclose(events.time_above, [10, 0] * u.hour, atol=1e-6 * u.hour)
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+:mod:`visibility` computes where targets are in the sky above Maunakea.
+
+Transforming every target to :class:`~astropy.coordinates.AltAz` at every
+time is slow. Instead, for each time, the six directions along the ICRS axes
+are transformed with astropy, giving a matrix and an offset which take ICRS
+unit vectors to the local horizon. These are cached per time by
+:class:`HorizonTransforms`, and applying them to a whole catalog is a single
+NumPy operation.
+
+The rotation part of the transform includes precession, nutation and Earth
+rotation. Aberration, which shifts every direction towards the motion of the
+observatory, is the offset. What is left over is second order in the
+aberration, and is well below an arcsecond. Atmospheric refraction is not
+included.
+
+"""
+
+import collections
+import numpy as np
+import astropy.units as u
+from astropy.time import Time
+from astropy.coordinates import SkyCoord, AltAz, EarthLocation, Angle
+
+__all__ = ['KECK', 'SIDEREAL_DAY', 'HorizonTransforms', 'Visibility', 'visibility_grid', 'Events', 'rise_set_transit']
+
+KECK = EarthLocation.from_geodetic(lon=-155.47833 * u.degree, lat=19.82833 * u.degree, height=4160 * u.m)
+"""The location of the W. M. Keck Observatory on Maunakea."""
+
+SIDEREAL_DAY = 0.99726956634 * u.day
+"""The length of a sidereal day."""
+
+def _as_time_array(times):
+    """Make sure that times are a one-dimensional :class:`~astropy.time.Time` array."""
+    times = Time(times)
+    if times.isscalar:
+        times = Time([times])
+    return times
+
+class HorizonTransforms(object):
+    """A cache of transforms which take ICRS unit vectors to the local horizon.
+
+    Parameters
+    ----------
+    location : :class:`~astropy.coordinates.EarthLocation`
+        The observatory location.
+    maxsize : int
+        The maximum number of times to cache. The cache is emptied when it is full.
+
+    """
+    def __init__(self, location=KECK, maxsize=100000):
+        super(HorizonTransforms, self).__init__()
+        self.location = location
+        self.maxsize = maxsize
+        self._cache = {}
+
+    def __len__(self):
+        """Number of cached times."""
+        return len(self._cache)
+
+    def _compute(self, times):
+        """Compute the transforms for an array of times with a single astropy transform."""
+        n = len(times)
+        # The +x, +y, +z, -x, -y, -z directions, repeated for each time.
+        ra = np.repeat([0.0, 90.0, 0.0, 180.0, 270.0, 0.0], n) * u.degree
+        dec = np.repeat([0.0, 0.0, 90.0, 0.0, 0.0, -90.0], n) * u.degree
+        obstime = times[np.tile(np.arange(n), 6)]
+        altaz = SkyCoord(ra, dec, frame='icrs').transform_to(AltAz(obstime=obstime, location=self.location))
+        
+        # Axes are (component, direction, time). Each transformed direction is
+        # R e + b, normalized, so the difference of opposite directions gives
+        # the columns of R. The sum of opposite directions is the part of b
+        # perpendicular to R e, so summing over all three axes gives 2b.
+        xyz = altaz.cartesian.xyz.value.reshape((3, 6, n))
+        plus, minus = xyz[:,:3,:], xyz[:,3:,:]
+        rotation = (plus - minus) / 2.0
+        offset = np.sum(plus + minus, axis=1) / 4.0
+        return np.concatenate([rotation, offset[:,np.newaxis,:]], axis=1).transpose((2, 0, 1))
+
+    def __call__(self, times):
+        """Horizon transforms for an array of times.
+
+        Parameters
+        ----------
+        times : :class:`~astropy.time.Time`
+            The times.
+
+        Returns
+        -------
+        matrices : array
+            An array of shape ``(len(times), 3, 4)``. Multiplying each matrix by
+            an ICRS cartesian unit vector, extended with a fourth component of 1,
+            gives a vector in the direction of the horizon (``AltAz``) position.
+
+        """
+        times = _as_time_array(times)
+        utc = times.utc
+        keys = list(zip(utc.jd1.tolist(), utc.jd2.tolist()))
+        missing = collections.OrderedDict((key, i) for i, key in enumerate(keys) if key not in self._cache)
+        if missing:
+            if len(self._cache) + len(missing) > self.maxsize:
+                self._cache.clear()
+            matrices = self._compute(times[np.array(list(missing.values()), dtype=np.intp)])
+            self._cache.update(zip(missing.keys(), matrices))
+        return np.array([ self._cache[key] for key in keys ])
+
+_transforms = {}
+
+def _get_transforms(location):
+    """Get the shared transform cache for a location."""
+    key = tuple(float(getattr(location, axis).to(u.m).value) for axis in 'xyz')
+    if key not in _transforms:
+        _transforms[key] = HorizonTransforms(location)
+    return _transforms[key]
+
+class Visibility(collections.namedtuple('Visibility', ['times', 'altitude', 'azimuth', 'airmass', 'hour_angle'])):
+    """The result of :func:`visibility_grid`.
+
+    Each of the angle and airmass attributes is an array of shape
+    ``(targets, times)``.
+
+    Attributes
+    ----------
+    times : :class:`~astropy.time.Time`
+        The times for the columns of the grid.
+    altitude : :class:`~astropy.units.Quantity`
+        Altitude above the horizon, without refraction.
+    azimuth : :class:`~astropy.units.Quantity`
+        Azimuth, east of north.
+    airmass : array
+        The plane-parallel airmass, sec(z). Infinite below the horizon.
+    hour_angle : :class:`~astropy.units.Quantity`
+        Hour angle, wrapped to -12h to 12h.
+
+    """
+    __slots__ = ()
+
+
+def visibility_grid(coords, times, location=KECK, transforms=None):
+    """Compute the altitude, azimuth, airmass and hour angle of many positions at many times.
+
+    Parameters
+    ----------
+    coords : :class:`~astropy.coordinates.SkyCoord`
+        Positions, with shape ``(targets,)``.
+    times : :class:`~astropy.time.Time`
+        Times, with shape ``(times,)``.
+    location : :class:`~astropy.coordinates.EarthLocation`
+        The observatory, which defaults to Keck.
+    transforms : :class:`HorizonTransforms`, optional
+        The transform cache to use. By default, a cache shared by all calls
+        for the same location is used, so repeated queries for the same times
+        don't repeat any coordinate transformations.
+
+    Returns
+    -------
+    visibility : :class:`Visibility`
+        The grid.
+
+    """
+    times = _as_time_array(times)
+    if transforms is None:
+        transforms = _get_transforms(location)
+    matrices = transforms(times)
+
+    coords = SkyCoord(coords).transform_to('icrs')
+    vectors = coords.cartesian.xyz.value.reshape((3, -1))
+    vectors = vectors / np.sqrt(np.sum(vectors ** 2, axis=0))
+    vectors = np.vstack([vectors, np.ones((1, vectors.shape[1]))])
+
+    x = np.dot(vectors.T, matrices[:,0,:].T)
+    y = np.dot(vectors.T, matrices[:,1,:].T)
+    z = np.dot(vectors.T, matrices[:,2,:].T)
+    norm = np.sqrt(x ** 2 + y ** 2 + z ** 2)
+    alt = np.arcsin(np.clip(z / norm, -1.0, 1.0))
+    az = np.mod(np.arctan2(y, x), 2 * np.pi)
+
+    latitude = transforms.location.to_geodetic()[1].radian
+    ha = np.arctan2(-np.cos(alt) * np.sin(az),
+        np.cos(latitude) * np.sin(alt) - np.sin(latitude) * np.cos(alt) * np.cos(az))
+
+    with np.errstate(divide='ignore'):
+        airmass = np.where(alt > 0, 1.0 / np.sin(alt), np.inf)
+
+    return Visibility(times, (alt * u.radian).to(u.degree), (az * u.radian).to(u.degree),
+        airmass, (ha * u.radian).to(u.hourangle))
+
+class Events(collections.namedtuple('Events', ['start', 'transit', 'rise', 'set', 'time_above'])):
+    """The result of :func:`rise_set_transit`.
+    
+    Event times are arrays of offsets from ``start``, in hours, with one entry
+    for each target. Add them to ``start`` to get times. Rise and set times are
+    NaN for targets which never cross the horizon.
+    
+    Attributes
+    ----------
+    start : :class:`~astropy.time.Time`
+        The start of the window.
+    transit : :class:`~astropy.units.Quantity`
+        The transit closest to the middle of the window.
+    rise : :class:`~astropy.units.Quantity`
+        The rise before that transit.
+    set : :class:`~astropy.units.Quantity`
+        The set after that transit.
+    time_above : :class:`~astropy.units.Quantity`
+        The time during the window with airmass below the limit.
+    
+    """
+    __slots__ = ()
+    
+def _half_width(declination, latitude, altitude):
+    """The hour angle, in radians, at which a declination crosses an altitude.
+    
+    Targets which never reach the altitude get 0, and targets which never go
+    below it get pi.
+    """
+    with np.errstate(invalid='ignore'):
+        cos_ha = ((np.sin(altitude) - np.sin(latitude) * np.sin(declination)) / 
+            (np.cos(latitude) * np.cos(declination)))
+    return np.arccos(np.clip(np.nan_to_num(cos_ha), -1.0, 1.0))
+
+def rise_set_transit(coords, start, end, location=KECK, horizon=0 * u.degree, airmass=2.0, transforms=None):
+    """Find rise, set and transit times, and the time with airmass below a limit, for many positions.
+    
+    The hour angle and declination of every position are found once, at the
+    start of the window, using :func:`visibility_grid`. Events are then solved
+    for analytically, assuming the apparent declination is fixed during the window.
+    
+    Parameters
+    ----------
+    coords : :class:`~astropy.coordinates.SkyCoord`
+        Positions, with shape ``(targets,)``.
+    start : :class:`~astropy.time.Time`
+        The start of the window, e.g. the start of the night.
+    end : :class:`~astropy.time.Time`
+        The end of the window.
+    location : :class:`~astropy.coordinates.EarthLocation`
+        The observatory, which defaults to Keck.
+    horizon : :class:`~astropy.units.Quantity`
+        The altitude used for rising and setting.
+    airmass : float
+        The airmass limit used for ``time_above``.
+    transforms : :class:`HorizonTransforms`, optional
+        The transform cache to use.
+    
+    Returns
+    -------
+    events : :class:`Events`
+        The event times, as arrays.
+    
+    """
+    start, end = Time(start), Time(end)
+    if transforms is None:
+        transforms = _get_transforms(location)
+    grid = visibility_grid(coords, start, transforms=transforms)
+    alt = grid.altitude[:,0].to(u.radian).value
+    az = grid.azimuth[:,0].to(u.radian).value
+    ha = grid.hour_angle[:,0].to(u.radian).value
+    
+    latitude = transforms.location.to_geodetic()[1].radian
+    declination = np.arcsin(np.clip(np.sin(alt) * np.sin(latitude) + 
+        np.cos(alt) * np.cos(latitude) * np.cos(az), -1.0, 1.0))
+    
+    # Work in hours from the start of the window.
+    period = SIDEREAL_DAY.to(u.hour).value
+    duration = (end - start).to(u.hour).value
+    ha_hours = ha / (2 * np.pi) * period
+    transit = -ha_hours + period * np.round((duration / 2.0 + ha_hours) / period)
+    
+    half = _half_width(declination, latitude, Angle(horizon).radian) / (2 * np.pi) * period
+    crosses = (half > 0) & (half < period / 2.0)
+    rise = np.where(crosses, transit - half, np.nan)
+    set = np.where(crosses, transit + half, np.nan)
+    
+    # Sum the overlap of each interval above the limit with the window.
+    half_limit = _half_width(declination, latitude, np.arcsin(1.0 / airmass)) / (2 * np.pi) * period
+    k = int(np.ceil(duration / (2 * period))) + 1
+    transits = transit[:,np.newaxis] + period * np.arange(-k, k + 1)[np.newaxis,:]
+    overlap = (np.minimum(transits + half_limit[:,np.newaxis], duration) - 
+        np.maximum(transits - half_limit[:,np.newaxis], 0.0))
+    time_above = np.sum(np.clip(overlap, 0.0, None), axis=1)
+    
+    return Events(start, transit * u.hour, rise * u.hour, set * u.hour, time_above * u.hour)